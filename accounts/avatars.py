@@ -0,0 +1,68 @@
+"""Fixed-size avatar thumbnails.
+
+Uploads are cropped to squares at ``SIZES`` and written as WebP plus a JPEG
+fallback next to the original under ``avatars/thumbs/``. Their storage names
+are kept on ``Profile.avatar_thumbs`` (``{"48": {"webp": ..., "jpeg": ...}}``)
+so templates can build ``srcset`` without touching the filesystem.
+"""
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+SIZES = (48, 96, 256)
+FORMATS = (('webp', 'WEBP', {'quality': 80, 'method': 4}),
+           ('jpeg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}))
+
+
+def _square(image: Image.Image, size: int) -> Image.Image:
+    return ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def generate(profile) -> dict:
+    """Write thumbnails for ``profile.avatar`` and return their storage names."""
+    storage = profile.avatar.storage
+    stem = os.path.splitext(os.path.basename(profile.avatar.name))[0]
+    with profile.avatar.open('rb') as fh:
+        source = _flatten(Image.open(fh))
+    thumbs = {}
+    # Downscale step by step so the larger sizes feed the smaller ones.
+    image = source
+    for size in sorted(SIZES, reverse=True):
+        image = _square(image, size)
+        names = {}
+        for ext, fmt, params in FORMATS:
+            buf = BytesIO()
+            image.save(buf, fmt, **params)
+            # The stem is unique (it is the stored avatar's), so overwrite
+            # leftovers instead of piling up suffixed copies.
+            name = f'avatars/thumbs/{stem}_{size}.{ext}'
+            storage.delete(name)
+            names[ext] = storage.save(name, ContentFile(buf.getvalue()))
+        thumbs[str(size)] = names
+    return thumbs
+
+
+def delete(profile) -> None:
+    storage = profile.avatar.storage
+    for names in (profile.avatar_thumbs or {}).values():
+        for name in names.values():
+            storage.delete(name)
+
+
+def refresh(profile) -> None:
+    """Replace the profile's thumbnails after its avatar changed."""
+    delete(profile)
+    profile.avatar_thumbs = generate(profile) if profile.avatar else {}
+    profile.save(update_fields=['avatar_thumbs', 'updated_at'])
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from accounts import avatars
+from accounts.models import Profile
+
+
+class Command(BaseCommand):
+    help = 'Generate avatar thumbnails for profiles that do not have them yet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate thumbnails for every avatar.')
+
+    def handle(self, *args, **options):
+        profiles = Profile.objects.exclude(avatar='').exclude(avatar__isnull=True)
+        if not options['force']:
+            profiles = profiles.filter(avatar_thumbs={})
+        done = failed = 0
+        for profile in profiles.iterator():
+            try:
+                avatars.refresh(profile)
+            except (OSError, ValueError) as exc:
+                failed += 1
+                self.stderr.write(f'{profile}: {exc}')
+            else:
+                done += 1
+        self.stdout.write(f'Built thumbnails for {done} avatar(s), {failed} failed.')
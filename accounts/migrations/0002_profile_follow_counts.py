@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:06
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def _count_of(queryset, field):
+    counts = queryset.filter(**{field: OuterRef('user_id')}).order_by().values(field).annotate(n=Count('*')).values('n')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def backfill_follow_counts(apps, schema_editor):
+    Profile = apps.get_model('accounts', 'Profile')
+    Follow = apps.get_model('follows', 'Follow')
+    Profile.objects.update(
+        followers_count=_count_of(Follow.objects.all(), 'following_id'),
+        following_count=_count_of(Follow.objects.all(), 'follower_id'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('follows', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_follow_counts, migrations.RunPython.noop),
+    ]
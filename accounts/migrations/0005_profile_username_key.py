@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_username_keys(apps, schema_editor):
+    # The directory joins through Profile, so every user needs one
+    User = apps.get_model('auth', 'User')
+    Profile = apps.get_model('accounts', 'Profile')
+    Profile.objects.bulk_create(
+        Profile(user_id=pk) for pk in User.objects.filter(profile__isnull=True).values_list('pk', flat=True)
+    )
+    batch = []
+    for pk, username in Profile.objects.order_by('pk').values_list('pk', 'user__username').iterator(chunk_size=1000):
+        batch.append(Profile(pk=pk, username_key=username.lower()))
+        if len(batch) >= 1000:
+            Profile.objects.bulk_update(batch, ['username_key'])
+            batch = []
+    if batch:
+        Profile.objects.bulk_update(batch, ['username_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_profile_followers_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='username_key',
+            field=models.CharField(default='', editable=False, max_length=300),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['username_key', 'user'], name='accounts_profile_username_idx'),
+        ),
+        migrations.RunPython(fill_username_keys, migrations.RunPython.noop),
+    ]
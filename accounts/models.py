@@ -4,16 +4,74 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 
 
+def username_key(username: str) -> str:
+    return username.lower()
+
+
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     bio = models.TextField(blank=True)
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
+    # Storage names of generated thumbnails, see accounts.avatars
+    avatar_thumbs = models.JSONField(default=dict, blank=True, editable=False)
+    # Denormalized follow counters, maintained by follows.models signal handlers
+    followers_count = models.PositiveIntegerField(default=0, editable=False)
+    following_count = models.PositiveIntegerField(default=0, editable=False)
+    # ``username.lower()`` (Unicode-aware, unlike SQLite's LOWER), for the
+    # People directory; lowercasing can lengthen a few characters
+    username_key = models.CharField(max_length=300, default='', editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Finds the few accounts above TIMELINE_FANOUT_LIMIT, see blog.timeline
+            models.Index(fields=['followers_count'], name='accounts_profile_followers_idx'),
+            # Ordering and prefix search of the People directory, see follows.directory
+            models.Index(fields=['username_key', 'user'], name='accounts_profile_username_idx'),
+        ]
+
     def __str__(self) -> str:
         return f"Profile({self.user.username})"
 
+    def _thumb_url(self, size: int, fmt: str) -> str:
+        names = self.avatar_thumbs.get(str(size))
+        if names:
+            return self.avatar.storage.url(names[fmt])
+        return self.avatar.url if self.avatar else ''
+
+    def _srcset(self, fmt: str) -> str:
+        if not self.avatar_thumbs:
+            return ''
+        return ', '.join(
+            f"{self.avatar.storage.url(names[fmt])} {size}w" for size, names in sorted(
+                self.avatar_thumbs.items(), key=lambda item: int(item[0])
+            )
+        )
+
+    @property
+    def avatar_thumb_url(self) -> str:
+        """Smallest JPEG thumbnail, or the original if none were generated."""
+        return self._thumb_url(48, 'jpeg')
+
+    @property
+    def avatar_srcset(self) -> str:
+        return self._srcset('jpeg')
+
+    @property
+    def avatar_webp_srcset(self) -> str:
+        return self._srcset('webp')
+
+    def save(self, *args, **kwargs):
+        self.username_key = username_key(self.user.username)
+        # Follow counters only move through F() updates; never write back stale values
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in ('followers_count', 'following_count')
+            ]
+        super().save(*args, **kwargs)
+
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -5,6 +5,7 @@ from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
 from django.contrib import messages
 from .forms import ProfileForm
+from . import avatars
 
 
 def index(request: HttpRequest) -> HttpResponse:
@@ -59,7 +60,9 @@ def profile_edit(request: HttpRequest) -> HttpResponse:
     if request.method == 'POST':
         form = ProfileForm(request.POST, request.FILES, instance=profile)
         if form.is_valid():
-            form.save()
+            profile = form.save()
+            if 'avatar' in form.changed_data:
+                avatars.refresh(profile)
             messages.success(request, 'Profile updated!')
             return redirect('accounts:profile')
     else:
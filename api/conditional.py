@@ -0,0 +1,43 @@
+"""ETag support for the read API.
+
+ETags are computed from the rows about to be serialized (``updated_at``
+plus the denormalized counters, which change without touching
+``updated_at``), so a matching ``If-None-Match`` short-circuits to 304 (and
+a failed ``If-Match`` to 412) before any serialization work. No ``Last-Modified`` is sent: likes,
+comments and votes change a response without moving any timestamp, and a
+deleted row cannot lower a page's newest one, so ``If-Modified-Since``
+would answer 304 for changed data.
+"""
+import hashlib
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from rest_framework.response import Response
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+    return quote_etag(digest)
+
+
+def post_etag(posts) -> str:
+    """ETag for a post or a page of posts."""
+    return make_etag([
+        (p.pk, p.updated_at.isoformat(), p.likes_count, p.comments_count, p.options_count) for p in posts
+    ])
+
+
+def conditional(request, etag: str, build) -> Response:
+    """Answer the request's preconditions against ``etag``, else ``build()``.
+
+    A matching ``If-None-Match`` gets 304 and a failed ``If-Match`` or
+    ``If-Unmodified-Since`` 412, with the status Django chose; otherwise the
+    built response gets the ETag attached.
+    """
+    short_circuit = get_conditional_response(request, etag=etag)
+    if short_circuit is not None:
+        response = Response(status=short_circuit.status_code)
+    else:
+        response = build()
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
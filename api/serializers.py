@@ -0,0 +1,64 @@
+from rest_framework import serializers
+from blog.models import Comment, Post
+
+
+class SparseFieldsMixin:
+    """Let clients trim the payload with ``?fields=a,b,c``."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        wanted = request.query_params.get('fields') if request is not None else None
+        if wanted:
+            keep = {name.strip() for name in wanted.split(',') if name.strip()}
+            for name in set(self.fields) - keep:
+                self.fields.pop(name)
+
+
+class AuthorSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    username = serializers.CharField()
+    avatar = serializers.SerializerMethodField()
+
+    def get_avatar(self, user):
+        # Relies on select_related('author__profile') in the calling view
+        profile = getattr(user, 'profile', None)
+        if profile is None or not profile.avatar:
+            return None
+        return profile.avatar.url
+
+
+class SuggestionSerializer(SparseFieldsMixin, AuthorSerializer):
+    """A suggested account from ``follows.suggestions.for_user``."""
+    mutuals = serializers.IntegerField()
+    follows_you = serializers.BooleanField()
+
+
+class PostSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    author = AuthorSerializer(read_only=True)
+
+    class Meta:
+        model = Post
+        fields = [
+            'id', 'slug', 'type', 'title', 'author', 'excerpt', 'word_count', 'reading_time',
+            'likes_count', 'comments_count', 'options_count',
+            'starts_at', 'ends_at', 'max_choices', 'created_at', 'updated_at',
+        ]
+        read_only_fields = fields
+
+
+class PostDetailSerializer(PostSerializer):
+    """Adds the body as the sanitized HTML stored on save, never the raw editor input."""
+
+    class Meta(PostSerializer.Meta):
+        fields = PostSerializer.Meta.fields + ['content_html']
+        read_only_fields = fields
+
+
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    author = AuthorSerializer(read_only=True)
+
+    class Meta:
+        model = Comment
+        fields = ['id', 'post', 'author', 'content', 'created_at']
+        read_only_fields = fields
@@ -1,3 +1,39 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
 
-# Create your tests here.
+from blog.models import Post
+
+
+class PostApiTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author')
+        self.post = Post.objects.create(
+            author=self.author, title='Hello', content='<p onclick="x()">Hi<script>alert(1)</script></p>',
+        )
+
+    def test_if_none_match_returns_304_until_the_post_changes(self):
+        first = self.client.get('/api/posts/')
+        self.assertEqual(first.status_code, 200)
+        etag = first['ETag']
+        self.assertEqual(self.client.get('/api/posts/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.post.likes.add(self.author)
+        changed = self.client.get('/api/posts/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+
+    def test_failed_if_match_returns_412(self):
+        url = f'/api/posts/{self.post.slug}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_MATCH=etag).status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_MATCH='"stale"').status_code, 412)
+
+    def test_detail_serves_sanitized_html(self):
+        data = self.client.get(f'/api/posts/{self.post.slug}/').json()
+        self.assertNotIn('content', data)
+        self.assertEqual(data['content_html'], '<p>Hi</p>')
+
+    def test_sparse_fields(self):
+        full = self.client.get('/api/posts/')
+        sparse = self.client.get('/api/posts/?fields=id,title')
+        self.assertEqual(sparse.json()['results'], [{'id': self.post.pk, 'title': 'Hello'}])
+        self.assertNotEqual(sparse['ETag'], full['ETag'])
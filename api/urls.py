@@ -1,10 +1,13 @@
 from django.urls import path
+from rest_framework.routers import DefaultRouter
 from . import views
 
 app_name = 'api'
 
-urlpatterns = [
-    path('', views.index, name='index'),
-]
-
+router = DefaultRouter()
+router.register('posts', views.PostViewSet, basename='post')
 
+urlpatterns = [
+    path('feed/', views.FeedView.as_view(), name='feed'),
+    path('suggestions/', views.SuggestionsView.as_view(), name='suggestions'),
+] + router.urls
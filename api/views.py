@@ -1,5 +1,100 @@
-from django.http import JsonResponse, HttpRequest
+from rest_framework import permissions, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.views import APIView
+from blog import polls, timeline
+from blog.models import Comment, Post
+from follows import suggestions
+from .conditional import conditional, make_etag, post_etag
+from .serializers import CommentSerializer, PostDetailSerializer, PostSerializer, SuggestionSerializer
 
 
-def index(request: HttpRequest) -> JsonResponse:
-    return JsonResponse({"status": "ok", "message": "API root"})
+class PostViewSet(viewsets.ReadOnlyModelViewSet):
+    """Posts, newest first. Filter with ``?type=article|post|poll``."""
+    lookup_field = 'slug'
+
+    def get_queryset(self):
+        qs = Post.objects.select_related('author__profile')
+        post_type = self.request.query_params.get('type')
+        if post_type in Post.PostType.values:
+            qs = qs.filter(type=post_type)
+        if self.action == 'list':
+            qs = qs.defer('content', 'content_html')
+        return qs
+
+    def get_serializer_class(self):
+        return PostDetailSerializer if self.action == 'retrieve' else PostSerializer
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        etag = make_etag(post_etag(page), self.paginator.page.next_cursor, request.query_params.get('fields'))
+        return conditional(
+            request, etag,
+            lambda: self.get_paginated_response(self.get_serializer(page, many=True).data),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        post = self.get_object()
+        etag = make_etag(post_etag([post]), request.query_params.get('fields'))
+        return conditional(request, etag, lambda: Response(self.get_serializer(post).data))
+
+    @action(detail=True)
+    def comments(self, request, slug=None):
+        post = self.get_object()
+        qs = Comment.objects.filter(post=post).select_related('author__profile')
+        page = self.paginate_queryset(qs)
+        etag = make_etag(post.pk, post.comments_count, [c.pk for c in page], request.query_params.get('fields'))
+        return conditional(
+            request, etag,
+            lambda: self.get_paginated_response(CommentSerializer(page, many=True, context=self.get_serializer_context()).data),
+        )
+
+    @action(detail=True)
+    def results(self, request, slug=None):
+        post = self.get_object()
+        if not post.is_poll:
+            return Response({'detail': 'Not a poll.'}, status=404)
+        selected = polls.user_selection(post, request.user)
+        if post.poll_has_ended:
+            result = getattr(post, 'poll_result', None) or polls.finalize(post)
+            total, options = polls.frozen_results(result, selected)
+        else:
+            total, options = polls.results(post, selected)
+        etag = make_etag(
+            post.pk, total, post.poll_is_open, post.max_choices,
+            [(o['id'], o['votes'], o['selected']) for o in options],
+        )
+        return conditional(
+            request, etag,
+            lambda: Response({'total': total, 'max': post.max_choices, 'open': post.poll_is_open, 'options': options}),
+        )
+
+
+class FeedView(APIView):
+    """The signed-in user's following feed (same source as the home page)."""
+    permission_classes = [permissions.IsAuthenticated]
+    page_size = 10
+
+    def get(self, request):
+        posts, next_cursor = timeline.read(request.user, request.query_params.get('cursor'), limit=self.page_size)
+        etag = make_etag(post_etag(posts), next_cursor, request.query_params.get('fields'))
+
+        def build():
+            data = PostSerializer(posts, many=True, context={'request': request}).data
+            next_url = replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor) if next_cursor else None
+            return Response({'next': next_url, 'results': data})
+        return conditional(request, etag, build)
+
+
+class SuggestionsView(APIView):
+    """Accounts the signed-in user may want to follow, best first (``?limit=``, default 5)."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', 5)), 1), suggestions.TOP_K)
+        except ValueError:
+            limit = 5
+        users = suggestions.for_user(request.user, limit=limit)
+        return Response({'results': SuggestionSerializer(users, many=True, context={'request': request}).data})
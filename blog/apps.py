@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class BlogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'blog'
+
+    def ready(self):
+        # Connect the timeline fan-out, search indexing and card cache signal handlers
+        from . import cards, search, timeline  # noqa: F401
@@ -0,0 +1,258 @@
+"""Synthetic data and request timings for ``manage.py bench_views``.
+
+``generate`` fills an (empty, throwaway) database with a seeded social
+graph: users and profiles, follows, articles/status posts/polls, likes,
+comments, poll votes and notifications, written with ``bulk_create`` and
+then passed through the same rebuild paths the management commands use
+(counters, rendered fields, timelines, search index, suggestions). The
+same seed and scale always produce the same rows.
+
+``run`` drives the hot views through the test client as a handful of
+logged-in users and records wall time and SQL query count per request.
+"""
+import random
+import statistics
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import Profile, username_key
+from follows import suggestions
+from follows.models import Follow
+from notifications import outbox
+from notifications.models import Notification
+from . import counters, rendering, search, timeline
+from .models import Comment, PollOption, PollVote, Post
+
+WORDS = (
+    'django python cache query index latency socket timeline follow poll article status feed '
+    'profile avatar render template cursor page vote like comment stream worker batch'
+).split()
+VIEWS = ('index', 'home', 'detail', 'toggle_like', 'vote_poll', 'compose_status', 'people')
+AJAX = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+
+
+@dataclass
+class Scale:
+    """Rows per user (``users`` is the total); per-post counts are upper bounds."""
+    users: int = 200
+    follows: int = 20
+    posts: int = 5
+    likes: int = 10
+    comments: int = 4
+    votes: int = 10
+    notifications: int = 20
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _text(rnd: random.Random, words: int) -> str:
+    return ' '.join(rnd.choice(WORDS) for _ in range(words))
+
+
+def _count_of(queryset, field: str, outer: str = 'pk'):
+    counts = queryset.filter(**{field: OuterRef(outer)}).order_by().values(field).annotate(n=Count('*')).values('n')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def generate(scale: Scale, seed: int = 1) -> dict:
+    """Create the synthetic data set; returns row counts per model."""
+    rnd = random.Random(seed)
+    password = make_password('bench')
+    users = User.objects.bulk_create(
+        User(username=f'bench{i:06d}', email=f'bench{i}@example.com', password=password)
+        for i in range(scale.users)
+    )
+    Profile.objects.bulk_create(Profile(user=user, username_key=username_key(user.username)) for user in users)
+    ids = [user.pk for user in users]
+
+    # Follows: a few popular accounts plus uniform picks, so fan-in is skewed
+    popular = ids[:max(1, len(ids) // 50)]
+    edges = set()
+    for follower in ids:
+        for _ in range(min(scale.follows, len(ids) - 1)):
+            target = rnd.choice(popular) if rnd.random() < 0.3 else rnd.choice(ids)
+            if target != follower:
+                edges.add((follower, target))
+    Follow.objects.bulk_create(Follow(follower_id=a, following_id=b) for a, b in sorted(edges))
+    Profile.objects.update(
+        followers_count=_count_of(Follow.objects.all(), 'following_id', 'user_id'),
+        following_count=_count_of(Follow.objects.all(), 'follower_id', 'user_id'),
+    )
+
+    posts = []
+    types = [Post.PostType.ARTICLE, Post.PostType.POST, Post.PostType.POLL]
+    now = timezone.now()
+    for n in range(scale.users * scale.posts):
+        post_type = rnd.choices(types, weights=[3, 5, 2])[0]
+        if post_type == Post.PostType.ARTICLE:
+            title = _text(rnd, 5).title()
+            content = ''.join(f'<p>{_text(rnd, rnd.randint(40, 120))}</p>' for _ in range(rnd.randint(2, 8)))
+        elif post_type == Post.PostType.POST:
+            title, content = '', _text(rnd, rnd.randint(5, 40))
+        else:
+            title, content = _text(rnd, 4).title() + '?', ''
+        post = Post(
+            author_id=rnd.choice(ids), type=post_type, title=title, content=content, slug=f'bench-{n}',
+            max_choices=rnd.choice([1, 1, 2]) if post_type == Post.PostType.POLL else 1,
+            ends_at=now + timedelta(days=7) if post_type == Post.PostType.POLL else None,
+            **rendering.render(content),
+        )
+        posts.append(post)
+    posts = Post.objects.bulk_create(posts, batch_size=1000)
+
+    options = [
+        PollOption(post=post, text=f'Option {i + 1}')
+        for post in posts if post.is_poll for i in range(rnd.randint(2, 5))
+    ]
+    options = PollOption.objects.bulk_create(options, batch_size=1000)
+    by_post: dict[int, list[PollOption]] = {}
+    for option in options:
+        by_post.setdefault(option.post_id, []).append(option)
+
+    likes, comments, votes = set(), [], set()
+    for post in posts:
+        for user_id in rnd.sample(ids, min(len(ids), rnd.randint(0, scale.likes))):
+            likes.add((post.pk, user_id))
+        for _ in range(rnd.randint(0, scale.comments)):
+            comments.append(Comment(post=post, author_id=rnd.choice(ids), content=_text(rnd, rnd.randint(3, 30))))
+        for user_id in rnd.sample(ids, min(len(ids), rnd.randint(0, scale.votes))) if post.is_poll else ():
+            votes.add((post.pk, rnd.choice(by_post[post.pk]).pk, user_id))
+    Post.likes.through.objects.bulk_create(
+        (Post.likes.through(post_id=p, user_id=u) for p, u in sorted(likes)), batch_size=1000,
+    )
+    Comment.objects.bulk_create(comments, batch_size=1000)
+    PollVote.objects.bulk_create(
+        (PollVote(post_id=p, option_id=o, user_id=u) for p, o, u in sorted(votes)), batch_size=1000,
+    )
+    for model, fields in counters.COUNTERS.items():
+        for field in fields:
+            counters.rebuild(model, field)
+
+    kinds = [('like', 'liked your post'), ('comment', 'commented on your post'),
+             ('follow', 'started following you'), ('poll_vote', 'voted in your poll')]
+    notifications = []
+    for user_id in ids:
+        for _ in range(rnd.randint(0, scale.notifications)):
+            kind, verb = rnd.choice(kinds)
+            actor = rnd.choice(ids)
+            notifications.append(Notification(
+                user_id=user_id, actor_id=actor, type=kind, verb=verb, message=f'bench{actor} {verb}',
+                read=rnd.random() < 0.6, actor_sample=[actor],
+            ))
+    Notification.objects.bulk_create(notifications, batch_size=1000)
+
+    timeline.rebuild()
+    if search.is_available():
+        search.rebuild()
+    suggestions.rebuild()
+    return {
+        'users': len(ids), 'follows': len(edges), 'posts': len(posts), 'poll_options': len(options),
+        'likes': len(likes), 'comments': len(comments), 'poll_votes': len(votes),
+        'notifications': len(notifications),
+    }
+
+
+class Runner:
+    """Issues requests for each view and collects per-request samples."""
+
+    def __init__(self, seed: int = 1, viewers: int = 5):
+        self.rnd = random.Random(seed)
+        users = list(User.objects.order_by('pk')[:viewers])
+        self.clients = []
+        for user in users:
+            client = Client()
+            client.force_login(user)
+            self.clients.append((user, client))
+        self.slugs = list(Post.objects.order_by('pk').values_list('slug', flat=True))
+        self.poll_options = list(
+            PollOption.objects.filter(post__type=Post.PostType.POLL).values_list('post__slug', 'pk')
+        )
+        self.samples: dict[str, list[tuple[float, int, int]]] = {view: [] for view in VIEWS}
+
+    def request(self, view: str):
+        user, client = self.rnd.choice(self.clients)
+        if view == 'index':
+            return client.get('/blog/')
+        if view == 'home':
+            return client.get('/')
+        if view == 'detail':
+            return client.get(f'/blog/post/{self.rnd.choice(self.slugs)}/')
+        if view == 'toggle_like':
+            return client.post(f'/blog/post/{self.rnd.choice(self.slugs)}/like-toggle/', **AJAX)
+        if view == 'vote_poll':
+            slug, option_id = self.rnd.choice(self.poll_options)
+            return client.post(f'/blog/post/{slug}/vote/{option_id}/', **AJAX)
+        if view == 'compose_status':
+            return client.post('/blog/post/compose/', {'content': _text(self.rnd, 12)}, **AJAX)
+        if view == 'people':
+            return client.get('/follows/people/')
+        raise ValueError(view)
+
+    def measure(self, view: str, requests: int, warmup: int = 0) -> None:
+        for n in range(warmup + requests):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = self.request(view)
+                elapsed = time.perf_counter() - start
+            if n >= warmup:
+                self.samples[view].append((elapsed, len(queries), response.status_code))
+
+    def summary(self) -> dict:
+        out = {}
+        for view, samples in self.samples.items():
+            if not samples:
+                continue
+            ms = [elapsed * 1000 for elapsed, _, _ in samples]
+            queries = [count for _, count, _ in samples]
+            statuses: dict[str, int] = {}
+            for _, _, status in samples:
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+            out[view] = {
+                'requests': len(samples),
+                'ms': {
+                    'mean': round(statistics.fmean(ms), 3),
+                    'p50': round(percentile(ms, 50), 3),
+                    'p90': round(percentile(ms, 90), 3),
+                    'p95': round(percentile(ms, 95), 3),
+                    'p99': round(percentile(ms, 99), 3),
+                    'max': round(max(ms), 3),
+                },
+                'queries': {
+                    'mean': round(statistics.fmean(queries), 2),
+                    'max': max(queries),
+                },
+                'status': statuses,
+            }
+        return out
+
+
+def run(views=VIEWS, requests: int = 50, warmup: int = 5, seed: int = 1, viewers: int = 5,
+        cold_cache: bool = False) -> dict:
+    # The outbox thread would compete with the requests for the SQLite write
+    # lock; notifications are drained between views instead.
+    worker, outbox.WORKER = outbox.WORKER, 'command'
+    try:
+        runner = Runner(seed=seed, viewers=viewers)
+        for view in views:
+            if cold_cache:
+                cache.clear()
+            runner.measure(view, requests, warmup)
+            while outbox.drain():
+                pass
+    finally:
+        outbox.WORKER = worker
+    return runner.summary()
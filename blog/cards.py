@@ -0,0 +1,162 @@
+"""Fragment cache for rendered post cards.
+
+Each post has a version token in the cache that is replaced whenever the
+post is edited, liked, commented on or voted on (see the signal handlers
+below); the rendered card is cached under ``(post id, version)``. Anything
+that depends on the viewer or the clock is left as a placeholder in the
+cached HTML and filled in per request: the relative timestamp and the
+viewer's liked state.
+
+Version bumps only reach other workers through a shared cache, so caching
+is off when the default cache is process-local (``LocMemCache``) unless
+``POST_CARD_CACHE_SINGLE_PROCESS`` declares that one worker serves
+everything; cards are then rendered on every request.
+"""
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.utils.timesince import timesince
+from config.caches import process_local
+from .models import Comment, PollOption, PollVote, Post
+
+CARD_TEMPLATE = 'blog/_post_card.html'
+CARD_TTL = getattr(settings, 'POST_CARD_CACHE_TTL', 60 * 60)
+ENABLED = not process_local() or getattr(settings, 'POST_CARD_CACHE_SINGLE_PROCESS', False)
+SINCE_PLACEHOLDER = '<!--card:since-->'
+LIKED_PLACEHOLDER = '<!--card:liked-->'
+_HITS_KEY = 'postcard:stats:hits'
+_MISSES_KEY = 'postcard:stats:misses'
+
+
+def _version_key(post_id: int) -> str:
+    return f'postcard:v:{post_id}'
+
+
+def _card_key(post: Post, version) -> str:
+    # The author's profile stamp keeps avatar changes from serving stale cards
+    profile = getattr(post.author, 'profile', None)
+    stamp = int(profile.updated_at.timestamp()) if profile is not None else 0
+    return f'postcard:{post.pk}:{version}:{stamp}'
+
+
+def bump(post_id: int) -> None:
+    """Give ``post_id`` a fresh version so its cached card is no longer found."""
+    if not ENABLED:
+        return
+    cache.set(_version_key(post_id), time.time_ns(), None)
+
+
+def _versions(post_ids: list[int]) -> dict[int, int]:
+    found = cache.get_many([_version_key(pk) for pk in post_ids])
+    versions, missing = {}, {}
+    for pk in post_ids:
+        version = found.get(_version_key(pk))
+        if version is None:
+            # Never reuse an old version: it may still have a fragment cached
+            version = missing[_version_key(pk)] = time.time_ns()
+        versions[pk] = version
+    if missing:
+        cache.set_many(missing, None)
+    return versions
+
+
+def _count(key: str, n: int) -> None:
+    if not n:
+        return
+    try:
+        cache.incr(key, n)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key, n)
+
+
+def stats() -> dict:
+    hits = cache.get(_HITS_KEY, 0)
+    misses = cache.get(_MISSES_KEY, 0)
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_ratio': hits / total if total else 0.0}
+
+
+def reset_stats() -> None:
+    cache.delete_many([_HITS_KEY, _MISSES_KEY])
+
+
+def _render(post: Post) -> str:
+    return render_to_string(CARD_TEMPLATE, {'post': post, 'card_cache': True})
+
+
+def _personalize(html: str, post: Post, liked: bool) -> str:
+    html = html.replace(SINCE_PLACEHOLDER, f'{timesince(post.created_at)} ago')
+    return mark_safe(html.replace(LIKED_PLACEHOLDER, ' liked' if liked else ''))
+
+
+def render_cards(posts, request=None) -> list:
+    """Attach ``card_html`` to each post, rendering only cache misses.
+
+    Posts carrying a per-request ``search_snippet`` are rendered uncached.
+    Returns the posts as a list.
+    """
+    posts = list(posts)
+    if not posts:
+        return posts
+    user = getattr(request, 'user', None)
+    liked_ids = set()
+    if user is not None and user.is_authenticated:
+        liked_ids = set(
+            Post.likes.through.objects.filter(user_id=user.pk, post_id__in=[p.pk for p in posts])
+            .values_list('post_id', flat=True)
+        )
+    cacheable = {p.pk for p in posts if ENABLED and not getattr(p, 'search_snippet', '')}
+    versions = _versions(list(cacheable))
+    keys = {p.pk: _card_key(p, versions[p.pk]) for p in posts if p.pk in cacheable}
+    fragments = cache.get_many(list(keys.values()))
+    misses = [p for p in posts if keys.get(p.pk) not in fragments]
+    if misses:
+        prefetch_related_objects([p for p in misses if p.is_poll], 'poll_options')
+    fresh = {}
+    for post in posts:
+        key = keys.get(post.pk)
+        html = fragments.get(key) if key else None
+        if html is None:
+            html = _render(post)
+            if key:
+                fresh[key] = html
+        post.card_html = _personalize(html, post, post.pk in liked_ids)
+    if fresh:
+        cache.set_many(fresh, CARD_TTL)
+    _count(_HITS_KEY, len(cacheable) - len(fresh))
+    _count(_MISSES_KEY, len(fresh))
+    return posts
+
+
+@receiver(post_save, sender=Post)
+def bump_on_edit(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump(instance.pk)
+
+
+@receiver(m2m_changed, sender=Post.likes.through)
+def bump_on_like(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        bump(instance.pk)
+    else:
+        for pk in pk_set or ():
+            bump(pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=PollOption)
+@receiver(post_delete, sender=PollOption)
+@receiver(post_save, sender=PollVote)
+@receiver(post_delete, sender=PollVote)
+def bump_on_child_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump(instance.post_id)
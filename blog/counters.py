@@ -0,0 +1,37 @@
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from .models import Comment, PollOption, PollVote, Post
+
+
+def _count_of(queryset, field: str):
+    # Correlated COUNT(*) usable inside annotate()/update()
+    counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(n=Count('*')).values('n')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+# model -> {counter field: expression computing its true value}
+COUNTERS = {
+    Post: {
+        'likes_count': lambda: _count_of(Post.likes.through.objects.all(), 'post_id'),
+        'comments_count': lambda: _count_of(Comment.objects.all(), 'post_id'),
+        'options_count': lambda: _count_of(PollOption.objects.all(), 'post_id'),
+    },
+    PollOption: {
+        'votes_count': lambda: _count_of(PollVote.objects.all(), 'option_id'),
+    },
+}
+
+
+def find_drift(model, field: str) -> list[tuple[int, int, int]]:
+    """Return ``(pk, stored, actual)`` for rows whose stored counter is wrong."""
+    rows = (
+        model.objects.annotate(actual=COUNTERS[model][field]())
+        .values_list('pk', field, 'actual')
+        .order_by('pk')
+    )
+    return [(pk, stored, actual) for pk, stored, actual in rows if stored != actual]
+
+
+def rebuild(model, field: str) -> int:
+    """Recompute ``field`` for every row in a single UPDATE. Returns rows touched."""
+    return model.objects.update(**{field: COUNTERS[model][field]()})
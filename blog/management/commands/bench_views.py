@@ -0,0 +1,121 @@
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from dataclasses import asdict, fields
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import (
+    setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+from channels.layers import InMemoryChannelLayer, channel_layers
+
+from blog import benchmark
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True, timeout=5,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Seed a throwaway database with synthetic data and time the main views (latency and SQL queries).'
+
+    def add_arguments(self, parser):
+        for field in fields(benchmark.Scale):
+            parser.add_argument(f'--{field.name}', type=int, default=field.default)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--requests', type=int, default=50, help='Measured requests per view.')
+        parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per view first.')
+        parser.add_argument('--viewers', type=int, default=5, help='Logged-in users the requests rotate through.')
+        parser.add_argument('--view', action='append', dest='views', choices=benchmark.VIEWS,
+                            help='Only benchmark this view (repeatable).')
+        parser.add_argument('--cold-cache', action='store_true', help='Clear the cache before each view.')
+        parser.add_argument('--output', help='Write the JSON report here (default: print it).')
+        parser.add_argument('--compare', help='A previous JSON report to print p50/p95/query deltas against.')
+
+    def handle(self, *args, **options):
+        baseline = self.load(options['compare']) if options['compare'] else None
+        scale = benchmark.Scale(**{f.name: options[f.name] for f in fields(benchmark.Scale)})
+        views = options['views'] or benchmark.VIEWS
+        # Runs against a throwaway database and in-memory channel layer.
+        with tempfile.TemporaryDirectory() as tmp:
+            connections['default'].settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(tmp, 'db.sqlite3')
+            setup_test_environment(debug=settings.DEBUG)
+            old_config = setup_databases(verbosity=0, interactive=False)
+            old_layer = channel_layers.set('default', InMemoryChannelLayer())
+            cache.clear()
+            try:
+                start = time.perf_counter()
+                rows = benchmark.generate(scale, seed=options['seed'])
+                seeded = time.perf_counter() - start
+                self.stderr.write(f"Seeded {rows} in {seeded:.1f}s")
+                results = benchmark.run(
+                    views, requests=options['requests'], warmup=options['warmup'], seed=options['seed'],
+                    viewers=options['viewers'], cold_cache=options['cold_cache'],
+                )
+            finally:
+                channel_layers.backends['default'] = old_layer
+                teardown_databases(old_config, verbosity=0)
+                teardown_test_environment()
+                cache.clear()
+
+        report = {
+            'revision': _git_revision(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connections['default'].vendor,
+            'scale': asdict(scale),
+            'seed': options['seed'],
+            'requests': options['requests'],
+            'rows': rows,
+            'seed_seconds': round(seeded, 2),
+            'views': results,
+        }
+        for view, stats in results.items():
+            ms, queries = stats['ms'], stats['queries']
+            self.stderr.write(
+                f"{view:15} p50={ms['p50']:8.2f}ms p95={ms['p95']:8.2f}ms p99={ms['p99']:8.2f}ms "
+                f"queries={queries['mean']:6.1f} (max {queries['max']}) status={stats['status']}"
+            )
+            before = (baseline or {}).get('views', {}).get(view)
+            if before:
+                self.stderr.write(
+                    f"{'':15} vs {baseline.get('revision') or 'baseline'}: "
+                    f"p50 {self.change(before['ms']['p50'], ms['p50'])} "
+                    f"p95 {self.change(before['ms']['p95'], ms['p95'])} "
+                    f"queries {queries['mean'] - before['queries']['mean']:+.1f}"
+                )
+        data = json.dumps(report, indent=2)
+        if options['output']:
+            try:
+                with open(options['output'], 'w') as fh:
+                    fh.write(data + '\n')
+            except OSError as exc:
+                raise CommandError(f"Cannot write {options['output']}: {exc}")
+            self.stderr.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+        else:
+            self.stdout.write(data)
+
+    @staticmethod
+    def load(path: str) -> dict:
+        try:
+            with open(path) as fh:
+                return json.load(fh)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Cannot read {path}: {exc}")
+
+    @staticmethod
+    def change(before: float, after: float) -> str:
+        return f'{(after - before) / before * 100:+.0f}%' if before else 'n/a'
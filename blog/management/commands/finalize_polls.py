@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from blog import polls
+from blog.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Freeze the results of polls whose end time has passed.'
+
+    def handle(self, *args, **options):
+        pending = Post.objects.filter(
+            type=Post.PostType.POLL,
+            ends_at__lt=timezone.now(),
+            poll_result__isnull=True,
+        ).order_by('pk')
+        finalized = 0
+        for post in pending.iterator(chunk_size=500):
+            polls.finalize(post)
+            finalized += 1
+        self.stdout.write(self.style.SUCCESS(f'Finalized {finalized} poll(s)'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from blog import counters
+
+
+class Command(BaseCommand):
+    help = 'Check and rebuild the denormalized like/comment/option/vote counters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Only report drift; exit non-zero if any is found.')
+
+    def handle(self, *args, **options):
+        drifted = 0
+        for model, fields in counters.COUNTERS.items():
+            for field in fields:
+                label = f'{model._meta.label}.{field}'
+                drift = counters.find_drift(model, field)
+                drifted += len(drift)
+                for pk, stored, actual in drift[:20]:
+                    self.stdout.write(f'  {label} pk={pk}: stored={stored} actual={actual}')
+                if options['check']:
+                    self.stdout.write(f'{label}: {len(drift)} drifted row(s)')
+                    continue
+                touched = counters.rebuild(model, field)
+                self.stdout.write(f'{label}: rebuilt {touched} row(s), fixed {len(drift)}')
+        if options['check'] and drifted:
+            raise CommandError(f'{drifted} counter value(s) out of date; run without --check to fix.')
+        self.stdout.write(self.style.SUCCESS('Counters OK' if options['check'] else 'Counters rebuilt'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand, CommandError
+from blog import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for posts.'
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError('Full-text search requires the SQLite backend.')
+        written = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {written} posts'))
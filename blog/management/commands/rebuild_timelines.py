@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from blog import timeline
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized home timelines from the follow graph.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users', help='Only rebuild this user id (repeatable).')
+
+    def handle(self, *args, **options):
+        written = timeline.rebuild(options['users'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} timeline entries'))
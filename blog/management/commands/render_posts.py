@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from blog import rendering
+
+
+class Command(BaseCommand):
+    help = 'Recompute stored HTML, excerpt, word count and reading time for posts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--missing', action='store_true', help='Only posts that have never been rendered')
+
+    def handle(self, *args, **options):
+        updated = rendering.rebuild(batch_size=options['batch_size'], only_missing=options['missing'])
+        self.stdout.write(self.style.SUCCESS(f'Rendered {updated} posts'))
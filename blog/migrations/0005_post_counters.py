@@ -0,0 +1,55 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:05
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def _count_of(queryset, field):
+    counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(n=Count('*')).values('n')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def backfill_counters(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    PollOption = apps.get_model('blog', 'PollOption')
+    Comment = apps.get_model('blog', 'Comment')
+    Post.objects.update(
+        likes_count=_count_of(Post.likes.through.objects.all(), 'post_id'),
+        comments_count=_count_of(Comment.objects.all(), 'post_id'),
+        options_count=_count_of(PollOption.objects.all(), 'post_id'),
+    )
+    PollOption.objects.update(
+        votes_count=_count_of(PollOption.voters.through.objects.all(), 'polloption_id'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_post_ends_at_post_max_choices_post_starts_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='polloption',
+            name='votes_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='options_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
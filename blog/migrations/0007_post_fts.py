@@ -0,0 +1,38 @@
+import html
+
+from django.db import migrations
+from django.utils.html import strip_tags
+
+
+def create_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('blog', 'Post')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS blog_post_fts "
+            "USING fts5(title, body, type UNINDEXED, tokenize='porter unicode61 remove_diacritics 2')"
+        )
+        rows = [
+            (pk, title, ' '.join(html.unescape(strip_tags(content or '')).split()), type_)
+            for pk, title, content, type_ in Post.objects.values_list('pk', 'title', 'content', 'type')
+        ]
+        cursor.executemany('INSERT INTO blog_post_fts (rowid, title, body, type) VALUES (%s, %s, %s, %s)', rows)
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DROP TABLE IF EXISTS blog_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_timelineentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
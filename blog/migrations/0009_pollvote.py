@@ -0,0 +1,49 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_voters(apps, schema_editor):
+    PollOption = apps.get_model('blog', 'PollOption')
+    PollVote = apps.get_model('blog', 'PollVote')
+    OldVoters = PollOption.voters.through
+    rows = OldVoters.objects.values_list('polloption_id', 'polloption__post_id', 'user_id')
+    PollVote.objects.bulk_create(
+        [PollVote(option_id=option_id, post_id=post_id, user_id=user_id) for option_id, post_id, user_id in rows],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_post_feed_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PollVote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('option', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='votes', to='blog.polloption')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='poll_votes', to='blog.post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='poll_votes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('option', 'user'), name='blog_pollvote_option_user_uniq')],
+                'indexes': [models.Index(fields=['post', 'user'], name='blog_pollvote_post_user_idx')],
+            },
+        ),
+        migrations.RunPython(copy_voters, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='polloption',
+            name='voters',
+        ),
+        migrations.AddField(
+            model_name='polloption',
+            name='voters',
+            field=models.ManyToManyField(blank=True, related_name='voted_poll_options', through='blog.PollVote', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
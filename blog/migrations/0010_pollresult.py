@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_pollvote'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PollResult',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='poll_result', serialize=False, to='blog.post')),
+                ('total_votes', models.PositiveIntegerField(default=0)),
+                ('options', models.JSONField(default=list)),
+                ('finalized_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
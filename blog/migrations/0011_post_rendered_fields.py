@@ -0,0 +1,219 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:20
+
+import html
+import math
+import re
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+# A frozen copy of blog.rendering.render (and blog.uploads.responsive_html)
+# as of this migration, so later renderer changes do not change what it
+# writes. Re-render existing posts with ``manage.py render_posts`` instead.
+
+EXCERPT_WORDS = 40
+WORDS_PER_MINUTE = 200
+ALLOWED_TAGS = {
+    'a', 'abbr', 'b', 'blockquote', 'br', 'caption', 'code', 'del', 'div', 'em', 'figcaption',
+    'figure', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'i', 'img', 'ins', 'li', 'ol', 'p', 'pre',
+    's', 'small', 'span', 'strike', 'strong', 'sub', 'sup', 'table', 'tbody', 'td', 'tfoot', 'th',
+    'thead', 'tr', 'u', 'ul',
+}
+VOID_TAGS = {'br', 'hr', 'img'}
+DROP_CONTENT_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'template', 'noscript', 'textarea', 'select'}
+GLOBAL_ATTRS = {'class', 'title', 'style'}
+ALLOWED_ATTRS = {
+    'a': {'href', 'target', 'rel'},
+    'img': {'src', 'alt', 'width', 'height'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan', 'scope'},
+    'ol': {'start'},
+}
+URL_ATTRS = {'href', 'src'}
+URL_SCHEMES = {'', 'http', 'https', 'mailto'}
+STYLE_PROPERTIES = {
+    'background-color', 'border', 'border-collapse', 'border-color', 'border-style', 'border-width',
+    'color', 'float', 'font-size', 'font-style', 'font-weight', 'height', 'margin', 'margin-bottom',
+    'margin-left', 'margin-right', 'margin-top', 'padding', 'text-align', 'text-decoration',
+    'vertical-align', 'width',
+}
+STYLE_VALUE_RE = re.compile(r'^(?:[#\w.%\- ]|rgba?\([\d.,% ]*\))+$', re.ASCII)
+RENDERED_FIELDS = ('content_html', 'excerpt', 'word_count', 'reading_time')
+
+VARIANT_WIDTHS = (480, 960, 1440)
+CONTENT_SIZES = '(max-width: 768px) 100vw, 768px'
+NAME_RE = re.compile(r'(?P<digest>[0-9a-f]{32})-(?P<width>\d+)x(?P<height>\d+)\.(?P<ext>jpg|png|webp)$')
+IMG_RE = re.compile(r'<img\b[^>]*>', re.IGNORECASE)
+SRC_RE = re.compile(r'\ssrc=(["\'])(?P<src>[^"\']+)\1', re.IGNORECASE)
+
+
+def clean_style(value):
+    kept = []
+    for declaration in value.split(';'):
+        name, sep, val = declaration.partition(':')
+        name, val = name.strip().lower(), ' '.join(val.split())
+        if sep and name in STYLE_PROPERTIES and val and STYLE_VALUE_RE.match(val):
+            kept.append(f'{name}: {val}')
+    return '; '.join(kept)
+
+
+def safe_url(value):
+    compact = ''.join(ch for ch in value if ch > ' ').lower()
+    try:
+        return urlsplit(compact).scheme in URL_SCHEMES
+    except ValueError:
+        return False
+
+
+class Sanitizer(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out = []
+        self.open = []
+        self.dropping = 0
+        self.drop_mark = 0
+        self.drop_open = []
+
+    def attributes(self, tag, attrs):
+        allowed = GLOBAL_ATTRS | ALLOWED_ATTRS.get(tag, set())
+        kept = []
+        for name, value in attrs:
+            value = value or ''
+            if name not in allowed:
+                continue
+            if name in URL_ATTRS and not safe_url(value):
+                continue
+            if name == 'style':
+                value = clean_style(value)
+                if not value:
+                    continue
+            kept.append(f' {name}="{html.escape(value)}"')
+        if tag == 'a' and any(name == 'target' for name, _ in attrs):
+            kept = [a for a in kept if not a.startswith(' rel=')] + [' rel="noopener noreferrer"']
+        return ''.join(kept)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            if not self.dropping:
+                self.drop_mark, self.drop_open = len(self.out), list(self.open)
+            self.dropping += 1
+            return
+        if tag not in ALLOWED_TAGS:
+            return
+        self.out.append(f'<{tag}{self.attributes(tag, attrs)}>')
+        if tag not in VOID_TAGS:
+            self.open.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS or tag not in ALLOWED_TAGS:
+            return
+        self.out.append(f'<{tag}{self.attributes(tag, attrs)}>')
+        if tag not in VOID_TAGS:
+            self.out.append(f'</{tag}>')
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT_TAGS:
+            if self.dropping:
+                self.dropping -= 1
+                if not self.dropping:
+                    del self.out[self.drop_mark:]
+                    self.open = self.drop_open
+            return
+        if tag not in self.open:
+            return
+        while self.open:
+            inner = self.open.pop()
+            self.out.append(f'</{inner}>')
+            if inner == tag:
+                break
+
+    def handle_data(self, data):
+        self.out.append(html.escape(data, quote=False))
+
+    def result(self):
+        self.close()
+        self.out.extend(f'</{tag}>' for tag in reversed(self.open))
+        return ''.join(self.out)
+
+
+def srcset_tag(match):
+    tag = match.group(0)
+    src = SRC_RE.search(tag)
+    if not src or 'srcset=' in tag.lower():
+        return tag
+    name = NAME_RE.search(src.group('src'))
+    if not name:
+        return tag
+    digest, ext = name.group('digest'), name.group('ext')
+    width, height = int(name.group('width')), int(name.group('height'))
+    widths = [w for w in VARIANT_WIDTHS if w < width]
+    if not widths:
+        return tag
+    candidates = [f'{settings.MEDIA_URL}responsive/{digest[:2]}/{digest}-{w}w.{ext} {w}w' for w in widths]
+    candidates.append(f"{src.group('src')} {width}w")
+    extra = f' srcset="{", ".join(candidates)}" sizes="{CONTENT_SIZES}" loading="lazy"'
+    if not re.search(r'\swidth=', tag, re.IGNORECASE):
+        extra += f' width="{width}" height="{height}"'
+    closing = '/>' if tag.endswith('/>') else '>'
+    return tag[:-len(closing)].rstrip() + extra + closing
+
+
+def render(content):
+    parser = Sanitizer()
+    parser.feed(content or '')
+    body = parser.result()
+    text = ' '.join(html.unescape(strip_tags(body)).split())
+    words = len(text.split())
+    return {
+        'content_html': IMG_RE.sub(srcset_tag, body) if 'uploads/' in body else body,
+        'excerpt': Truncator(text).words(EXCERPT_WORDS),
+        'word_count': words,
+        'reading_time': max(1, math.ceil(words / WORDS_PER_MINUTE)) if words else 0,
+    }
+
+
+def render_posts(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    batch = []
+    for pk, content in Post.objects.order_by('pk').values_list('pk', 'content').iterator(chunk_size=500):
+        batch.append(Post(pk=pk, **render(content)))
+        if len(batch) >= 500:
+            Post.objects.bulk_update(batch, RENDERED_FIELDS)
+            batch = []
+    if batch:
+        Post.objects.bulk_update(batch, RENDERED_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_pollresult'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='content_html',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='reading_time',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text='Minutes'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(render_posts, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,32 @@
-from django.db import models
+import re
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.db.models.functions import Length
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
 from django.contrib.auth.models import User
+from django.utils.html import strip_tags
 from django.utils.text import slugify
 from django.utils import timezone
+from . import rendering
+
+SLUG_WORDS = 6
+SLUG_BASE_LENGTH = 240
+SLUG_ATTEMPTS = 3
+
+
+def _preserve_counters(instance, save_kwargs: dict) -> None:
+    """Leave the ``*_count`` columns out of a full save of an existing row.
+
+    Counters only move through F() updates, so writing back a value loaded
+    earlier in the request would clobber concurrent increments.
+    """
+    if instance._state.adding or save_kwargs.get('update_fields') is not None or save_kwargs.get('force_insert'):
+        return
+    save_kwargs['update_fields'] = [
+        f.name for f in instance._meta.concrete_fields
+        if not f.primary_key and not f.name.endswith('_count')
+    ]
 
 
 class Post(models.Model):
@@ -20,19 +45,30 @@ class Post(models.Model):
     starts_at = models.DateTimeField(null=True, blank=True)
     ends_at = models.DateTimeField(null=True, blank=True)
     max_choices = models.PositiveSmallIntegerField(default=1)
+    # Denormalized counters, maintained by the signal handlers below
+    likes_count = models.PositiveIntegerField(default=0, editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    options_count = models.PositiveIntegerField(default=0, editable=False)
+    # Derived from ``content`` on save (see blog.rendering); list pages defer ``content``
+    content_html = models.TextField(blank=True, default='', editable=False)
+    excerpt = models.TextField(blank=True, default='', editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    reading_time = models.PositiveSmallIntegerField(default=0, editable=False, help_text='Minutes')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        # Keyset pagination walks (created_at, id); see blog.pagination
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='blog_post_feed_idx'),
+            models.Index(fields=['type', '-created_at', '-id'], name='blog_post_type_feed_idx'),
+            models.Index(fields=['author', '-created_at', '-id'], name='blog_post_author_feed_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.title
 
-    @property
-    def likes_count(self) -> int:
-        return self.likes.count()
-
     @property
     def is_poll(self) -> bool:
         return self.type == Post.PostType.POLL
@@ -48,32 +84,111 @@ class Post(models.Model):
             return False
         return True
 
+    @property
+    def poll_has_ended(self) -> bool:
+        return self.is_poll and self.ends_at is not None and timezone.now() > self.ends_at
+
+    def _slug_base(self) -> str:
+        # Status posts have no title, so fall back to their first few words
+        base = slugify(self.title) or slugify(' '.join(strip_tags(self.content or '').split()[:SLUG_WORDS]))
+        return base[:SLUG_BASE_LENGTH].strip('-') or 'post'
+
     def _generate_unique_slug(self) -> str:
-        base_slug = slugify(self.title) or 'post'
-        slug_candidate = base_slug
-        suffix = 2
-        while Post.objects.filter(slug=slug_candidate).exclude(pk=self.pk).exists():
-            slug_candidate = f"{base_slug}-{suffix}"
-            suffix += 1
-        return slug_candidate
+        """Pick ``base`` or ``base-<n+1>`` where ``n`` is the highest suffix in use, in one query.
+
+        Suffixed slugs sort between ``base-`` and ``base.``, so the lookup is a
+        range scan on the slug index; ordering by length then value puts the
+        largest numeric suffix first.
+        """
+        base = self._slug_base()
+        highest = (
+            Post.objects.filter(
+                models.Q(slug=base)
+                | models.Q(slug__gt=f'{base}-', slug__lt=f'{base}.', slug__regex=rf'^{re.escape(base)}-[0-9]+$')
+            )
+            .exclude(pk=self.pk)
+            .order_by(Length('slug').desc(), '-slug')
+            .values_list('slug', flat=True)
+            .first()
+        )
+        if highest is None:
+            return base
+        if highest == base:
+            return f"{base}-2"
+        return f"{base}-{int(highest.rsplit('-', 1)[1]) + 1}"
+
+    def _render(self, save_kwargs: dict) -> None:
+        """Refresh the derived columns unless this save leaves ``content`` alone."""
+        update_fields = save_kwargs.get('update_fields')
+        if update_fields is not None:
+            if 'content' not in update_fields:
+                return
+            save_kwargs['update_fields'] = {*update_fields, *rendering.RENDERED_FIELDS}
+        for field, value in rendering.render(self.content).items():
+            setattr(self, field, value)
 
     def save(self, *args, **kwargs):
-        if not self.slug:
+        _preserve_counters(self, kwargs)
+        self._render(kwargs)
+        if self.slug:
+            return super().save(*args, **kwargs)
+        for attempt in range(SLUG_ATTEMPTS):
             self.slug = self._generate_unique_slug()
-        super().save(*args, **kwargs)
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                # Lost a race for the same slug; recompute against the winner
+                if attempt == SLUG_ATTEMPTS - 1:
+                    raise
+                self.slug = None
 
 
 class PollOption(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='poll_options')
     text = models.CharField(max_length=255)
-    voters = models.ManyToManyField(User, related_name='voted_poll_options', blank=True)
+    voters = models.ManyToManyField(User, through='PollVote', related_name='voted_poll_options', blank=True)
+    votes_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self) -> str:
         return f"Option({self.text}) for {self.post.title}"
 
-    @property
-    def votes_count(self) -> int:
-        return self.voters.count()
+    def save(self, *args, **kwargs):
+        _preserve_counters(self, kwargs)
+        super().save(*args, **kwargs)
+
+
+class PollVote(models.Model):
+    """One user's vote for one option; ``post`` is copied from the option for per-poll lookups."""
+    option = models.ForeignKey(PollOption, on_delete=models.CASCADE, related_name='votes')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='poll_votes')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='poll_votes')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['option', 'user'], name='blog_pollvote_option_user_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['post', 'user'], name='blog_pollvote_post_user_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f"Vote({self.user_id}) for Option({self.option_id})"
+
+
+class PollResult(models.Model):
+    """Frozen results of a closed poll, written once by ``blog.polls.finalize``.
+
+    ``options`` holds ``[option_id, text, votes, percent]`` rows in display order.
+    """
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True, related_name='poll_result')
+    total_votes = models.PositiveIntegerField(default=0)
+    options = models.JSONField(default=list)
+    finalized_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"Results for {self.post_id}"
 
 
 class Comment(models.Model):
@@ -88,4 +203,103 @@ class Comment(models.Model):
     def __str__(self) -> str:
         return f"Comment by {self.author} on {self.post}"
 
-# Create your models here.
+
+class TimelineEntry(models.Model):
+    """Materialized home feed row: ``post`` appears in ``user``'s following timeline.
+
+    Filled by ``blog.timeline`` when posts are created and follows change.
+    ``author`` and ``created_at`` are copied from the post so reads and
+    unfollow retractions never need to join ``blog_post``.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'], name='blog_timeline_user_post_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-post'], name='blog_timeline_feed_idx'),
+            models.Index(fields=['user', 'author'], name='blog_timeline_author_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f"Timeline({self.user_id}) <- Post({self.post_id})"
+
+
+def _bump(model, pk, field: str, delta: int) -> None:
+    if delta:
+        model.objects.filter(pk=pk).update(**{field: F(field) + delta})
+
+
+def _m2m_counter(model, field: str, through, source_field: str, target_field: str):
+    """Build an m2m_changed handler keeping ``model.<field>`` in step with ``through``.
+
+    ``post_add`` already receives only the rows that were inserted. For removals
+    Django passes the requested pks, so the rows that actually exist are counted
+    in ``pre_remove``/``pre_clear`` and applied once the delete went through.
+    """
+    def handler(sender, instance, action, reverse, pk_set, **kwargs):
+        if action in ('pre_remove', 'pre_clear'):
+            rows = through.objects.filter(**{target_field if reverse else source_field: instance.pk})
+            if action == 'pre_remove':
+                rows = rows.filter(**{f'{source_field if reverse else target_field}__in': pk_set})
+            instance._pending_counter_rows = list(rows.values_list(source_field, flat=True))
+            return
+        if action == 'post_add':
+            counted = [instance.pk] * len(pk_set) if not reverse else list(pk_set)
+            delta = 1
+        elif action in ('post_remove', 'post_clear'):
+            counted = instance.__dict__.pop('_pending_counter_rows', [])
+            delta = -1
+        else:
+            return
+        per_row: dict[int, int] = {}
+        for pk in counted:
+            per_row[pk] = per_row.get(pk, 0) + delta
+        for pk, change in per_row.items():
+            _bump(model, pk, field, change)
+    return handler
+
+
+m2m_changed.connect(
+    _m2m_counter(Post, 'likes_count', Post.likes.through, 'post_id', 'user_id'),
+    sender=Post.likes.through,
+    weak=False,
+    dispatch_uid='blog.post_likes_count',
+)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment_added(sender, instance, created, **kwargs):
+    if created:
+        _bump(Post, instance.post_id, 'comments_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_comment_removed(sender, instance, **kwargs):
+    _bump(Post, instance.post_id, 'comments_count', -1)
+
+
+@receiver(post_save, sender=PollVote)
+def count_vote_added(sender, instance, created, **kwargs):
+    if created:
+        _bump(PollOption, instance.option_id, 'votes_count', 1)
+
+
+@receiver(post_delete, sender=PollVote)
+def count_vote_removed(sender, instance, **kwargs):
+    _bump(PollOption, instance.option_id, 'votes_count', -1)
+
+
+@receiver(post_save, sender=PollOption)
+def count_option_added(sender, instance, created, **kwargs):
+    if created:
+        _bump(Post, instance.post_id, 'options_count', 1)
+
+
+@receiver(post_delete, sender=PollOption)
+def count_option_removed(sender, instance, **kwargs):
+    _bump(Post, instance.post_id, 'options_count', -1)
@@ -0,0 +1,111 @@
+"""Keyset (cursor) pagination over ``(created_at, id)``.
+
+Pages are fetched with ``WHERE (created_at, id) < (...) ORDER BY created_at
+DESC, id DESC LIMIT n + 1``, so each page costs one index range scan and no
+``COUNT(*)``/``OFFSET``, however deep the reader goes. Cursors are opaque
+URL-safe tokens that record the boundary row and the paging direction.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import NamedTuple
+from django.db.models import Q
+
+
+class Position(NamedTuple):
+    key: object
+    pk: int
+    backwards: bool = False
+
+
+def encode_cursor(key, pk: int, backwards: bool = False) -> str:
+    if isinstance(key, datetime):
+        key = key.isoformat()
+    raw = json.dumps([key, pk, int(backwards)], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token: str | None) -> Position | None:
+    """Decode a token from ``encode_cursor``; malformed tokens yield ``None``."""
+    if not token:
+        return None
+    try:
+        key, pk, backwards = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        return Position(key, int(pk), bool(backwards))
+    except (ValueError, TypeError, UnicodeDecodeError):
+        return None
+
+
+def older_than(created_at: datetime, pk: int, time_field: str = 'created_at', pk_field: str = 'pk') -> Q:
+    """Rows after ``(created_at, pk)`` in newest-first order."""
+    return Q(**{f'{time_field}__lt': created_at}) | Q(**{time_field: created_at, f'{pk_field}__lt': pk})
+
+
+def newer_than(created_at: datetime, pk: int, time_field: str = 'created_at', pk_field: str = 'pk') -> Q:
+    """Rows before ``(created_at, pk)`` in newest-first order."""
+    return Q(**{f'{time_field}__gt': created_at}) | Q(**{time_field: created_at, f'{pk_field}__gt': pk})
+
+
+class CursorPage:
+    def __init__(self, object_list, next_cursor: str | None, prev_cursor: str | None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self) -> bool:
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+
+class CursorPaginator:
+    """Newest-first keyset paginator for querysets with ``created_at`` and ``id``."""
+
+    def __init__(self, queryset, per_page: int, time_field: str = 'created_at', pk_field: str = 'id'):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.time_field = time_field
+        self.pk_field = pk_field
+
+    def _boundary(self, obj) -> tuple[datetime, int]:
+        return getattr(obj, self.time_field), getattr(obj, self.pk_field)
+
+    def page(self, token: str | None = None) -> CursorPage:
+        position = decode_cursor(token)
+        created_at = None
+        if position is not None:
+            try:
+                created_at = datetime.fromisoformat(position.key)
+            except (TypeError, ValueError):
+                position = None
+        fields = (self.time_field, self.pk_field)
+        if position is None:
+            rows = list(self.queryset.order_by(*(f'-{f}' for f in fields))[:self.per_page + 1])
+            more, rows = len(rows) > self.per_page, rows[:self.per_page]
+            return self._make_page(rows, has_next=more, has_previous=False)
+        if position.backwards:
+            qs = self.queryset.filter(newer_than(created_at, position.pk, *fields)).order_by(*fields)
+            rows = list(qs[:self.per_page + 1])
+            more, rows = len(rows) > self.per_page, rows[:self.per_page][::-1]
+            return self._make_page(rows, has_next=True, has_previous=more)
+        qs = self.queryset.filter(older_than(created_at, position.pk, *fields)).order_by(*(f'-{f}' for f in fields))
+        rows = list(qs[:self.per_page + 1])
+        more, rows = len(rows) > self.per_page, rows[:self.per_page]
+        return self._make_page(rows, has_next=more, has_previous=True)
+
+    def _make_page(self, rows, has_next: bool, has_previous: bool) -> CursorPage:
+        next_cursor = prev_cursor = None
+        if rows and has_next:
+            next_cursor = encode_cursor(*self._boundary(rows[-1]))
+        if rows and has_previous:
+            prev_cursor = encode_cursor(*self._boundary(rows[0]), backwards=True)
+        return CursorPage(rows, next_cursor, prev_cursor)
@@ -0,0 +1,123 @@
+"""Poll voting and results.
+
+``toggle_vote`` checks and applies a vote toggle in one short transaction
+whose first statement is a write, so on SQLite it waits for the write lock
+(the connection's busy timeout) rather than failing when it would have to
+upgrade a read lock. The unvote is a ``DELETE``; the vote is one conditional
+``INSERT ... SELECT ... WHERE (SELECT COUNT(*) ...) < max_choices`` backed by
+the ``(option, user)`` unique constraint, so two racing requests can neither
+exceed ``max_choices`` nor record the same vote twice. The voter's
+selection comes from the ``(post, user)`` index on ``PollVote`` and tallies
+from the stored ``PollOption.votes_count`` counters rather than the voter
+rows. Once a poll has ended, ``finalize`` freezes its results into a
+``PollResult`` row so later views never touch the options or votes again.
+"""
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+from .models import PollOption, PollResult, PollVote, Post, _bump
+
+VOTES = PollVote._meta.db_table
+
+
+class VoteError(Exception):
+    """The vote cannot be applied (e.g. the max_choices limit is reached)."""
+
+
+def user_selection(post: Post, user) -> set[int]:
+    if not user.is_authenticated:
+        return set()
+    return set(PollVote.objects.filter(post=post, user=user).values_list('option_id', flat=True))
+
+
+def toggle_vote(post: Post, option: PollOption, user) -> set[int]:
+    """Select ``option`` for ``user``, or unselect it if already chosen.
+
+    Single-choice polls move the existing vote. Returns the user's selection
+    afterwards; raises ``VoteError`` when ``max_choices`` would be exceeded.
+    The rows are written with SQL, bypassing the ``PollVote`` signals, so the
+    ``votes_count`` counters are adjusted here.
+    """
+    limit = max(post.max_choices, 1)
+    with transaction.atomic(), connection.cursor() as cursor:
+        if limit == 1:
+            cursor.execute(
+                f'DELETE FROM {VOTES} WHERE post_id = %s AND user_id = %s RETURNING option_id', [post.pk, user.pk]
+            )
+            removed = [row[0] for row in cursor.fetchall()]
+        else:
+            cursor.execute(f'DELETE FROM {VOTES} WHERE option_id = %s AND user_id = %s', [option.pk, user.pk])
+            removed = [option.pk] * cursor.rowcount
+        for option_id in removed:
+            _bump(PollOption, option_id, 'votes_count', -1)
+        if option.pk in removed:
+            return user_selection(post, user)
+        cursor.execute(
+            f'INSERT INTO {VOTES} (option_id, post_id, user_id, created_at) SELECT %s, %s, %s, %s '
+            f'WHERE (SELECT COUNT(*) FROM {VOTES} WHERE post_id = %s AND user_id = %s) < %s '
+            'ON CONFLICT (option_id, user_id) DO NOTHING',
+            [option.pk, post.pk, user.pk, timezone.now(), post.pk, user.pk, limit],
+        )
+        if cursor.rowcount:
+            _bump(PollOption, option.pk, 'votes_count', 1)
+        selected = user_selection(post, user)
+    if option.pk not in selected:
+        raise VoteError(f'Max {post.max_choices} selections allowed.')
+    return selected
+
+
+def _percent(votes: int, total: int) -> int:
+    return int(round(votes / total * 100)) if total else 0
+
+
+def results(post: Post, selected: set[int], options=None) -> tuple[int, list[dict]]:
+    """Total votes and per-option rows (id, text, votes, percent, selected)."""
+    if options is None:
+        options = PollOption.objects.filter(post=post).order_by('pk')
+    options = list(options)
+    total = sum(opt.votes_count for opt in options)
+    rows = []
+    for opt in options:
+        rows.append({
+            'id': opt.pk,
+            'text': opt.text,
+            'votes': opt.votes_count,
+            'percent': _percent(opt.votes_count, total),
+            'selected': opt.pk in selected,
+        })
+    return total, rows
+
+
+def finalize(post: Post) -> PollResult:
+    """Freeze the results of an ended poll (idempotent).
+
+    Counts are taken once from the vote table, so the snapshot is exact even
+    if the stored counters ever drifted.
+    """
+    existing = PollResult.objects.filter(post=post).first()
+    if existing is not None:
+        return existing
+    counts = dict(
+        PollVote.objects.filter(post=post).order_by().values('option_id')
+        .annotate(n=Count('id')).values_list('option_id', 'n')
+    )
+    total = sum(counts.values())
+    options = [
+        [pk, text, counts.get(pk, 0), _percent(counts.get(pk, 0), total)]
+        for pk, text in PollOption.objects.filter(post=post).order_by('pk').values_list('pk', 'text')
+    ]
+    try:
+        with transaction.atomic():
+            return PollResult.objects.create(post=post, total_votes=total, options=options)
+    except IntegrityError:
+        # Finalized concurrently by another request or the scheduled job
+        return PollResult.objects.get(post=post)
+
+
+def frozen_results(result: PollResult, selected: set[int]) -> tuple[int, list[dict]]:
+    """Same shape as ``results`` but read from a ``PollResult`` snapshot."""
+    rows = [
+        {'id': pk, 'text': text, 'votes': votes, 'percent': percent, 'selected': pk in selected}
+        for pk, text, votes, percent in result.options
+    ]
+    return result.total_votes, rows
@@ -0,0 +1,209 @@
+"""Derived fields computed once when a post is saved.
+
+Rendering a post used to happen on every request: the detail page ran the
+raw CKEditor HTML through ``responsive_html`` and every card stripped tags
+and truncated the body. ``render`` does that work at write time instead and
+``Post.save`` stores the result, so list pages can ``defer('content')`` and
+print the stored excerpt.
+
+The sanitizer is a small allow-list over :class:`html.parser.HTMLParser`:
+unknown tags are dropped (their text kept), ``<script>``/``<style>`` and
+similar are dropped with their content (unless they are never closed, in
+which case only the tag goes), ``href``/``src`` must be relative or use an
+allowed scheme, and ``style`` keeps only allow-listed properties whose
+values are plain keywords, lengths and colours.
+"""
+import html
+import math
+import re
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+from .uploads import responsive_html
+
+EXCERPT_WORDS = 40
+WORDS_PER_MINUTE = 200
+
+ALLOWED_TAGS = {
+    'a', 'abbr', 'b', 'blockquote', 'br', 'caption', 'code', 'del', 'div', 'em', 'figcaption',
+    'figure', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'i', 'img', 'ins', 'li', 'ol', 'p', 'pre',
+    's', 'small', 'span', 'strike', 'strong', 'sub', 'sup', 'table', 'tbody', 'td', 'tfoot', 'th',
+    'thead', 'tr', 'u', 'ul',
+}
+VOID_TAGS = {'br', 'hr', 'img'}
+# Dropped together with everything inside them
+DROP_CONTENT_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'template', 'noscript', 'textarea', 'select'}
+GLOBAL_ATTRS = {'class', 'title', 'style'}
+ALLOWED_ATTRS = {
+    'a': {'href', 'target', 'rel'},
+    'img': {'src', 'alt', 'width', 'height'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan', 'scope'},
+    'ol': {'start'},
+}
+URL_ATTRS = {'href', 'src'}
+URL_SCHEMES = {'', 'http', 'https', 'mailto'}
+# Properties CKEditor writes for alignment, colours, image sizing and tables
+STYLE_PROPERTIES = {
+    'background-color', 'border', 'border-collapse', 'border-color', 'border-style', 'border-width',
+    'color', 'float', 'font-size', 'font-style', 'font-weight', 'height', 'margin', 'margin-bottom',
+    'margin-left', 'margin-right', 'margin-top', 'padding', 'text-align', 'text-decoration',
+    'vertical-align', 'width',
+}
+# Keywords, numbers with units, #hex and rgb()/rgba(); no backslash escapes,
+# quotes, url() or other functions
+STYLE_VALUE_RE = re.compile(r'^(?:[#\w.%\- ]|rgba?\([\d.,% ]*\))+$', re.ASCII)
+RENDERED_FIELDS = ('content_html', 'excerpt', 'word_count', 'reading_time')
+
+
+def clean_style(value: str) -> str:
+    """The allow-listed declarations of a ``style`` attribute, re-serialized."""
+    kept = []
+    for declaration in value.split(';'):
+        name, sep, val = declaration.partition(':')
+        name, val = name.strip().lower(), ' '.join(val.split())
+        if sep and name in STYLE_PROPERTIES and val and STYLE_VALUE_RE.match(val):
+            kept.append(f'{name}: {val}')
+    return '; '.join(kept)
+
+
+def _safe_url(value: str) -> bool:
+    # Browsers ignore control characters and whitespace inside schemes
+    compact = ''.join(ch for ch in value if ch > ' ').lower()
+    try:
+        return urlsplit(compact).scheme in URL_SCHEMES
+    except ValueError:
+        return False
+
+
+class _Sanitizer(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out: list[str] = []
+        self.open: list[str] = []
+        self.dropping = 0
+        # Output length and open tags when dropping started, to rewind to
+        self.drop_mark = 0
+        self.drop_open: list[str] = []
+
+    def _attrs(self, tag: str, attrs) -> str:
+        allowed = GLOBAL_ATTRS | ALLOWED_ATTRS.get(tag, set())
+        kept = []
+        for name, value in attrs:
+            value = value or ''
+            if name not in allowed:
+                continue
+            if name in URL_ATTRS and not _safe_url(value):
+                continue
+            if name == 'style':
+                value = clean_style(value)
+                if not value:
+                    continue
+            kept.append(f' {name}="{html.escape(value)}"')
+        if tag == 'a' and any(name == 'target' for name, _ in attrs):
+            kept = [a for a in kept if not a.startswith(' rel=')] + [' rel="noopener noreferrer"']
+        return ''.join(kept)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            if not self.dropping:
+                self.drop_mark, self.drop_open = len(self.out), list(self.open)
+            self.dropping += 1
+            return
+        if tag not in ALLOWED_TAGS:
+            return
+        self.out.append(f'<{tag}{self._attrs(tag, attrs)}>')
+        if tag not in VOID_TAGS:
+            self.open.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS or tag not in ALLOWED_TAGS:
+            return
+        self.out.append(f'<{tag}{self._attrs(tag, attrs)}>')
+        if tag not in VOID_TAGS:
+            self.out.append(f'</{tag}>')
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT_TAGS:
+            if self.dropping:
+                self.dropping -= 1
+                if not self.dropping:
+                    # Closed: discard everything rendered since the opening tag
+                    del self.out[self.drop_mark:]
+                    self.open = self.drop_open
+            return
+        if tag not in self.open:
+            return
+        # Close anything left open inside ``tag`` so the output stays balanced
+        while self.open:
+            inner = self.open.pop()
+            self.out.append(f'</{inner}>')
+            if inner == tag:
+                break
+
+    def handle_data(self, data):
+        self.out.append(html.escape(data, quote=False))
+
+    def result(self) -> str:
+        self.close()
+        self.out.extend(f'</{tag}>' for tag in reversed(self.open))
+        self.open = []
+        return ''.join(self.out)
+
+
+def sanitize(content: str) -> str:
+    """Reduce user HTML to the allow-listed tags and attributes."""
+    parser = _Sanitizer()
+    parser.feed(content or '')
+    return parser.result()
+
+
+def plain_text(content: str) -> str:
+    """Rich-text HTML to whitespace-normalized plain text."""
+    return ' '.join(html.unescape(strip_tags(content or '')).split())
+
+
+def render(content: str) -> dict:
+    """Values for the derived ``Post`` columns, keyed by field name."""
+    body = sanitize(content)
+    text = plain_text(body)
+    words = len(text.split())
+    return {
+        'content_html': responsive_html(body),
+        'excerpt': Truncator(text).words(EXCERPT_WORDS),
+        'word_count': words,
+        'reading_time': max(1, math.ceil(words / WORDS_PER_MINUTE)) if words else 0,
+    }
+
+
+def rebuild(batch_size: int = 500, only_missing: bool = False) -> int:
+    """Recompute the derived columns for existing posts. Returns the number updated.
+
+    Cached cards of the rewritten posts are invalidated, since ``bulk_update``
+    sends no ``post_save``.
+    """
+    from . import cards
+    from .models import Post
+
+    qs = Post.objects.order_by('pk')
+    if only_missing:
+        qs = qs.filter(content_html='').exclude(content='')
+    updated, batch = 0, []
+
+    def flush() -> int:
+        written = Post.objects.bulk_update(batch, RENDERED_FIELDS)
+        for post in batch:
+            cards.bump(post.pk)
+        batch.clear()
+        return written
+
+    for pk, content in qs.values_list('pk', 'content').iterator(chunk_size=batch_size):
+        batch.append(Post(pk=pk, **render(content)))
+        if len(batch) >= batch_size:
+            updated += flush()
+    if batch:
+        updated += flush()
+    return updated
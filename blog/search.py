@@ -0,0 +1,162 @@
+"""Full-text search over posts backed by an SQLite FTS5 table.
+
+``blog_post_fts`` holds one row per post (rowid = post id) with the title
+and the tag-stripped body. It is kept current from ``Post`` save/delete and
+queried with BM25 ranking; on other database backends callers fall back to
+plain ``icontains`` filtering.
+"""
+import re
+from django.db import connection
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from .models import Post
+from .rendering import plain_text
+from .pagination import CursorPage, Position, decode_cursor, encode_cursor
+
+FTS_TABLE = 'blog_post_fts'
+# bm25() column weights: a title hit counts ten times a body hit
+RANK = f'bm25({FTS_TABLE}, 10.0, 1.0)'
+SNIPPET_TOKENS = 24
+_MARK_OPEN, _MARK_CLOSE = '\x02', '\x03'
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def is_available() -> bool:
+    return connection.vendor == 'sqlite'
+
+
+def build_match(q: str) -> str | None:
+    """Turn free text into an FTS5 query: every word must match, last one as a prefix."""
+    words = _WORD.findall(q)
+    if not words:
+        return None
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def index_post(post: Post) -> None:
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, body, type) VALUES (%s, %s, %s, %s)',
+            [post.pk, post.title, plain_text(post.content), post.type],
+        )
+
+
+def remove_post(pk: int) -> None:
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [pk])
+
+
+def rebuild(batch_size: int = 1000) -> int:
+    """Re-index every post. Returns the number of rows written."""
+    written = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        rows = Post.objects.order_by().values_list('pk', 'title', 'content', 'type').iterator(chunk_size=batch_size)
+        batch = []
+        for pk, title, content, type_ in rows:
+            batch.append((pk, title, plain_text(content), type_))
+            if len(batch) >= batch_size:
+                cursor.executemany(f'INSERT INTO {FTS_TABLE} (rowid, title, body, type) VALUES (%s, %s, %s, %s)', batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(f'INSERT INTO {FTS_TABLE} (rowid, title, body, type) VALUES (%s, %s, %s, %s)', batch)
+            written += len(batch)
+    return written
+
+
+def _highlight(snippet: str) -> str:
+    return mark_safe(escape(snippet).replace(_MARK_OPEN, '<mark>').replace(_MARK_CLOSE, '</mark>'))
+
+
+class SearchResults:
+    """Ranked search results, paged with keyset cursors over ``(bm25 rank, post id)``.
+
+    Each page runs one ranked FTS query for the window, one snippet query for
+    the hits on that page and one query loading the posts, which get a
+    ``search_snippet`` attribute.
+    """
+
+    def __init__(self, q: str, post_type: str | None = None, queryset=None):
+        self.match = build_match(q)
+        self.post_type = post_type
+        self.queryset = queryset if queryset is not None else Post.objects.all()
+
+    def _where(self) -> tuple[str, list]:
+        sql, params = f'{FTS_TABLE} MATCH %s', [self.match]
+        if self.post_type:
+            sql += ' AND type = %s'
+            params.append(self.post_type)
+        return sql, params
+
+    def _ranked(self, position: Position | None, limit: int) -> list[tuple[int, float]]:
+        where, params = self._where()
+        sql = f'SELECT rowid, rank FROM (SELECT rowid, {RANK} AS rank FROM {FTS_TABLE} WHERE {where})'
+        order = 'rank, rowid'
+        if position is not None:
+            op = '<' if position.backwards else '>'
+            sql += f' WHERE rank {op} %s OR (rank = %s AND rowid {op} %s)'
+            params += [position.key, position.key, position.pk]
+            if position.backwards:
+                order = 'rank DESC, rowid DESC'
+        with connection.cursor() as cursor:
+            cursor.execute(f'{sql} ORDER BY {order} LIMIT %s', params + [limit])
+            return cursor.fetchall()
+
+    def _snippets(self, pks: list[int]) -> dict[int, str]:
+        where, params = self._where()
+        placeholders = ', '.join(['%s'] * len(pks))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, snippet({FTS_TABLE}, 1, char(2), char(3), '…', {SNIPPET_TOKENS}) "
+                f'FROM {FTS_TABLE} WHERE {where} AND rowid IN ({placeholders})',
+                params + pks,
+            )
+            return dict(cursor.fetchall())
+
+    def page(self, token: str | None, per_page: int) -> CursorPage:
+        position = decode_cursor(token)
+        if position is not None and not isinstance(position.key, (int, float)):
+            position = None
+        if not self.match:
+            return CursorPage([], None, None)
+        hits = self._ranked(position, per_page + 1)
+        more, hits = len(hits) > per_page, hits[:per_page]
+        if position is not None and position.backwards:
+            hits.reverse()
+        has_next = more if position is None or not position.backwards else True
+        has_previous = position is not None and (more if position.backwards else True)
+        if not hits:
+            return CursorPage([], None, None)
+        snippets = self._snippets([pk for pk, _ in hits])
+        posts = self.queryset.in_bulk([pk for pk, _ in hits])
+        ranked = []
+        for pk, _ in hits:
+            post = posts.get(pk)
+            if post is not None:
+                snippet = snippets.get(pk)
+                post.search_snippet = _highlight(snippet) if snippet else ''
+                ranked.append(post)
+        first, last = hits[0], hits[-1]
+        return CursorPage(
+            ranked,
+            encode_cursor(last[1], last[0]) if has_next else None,
+            encode_cursor(first[1], first[0], backwards=True) if has_previous else None,
+        )
+
+
+@receiver(post_save, sender=Post)
+def index_on_save(sender, instance, raw=False, **kwargs):
+    if not raw and is_available():
+        index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_on_delete(sender, instance, **kwargs):
+    if is_available():
+        remove_post(instance.pk)
@@ -1,3 +1,464 @@
-from django.test import TestCase
+import os
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from accounts.models import Profile
+from follows.models import Follow
+from . import cards, counters, polls, search, timeline
+from .models import Comment, PollOption, PollVote, Post, TimelineEntry
+from .pagination import CursorPaginator, decode_cursor, encode_cursor
+from .rendering import clean_style, render, sanitize
+
+
+class SanitizeTests(SimpleTestCase):
+    def test_keeps_allowed_markup(self):
+        html = '<p>Hello <strong>world</strong> <a href="/x" title="t">link</a></p>'
+        self.assertEqual(sanitize(html), html)
+
+    def test_drops_unknown_tags_but_keeps_their_text(self):
+        self.assertEqual(sanitize('<p><blink>hi</blink></p>'), '<p>hi</p>')
+
+    def test_drops_script_and_event_handlers(self):
+        self.assertEqual(
+            sanitize('<p onclick="x()">a<script>alert(1)</script>b</p>'),
+            '<p>ab</p>',
+        )
+
+    def test_rejects_unsafe_urls(self):
+        self.assertEqual(sanitize('<a href="java\tscript:alert(1)">x</a>'), '<a>x</a>')
+        self.assertEqual(sanitize('<img src="data:image/png;base64,AAAA">'), '<img>')
+        self.assertEqual(sanitize('<a href="https://example.com/">x</a>'), '<a href="https://example.com/">x</a>')
+
+    def test_target_forces_noopener(self):
+        self.assertEqual(
+            sanitize('<a href="/" target="_blank" rel="opener">x</a>'),
+            '<a href="/" target="_blank" rel="noopener noreferrer">x</a>',
+        )
+
+    def test_escapes_text_and_attributes(self):
+        self.assertEqual(sanitize('<p title="&quot;><b>">1 &lt; 2</p>'), '<p title="&quot;&gt;&lt;b&gt;">1 &lt; 2</p>')
+
+    def test_balances_unclosed_tags(self):
+        self.assertEqual(sanitize('<ul><li><em>a</ul>tail'), '<ul><li><em>a</em></li></ul>tail')
+
+    def test_unclosed_drop_tag_keeps_the_rest(self):
+        self.assertEqual(sanitize('<p>a</p><iframe><p>b <em>c</em></p>'), '<p>a</p><p>b <em>c</em></p>')
+        self.assertEqual(sanitize('<p>a<textarea>b'), '<p>ab</p>')
+        rendered = render('<p>one two</p>\n<textarea>three four')
+        self.assertEqual(rendered['word_count'], 4)
+        self.assertIn('three four', rendered['excerpt'])
+
+    def test_closed_drop_tag_nested_in_markup(self):
+        self.assertEqual(sanitize('<div><p>a<iframe><b>x</b></iframe>b</p></div>'), '<div><p>ab</p></div>')
+
+
+class StyleTests(SimpleTestCase):
+    def test_keeps_allowed_declarations(self):
+        self.assertEqual(
+            clean_style('text-align: center; COLOR:#333;width:50%; background-color: rgb(1, 2, 3)'),
+            'text-align: center; color: #333; width: 50%; background-color: rgb(1, 2, 3)',
+        )
+
+    def test_drops_unknown_properties_and_functions(self):
+        self.assertEqual(clean_style('position: fixed; top: 0; color: red'), 'color: red')
+        self.assertEqual(clean_style('background: url(http://evil/)'), '')
+        self.assertEqual(clean_style('width: expression(alert(1))'), '')
+
+    def test_css_escapes_are_rejected(self):
+        self.assertEqual(clean_style('background-color:\\75rl(http://evil/)'), '')
+        self.assertEqual(clean_style('color: \\72 ed'), '')
+        self.assertEqual(
+            sanitize('<p style="background:\\75rl(http://evil/)">x</p>'),
+            '<p>x</p>',
+        )
+        self.assertEqual(
+            sanitize('<p style="text-align:right;background-color:\\75rl(x)">x</p>'),
+            '<p style="text-align: right">x</p>',
+        )
+
+
+def make_poll(author, max_choices=1, options=4) -> tuple[Post, list[PollOption]]:
+    post = Post.objects.create(author=author, title='Poll', type='poll', max_choices=max_choices)
+    return post, [PollOption.objects.create(post=post, text=f'Option {i}') for i in range(options)]
+
+
+class PollVoteTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('voter')
+        self.single, self.single_options = make_poll(self.user)
+        self.multi, self.multi_options = make_poll(self.user, max_choices=2)
+
+    def counts(self, options) -> list[int]:
+        return list(PollOption.objects.filter(pk__in=[o.pk for o in options]).order_by('pk')
+                    .values_list('votes_count', flat=True))
+
+    def test_single_choice_moves_the_vote(self):
+        a, b = self.single_options[:2]
+        self.assertEqual(polls.toggle_vote(self.single, a, self.user), {a.pk})
+        self.assertEqual(polls.toggle_vote(self.single, b, self.user), {b.pk})
+        self.assertEqual(self.counts(self.single_options), [0, 1, 0, 0])
+        self.assertEqual(polls.toggle_vote(self.single, b, self.user), set())
+        self.assertEqual(self.counts(self.single_options), [0, 0, 0, 0])
+
+    def test_max_choices_is_enforced(self):
+        a, b, c, _ = self.multi_options
+        polls.toggle_vote(self.multi, a, self.user)
+        polls.toggle_vote(self.multi, b, self.user)
+        with self.assertRaises(polls.VoteError):
+            polls.toggle_vote(self.multi, c, self.user)
+        self.assertEqual(polls.user_selection(self.multi, self.user), {a.pk, b.pk})
+        self.assertEqual(polls.toggle_vote(self.multi, a, self.user), {b.pk})
+        self.assertEqual(polls.toggle_vote(self.multi, c, self.user), {b.pk, c.pk})
+        self.assertEqual(self.counts(self.multi_options), [0, 1, 1, 0])
+
+    def test_query_count_does_not_grow_with_options(self):
+        post, options = make_poll(self.user, max_choices=20, options=20)
+        for option in options[:10]:
+            polls.toggle_vote(post, option, self.user)
+        with self.assertNumQueries(6):
+            polls.toggle_vote(post, options[10], self.user)
+
+
+class VoteRaceTests(TransactionTestCase):
+    """Concurrent votes against a file database, where SQLite's locking is real."""
+
+    def race(self, post, options, user) -> list:
+        path = os.path.join(self.tmp, 'race.sqlite3')
+        connection.ensure_connection()
+        target = sqlite3.connect(path)
+        connection.connection.backup(target)
+        target.close()
+        barrier = threading.Barrier(len(options))
+
+        def vote(option):
+            try:
+                barrier.wait()
+                return polls.toggle_vote(post, option, user)
+            except polls.VoteError:
+                return None
+            finally:
+                connections.close_all()
+
+        with mock.patch.dict(connections.settings['default'], {'NAME': path}):
+            with ThreadPoolExecutor(len(options)) as pool:
+                outcomes = list(pool.map(vote, options))
+        with sqlite3.connect(path) as db:
+            self.rows = db.execute(
+                f'SELECT option_id FROM {PollVote._meta.db_table} WHERE user_id = ?', [user.pk]
+            ).fetchall()
+            self.counters = db.execute(
+                f'SELECT SUM(votes_count) FROM {PollOption._meta.db_table} WHERE post_id = ?', [post.pk]
+            ).fetchone()[0]
+        return outcomes
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        self.user = User.objects.create_user('voter')
+
+    def test_racing_votes_stay_within_max_choices(self):
+        post, options = make_poll(self.user, max_choices=2, options=8)
+        outcomes = self.race(post, options, self.user)
+        self.assertEqual(len(self.rows), 2)
+        self.assertEqual(self.counters, 2)
+        self.assertEqual(sum(1 for outcome in outcomes if outcome is None), 6)
+
+    def test_racing_single_choice_votes_keep_one(self):
+        post, options = make_poll(self.user, options=8)
+        self.race(post, options, self.user)
+        self.assertEqual(len(self.rows), 1)
+        self.assertEqual(self.counters, 1)
+
+    def test_racing_double_vote_is_recorded_once_or_undone(self):
+        post, options = make_poll(self.user, max_choices=2)
+        self.race(post, [options[0]] * 2, self.user)
+        self.assertEqual(len(self.rows), 0)
+        self.assertEqual(self.counters, 0)
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        self.alice, self.bob = User.objects.create_user('alice'), User.objects.create_user('bob')
+        self.post = Post.objects.create(author=self.alice, title='Counted')
+
+    def counts(self) -> tuple[int, int]:
+        self.post.refresh_from_db()
+        return self.post.likes_count, self.post.comments_count
+
+    def test_likes_and_comments_move_the_counters(self):
+        self.post.likes.add(self.alice)
+        self.bob.liked_posts.add(self.post)
+        self.post.likes.add(self.alice)  # already liked; not counted twice
+        comment = Comment.objects.create(post=self.post, author=self.bob, content='hi')
+        self.assertEqual(self.counts(), (2, 1))
+        self.post.likes.remove(self.alice, self.bob)
+        self.bob.liked_posts.remove(self.post)  # already removed
+        comment.delete()
+        self.assertEqual(self.counts(), (0, 0))
+
+    def test_full_save_of_a_stale_instance_keeps_the_counters(self):
+        stale = Post.objects.get(pk=self.post.pk)
+        self.post.likes.add(self.bob)
+        stale.title = 'Renamed'
+        stale.save()
+        self.assertEqual(self.counts(), (1, 0))
+        self.assertEqual(self.post.title, 'Renamed')
+
+    def test_drift_is_found_and_repaired(self):
+        self.post.likes.add(self.bob)
+        Post.objects.filter(pk=self.post.pk).update(likes_count=7, comments_count=3)
+        self.assertEqual(counters.find_drift(Post, 'likes_count'), [(self.post.pk, 7, 1)])
+        with self.assertRaises(CommandError):
+            call_command('rebuild_counters', '--check', stdout=StringIO())
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertEqual(self.counts(), (1, 0))
+        self.assertEqual(counters.find_drift(Post, 'comments_count'), [])
+
+
+class TimelineTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader, self.author, self.star = (User.objects.create_user(n) for n in ('reader', 'author', 'star'))
+
+    def feed(self, token=None, limit=10):
+        posts, next_cursor = timeline.read(self.reader, token, limit)
+        return [p.title for p in posts], next_cursor
+
+    def test_posts_fan_out_to_followers(self):
+        Follow.objects.create(follower=self.reader, following=self.author)
+        Post.objects.create(author=self.author, title='new')
+        Post.objects.create(author=self.star, title='not followed')
+        self.assertEqual(self.feed()[0], ['new'])
+
+    def test_follow_backfills_and_unfollow_retracts(self):
+        for i in range(3):
+            Post.objects.create(author=self.author, title=f'old {i}')
+        rel = Follow.objects.create(follower=self.reader, following=self.author)
+        self.assertEqual(self.feed()[0], ['old 2', 'old 1', 'old 0'])
+        rel.delete()
+        self.assertEqual(self.feed()[0], [])
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader).exists())
+
+    def test_pages_follow_the_cursor(self):
+        Follow.objects.create(follower=self.reader, following=self.author)
+        for i in range(5):
+            Post.objects.create(author=self.author, title=f'p{i}')
+        first, token = self.feed(limit=2)
+        second, token = self.feed(token, limit=2)
+        last, end = self.feed(token, limit=2)
+        self.assertEqual(first + second + last, ['p4', 'p3', 'p2', 'p1', 'p0'])
+        self.assertIsNone(end)
+
+    def test_popular_authors_are_merged_at_read_time(self):
+        Follow.objects.create(follower=self.reader, following=self.author)
+        Follow.objects.create(follower=self.reader, following=self.star)
+        Follow.objects.create(follower=self.author, following=self.star)
+        with mock.patch.object(timeline, 'FANOUT_LIMIT', 1):
+            Post.objects.create(author=self.author, title='pushed')
+            Post.objects.create(author=self.star, title='pulled')
+            self.assertFalse(TimelineEntry.objects.filter(author=self.star).exists())
+            self.assertEqual(self.feed()[0], ['pulled', 'pushed'])
+            first, token = self.feed(limit=1)
+            self.assertEqual(first + self.feed(token, limit=1)[0], ['pulled', 'pushed'])
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author')
+
+    def post(self, title, content='', **kwargs):
+        return Post.objects.create(author=self.author, title=title, content=content, **kwargs)
+
+    def titles(self, q, token=None, per_page=10, post_type=None):
+        page = search.SearchResults(q, post_type).page(token, per_page)
+        return [p.title for p in page.object_list], page
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(search.build_match('foo" OR bar'), '"foo" "OR" "bar"*')
+        self.assertIsNone(search.build_match(' "*- ()'))
+        self.post('NEAR rocks', '<p>AND OR NOT</p>')
+        for q in ('NEAR(', 'a"b', '-rocks', 'OR', 'title:rocks', '^near', 'rocks*'):
+            self.titles(q)  # must not raise an FTS5 syntax error
+        self.assertEqual(self.titles('near(rocks')[0], ['NEAR rocks'])
+
+    def test_title_hits_rank_first_and_last_word_is_a_prefix(self):
+        self.post('Cooking notes', '<p>About python snakes</p>')
+        self.post('Python tips', '<p>Short</p>')
+        self.post('Gardening', '<p>Nothing here</p>')
+        self.assertEqual(self.titles('pyth')[0], ['Python tips', 'Cooking notes'])
+
+    def test_index_follows_saves_and_deletes(self):
+        post = self.post('Draft', '<p>alpha</p>')
+        post.content = '<p>beta</p>'
+        post.save()
+        self.assertEqual(self.titles('alpha')[0], [])
+        self.assertEqual(self.titles('beta')[0], ['Draft'])
+        post.delete()
+        self.assertEqual(self.titles('beta')[0], [])
+
+    def test_type_filter_snippets_and_paging(self):
+        for i in range(5):
+            self.post(f'Match {i}', f'<p>keyword <b>&lt;{i}&gt;</b></p>')
+        self.post('Poll match', '<p>keyword</p>', type='poll')
+        self.assertEqual(self.titles('keyword', post_type='poll')[0], ['Poll match'])
+        first, page = self.titles('keyword', per_page=4)
+        second, next_page = self.titles('keyword', page.next_cursor, per_page=4)
+        self.assertEqual(len(set(first + second)), 6)
+        self.assertIsNone(next_page.next_cursor)
+        back, _ = self.titles('keyword', next_page.prev_cursor, per_page=4)
+        self.assertEqual(back, first)
+        snippet = page.object_list[0].search_snippet
+        self.assertIn('<mark>keyword</mark>', snippet)
+        self.assertNotIn('<b>', snippet)
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        author = User.objects.create_user('author')
+        self.posts = [Post.objects.create(author=author, title=f'p{i}') for i in range(7)]
+        # Ties on created_at are broken by id
+        Post.objects.filter(pk__in=[p.pk for p in self.posts[2:5]]).update(created_at=self.posts[2].created_at)
+        self.newest_first = [p.title for p in Post.objects.order_by('-created_at', '-id')]
+
+    def page(self, token=None):
+        page = CursorPaginator(Post.objects.all(), 3).page(token)
+        return [p.title for p in page], page
+
+    def test_walks_forwards_and_backwards_without_gaps(self):
+        seen, token, pages = [], None, []
+        while True:
+            titles, page = self.page(token)
+            seen += titles
+            pages.append(titles)
+            if not page.has_next:
+                break
+            token = page.next_cursor
+        self.assertEqual(seen, self.newest_first)
+        self.assertFalse(self.page()[1].has_previous)
+        back, previous = self.page(page.prev_cursor)
+        self.assertEqual(back, pages[-2])
+        self.assertEqual(self.page(previous.prev_cursor)[0], pages[0])
+
+    def test_new_rows_do_not_shift_later_pages(self):
+        first, page = self.page()
+        Post.objects.create(author=self.posts[0].author, title='newer')
+        second, _ = self.page(page.next_cursor)
+        self.assertEqual(first + second, self.newest_first[:6])
+
+    def test_malformed_cursors_start_over(self):
+        first = self.page()[0]
+        for token in ('garbage', encode_cursor('not a date', 1), 'W10', encode_cursor(None, 'x')):
+            self.assertEqual(self.page(token)[0], first, token)
+        self.assertIsNone(decode_cursor('%%%'))
+
+
+class SlugTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author')
+
+    def post(self, title='Hello world', content=''):
+        return Post.objects.create(author=self.author, title=title, content=content)
+
+    def test_duplicates_get_the_next_free_suffix(self):
+        slugs = [self.post().slug for _ in range(3)]
+        self.assertEqual(slugs, ['hello-world', 'hello-world-2', 'hello-world-3'])
+        Post.objects.filter(slug='hello-world-3').update(slug='hello-world-9')
+        self.post('Hello world extra')  # a longer slug sharing the prefix is not a suffix
+        self.assertEqual(self.post().slug, 'hello-world-10')
+        self.assertEqual(self.post().slug, 'hello-world-11')
+
+    def test_allocation_is_one_query(self):
+        for _ in range(5):
+            self.post()
+        with self.assertNumQueries(1):
+            self.assertEqual(Post(title='Hello world')._generate_unique_slug(), 'hello-world-6')
+
+    def test_untitled_posts_use_their_first_words(self):
+        self.assertEqual(self.post('', '<p>Just <b>a</b> quick status update today</p>').slug,
+                         'just-a-quick-status-update-today')
+        self.assertEqual(self.post('', '<p>!!!</p>').slug, 'post')
+
+    def test_lost_race_retries_with_a_fresh_slug(self):
+        self.post()
+        original = Post._generate_unique_slug
+        attempts = []
+
+        def stale(post):
+            # The first attempt sees the database from before the other insert
+            attempts.append(post)
+            return 'hello-world' if len(attempts) == 1 else original(post)
+
+        with mock.patch.object(Post, '_generate_unique_slug', stale):
+            self.assertEqual(self.post().slug, 'hello-world-2')
+        self.assertEqual(len(attempts), 2)
+
+
+class CardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(cards, 'ENABLED', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.alice, self.bob = User.objects.create_user('alice'), User.objects.create_user('bob')
+        self.post = Post.objects.create(author=self.alice, title='Card', content='<p>Body</p>')
+
+    def render(self, viewer=None) -> tuple[str, int]:
+        request = mock.Mock(user=viewer) if viewer else None
+        post = Post.objects.select_related('author__profile').get(pk=self.post.pk)
+        with mock.patch.object(cards, '_render', wraps=cards._render) as rendered:
+            [post] = cards.render_cards([post], request)
+        return str(post.card_html), rendered.call_count
+
+    def test_second_render_is_a_hit(self):
+        cards.reset_stats()
+        self.assertEqual(self.render()[1], 1)
+        html, rendered = self.render()
+        self.assertEqual(rendered, 0)
+        self.assertIn('ago', html)
+        self.assertNotIn('<!--card:', html)
+        self.assertEqual(cards.stats()['hits'], 1)
+
+    def test_likes_comments_and_edits_invalidate(self):
+        self.render()
+        self.post.likes.add(self.bob)
+        html, rendered = self.render()
+        self.assertEqual(rendered, 1)
+        self.assertIn('<span class="ms-1 like-count">1</span>', html)
+        Comment.objects.create(post=self.post, author=self.bob, content='hi')
+        self.assertIn('<span class="ms-1 comment-count">1</span>', self.render()[0])
+        self.post.title = 'Edited'
+        self.post.save()
+        self.assertIn('Edited', self.render()[0])
+        self.assertEqual(self.render()[1], 0)
+
+    def test_liked_state_is_filled_in_per_viewer(self):
+        self.post.likes.add(self.bob)
+        self.render()
+        bob_html, rendered = self.render(self.bob)
+        alice_html, _ = self.render(self.alice)
+        self.assertEqual(rendered, 0)
+        self.assertIn('like-btn liked', bob_html)
+        self.assertNotIn('like-btn liked', alice_html)
+
+    def test_author_profile_changes_invalidate(self):
+        self.render()
+        profile = self.alice.profile
+        Profile.objects.filter(pk=profile.pk).update(updated_at=profile.updated_at + timedelta(seconds=5))
+        self.assertEqual(self.render()[1], 1)
+
+    def test_disabled_cache_renders_every_time(self):
+        with mock.patch.object(cards, 'ENABLED', False):
+            self.render()
+            self.assertEqual(self.render()[1], 1)
@@ -0,0 +1,142 @@
+"""Fan-out-on-write home timeline.
+
+Creating a post copies a ``TimelineEntry`` row to each follower, following
+someone backfills their recent posts and unfollowing retracts them, so the
+home feed is a single range scan over ``(user, -created_at, -post)``.
+Authors with more than ``TIMELINE_FANOUT_LIMIT`` followers are not fanned
+out; their posts are merged in at read time instead.
+"""
+from datetime import datetime
+from itertools import islice
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from follows import followset
+from follows.models import Follow
+from .models import Post, TimelineEntry
+from .pagination import decode_cursor, encode_cursor, older_than
+
+FANOUT_LIMIT = getattr(settings, 'TIMELINE_FANOUT_LIMIT', 10_000)
+BACKFILL_SIZE = getattr(settings, 'TIMELINE_BACKFILL_SIZE', 200)
+BATCH_SIZE = 1000
+
+
+def _is_pull_author(author_id: int) -> bool:
+    from accounts.models import Profile
+    followers = Profile.objects.filter(user_id=author_id).values_list('followers_count', flat=True).first()
+    return (followers or 0) > FANOUT_LIMIT
+
+
+def pull_authors() -> list[int]:
+    """Ids of authors above the fan-out limit; a short range scan on the followers_count index."""
+    from accounts.models import Profile
+    return list(Profile.objects.filter(followers_count__gt=FANOUT_LIMIT).values_list('user_id', flat=True))
+
+
+def _write(entries) -> int:
+    written = 0
+    entries = iter(entries)
+    while batch := list(islice(entries, BATCH_SIZE)):
+        TimelineEntry.objects.bulk_create(batch, batch_size=BATCH_SIZE, ignore_conflicts=True)
+        written += len(batch)
+    return written
+
+
+def fan_out_post(post: Post) -> int:
+    """Copy ``post`` into its author's followers' timelines."""
+    if _is_pull_author(post.author_id):
+        return 0
+    follower_ids = (
+        Follow.objects.filter(following_id=post.author_id)
+        .values_list('follower_id', flat=True)
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    return _write(
+        TimelineEntry(user_id=uid, post_id=post.pk, author_id=post.author_id, created_at=post.created_at)
+        for uid in follower_ids
+    )
+
+
+def backfill_follow(follower_id: int, following_id: int) -> int:
+    """Copy the most recent posts of ``following_id`` into ``follower_id``'s timeline."""
+    if _is_pull_author(following_id):
+        return 0
+    recent = (
+        Post.objects.filter(author_id=following_id)
+        .order_by('-created_at', '-id')
+        .values_list('id', 'created_at')[:BACKFILL_SIZE]
+    )
+    return _write(
+        TimelineEntry(user_id=follower_id, post_id=pk, author_id=following_id, created_at=created_at)
+        for pk, created_at in recent
+    )
+
+
+def retract_follow(follower_id: int, following_id: int) -> int:
+    """Drop every post of ``following_id`` from ``follower_id``'s timeline in one DELETE."""
+    deleted, _ = TimelineEntry.objects.filter(user_id=follower_id, author_id=following_id).delete()
+    return deleted
+
+
+def rebuild(user_ids=None) -> int:
+    """Recreate timelines from the follow graph (all users, or just ``user_ids``)."""
+    follows = Follow.objects.all()
+    entries = TimelineEntry.objects.all()
+    if user_ids is not None:
+        follows = follows.filter(follower_id__in=user_ids)
+        entries = entries.filter(user_id__in=user_ids)
+    entries.delete()
+    written = 0
+    for follower_id, following_id in follows.values_list('follower_id', 'following_id').iterator(chunk_size=BATCH_SIZE):
+        written += backfill_follow(follower_id, following_id)
+    return written
+
+
+def read(user, token: str | None = None, limit: int = 10) -> tuple[list[Post], str | None]:
+    """Return one page of ``user``'s following feed and the cursor for the next page."""
+    position = decode_cursor(token)
+    try:
+        boundary = (datetime.fromisoformat(position.key), position.pk) if position else None
+    except (TypeError, ValueError):
+        boundary = None
+    entries = TimelineEntry.objects.filter(user=user).order_by('-created_at', '-post_id')
+    if boundary:
+        entries = entries.filter(older_than(*boundary, pk_field='post_id'))
+    posts = [
+        e.post for e in entries.select_related('post__author__profile')
+        .defer('post__content', 'post__content_html')[:limit + 1]
+    ]
+    pull_ids = pull_authors()
+    if pull_ids:
+        following = followset.get(user.pk)
+        pull_ids = [author_id for author_id in pull_ids if author_id in following]
+    if pull_ids:
+        pulled = (
+            Post.objects.filter(author_id__in=pull_ids).select_related('author__profile')
+            .defer('content', 'content_html').order_by('-created_at', '-id')
+        )
+        if boundary:
+            pulled = pulled.filter(older_than(*boundary))
+        seen = {p.pk for p in posts}
+        posts.extend(p for p in pulled[:limit + 1] if p.pk not in seen)
+        posts.sort(key=lambda p: (p.created_at, p.pk), reverse=True)
+    page = posts[:limit]
+    next_cursor = encode_cursor(page[-1].created_at, page[-1].pk) if len(posts) > limit else None
+    return page, next_cursor
+
+
+@receiver(post_save, sender=Post)
+def fan_out_on_create(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        fan_out_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_on_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        backfill_follow(instance.follower_id, instance.following_id)
+
+
+@receiver(post_delete, sender=Follow)
+def retract_on_unfollow(sender, instance, **kwargs):
+    retract_follow(instance.follower_id, instance.following_id)
@@ -0,0 +1,165 @@
+"""Content-addressed storage for CKEditor uploads.
+
+``ckeditor_uploader`` writes every upload under its (slugified) original
+name, so the same screenshot pasted into ten articles is stored ten times and
+phone photos land in articles at full resolution. ``ContentAddressedStorage``
+(set as ``CKEDITOR_STORAGE_BACKEND``) names files after the SHA-256 of the
+uploaded bytes instead, returns the existing file for repeat uploads, and
+caps and recompresses images on the way in. Stored image names carry their
+dimensions (``uploads/ab/<hash>-1600x900.jpg``) and narrower copies are
+written to ``responsive/``, so :func:`responsive_html` can add ``srcset``
+to article images without any lookups.
+"""
+import hashlib
+import os
+import re
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from PIL import Image, ImageOps
+
+UPLOAD_PATH = getattr(settings, 'CKEDITOR_UPLOAD_PATH', 'uploads/')
+VARIANT_PATH = 'responsive/'
+MAX_DIMENSION = getattr(settings, 'CKEDITOR_MAX_IMAGE_DIMENSION', 2048)
+JPEG_QUALITY = getattr(settings, 'CKEDITOR_IMAGE_QUALITY', 82)
+VARIANT_WIDTHS = (480, 960, 1440)
+CONTENT_SIZES = '(max-width: 768px) 100vw, 768px'
+
+# Formats that are decoded, capped and re-encoded; anything else (GIFs,
+# documents) is stored byte for byte.
+ENCODERS = {
+    'JPEG': ('jpg', {'quality': JPEG_QUALITY, 'optimize': True, 'progressive': True}),
+    'PNG': ('png', {'optimize': True}),
+    'WEBP': ('webp', {'quality': JPEG_QUALITY}),
+}
+NAME_RE = re.compile(r'(?P<digest>[0-9a-f]{32})-(?P<width>\d+)x(?P<height>\d+)\.(?P<ext>jpg|png|webp)$')
+
+
+def _encode(image: Image.Image, fmt: str) -> bytes:
+    buf = BytesIO()
+    if fmt == 'JPEG':
+        image = image.convert('RGB')
+    image.save(buf, fmt, **ENCODERS[fmt][1])
+    return buf.getvalue()
+
+
+def _process(data: bytes):
+    """Return ``(bytes, ext, image)`` for a capped image, or None to store as-is."""
+    try:
+        image = Image.open(BytesIO(data))
+        fmt = image.format
+        if fmt not in ENCODERS or getattr(image, 'is_animated', False):
+            return None
+        original_size = image.size
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((MAX_DIMENSION, MAX_DIMENSION), Image.Resampling.LANCZOS)
+        encoded = _encode(image, fmt)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+    if image.size == original_size and len(encoded) >= len(data):
+        # Already small and well compressed; keep the original bytes.
+        encoded = data
+    return encoded, ENCODERS[fmt][0], image
+
+
+def variant_name(digest: str, width: int, ext: str) -> str:
+    return f'{VARIANT_PATH}{digest[:2]}/{digest}-{width}w.{ext}'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage that deduplicates and downsizes uploads."""
+
+    def get_available_name(self, name, max_length=None):
+        # Browser thumbnails are named after the hashed original, so an
+        # existing one already holds the same picture.
+        if self._is_thumbnail(name):
+            return name
+        return super().get_available_name(name, max_length)
+
+    @staticmethod
+    def _is_thumbnail(name: str) -> bool:
+        return os.path.splitext(name)[0].endswith('_thumb')
+
+    def _save(self, name, content):
+        if self._is_thumbnail(name):
+            return self._save_once(name, content)
+        content.seek(0)
+        data = content.read()
+        digest = hashlib.sha256(data).hexdigest()[:32]
+        bucket = f'{UPLOAD_PATH.rstrip("/")}/{digest[:2]}'
+        existing = self._find(bucket, digest)
+        if existing:
+            return existing
+        processed = _process(data)
+        if processed is None:
+            ext = os.path.splitext(name)[1].lower()
+            return super()._save(f'{bucket}/{digest}{ext}', ContentFile(data))
+        encoded, ext, image = processed
+        width, height = image.size
+        saved = super()._save(f'{bucket}/{digest}-{width}x{height}.{ext}', ContentFile(encoded))
+        fmt = next(fmt for fmt, (fmt_ext, _) in ENCODERS.items() if fmt_ext == ext)
+        for variant_width in VARIANT_WIDTHS:
+            if variant_width >= width:
+                break
+            variant = image.copy()
+            variant.thumbnail((variant_width, MAX_DIMENSION), Image.Resampling.LANCZOS)
+            path = variant_name(digest, variant_width, ext)
+            if not self.exists(path):
+                super()._save(path, ContentFile(_encode(variant, fmt)))
+        return saved
+
+    def _save_once(self, name, content) -> str:
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            with open(path, 'xb') as fh:
+                for chunk in content.chunks():
+                    fh.write(chunk)
+        except FileExistsError:
+            pass
+        return name
+
+    def _find(self, bucket: str, digest: str) -> str | None:
+        try:
+            _, files = self.listdir(bucket)
+        except FileNotFoundError:
+            return None
+        for filename in files:
+            if filename.startswith(digest) and not self._is_thumbnail(filename):
+                return f'{bucket}/{filename}'
+        return None
+
+
+_IMG_RE = re.compile(r'<img\b[^>]*>', re.IGNORECASE)
+_SRC_RE = re.compile(r'\ssrc=(["\'])(?P<src>[^"\']+)\1', re.IGNORECASE)
+
+
+def _srcset_tag(match: re.Match) -> str:
+    tag = match.group(0)
+    src = _SRC_RE.search(tag)
+    if not src or 'srcset=' in tag.lower():
+        return tag
+    name = NAME_RE.search(src.group('src'))
+    if not name:
+        return tag
+    digest, ext = name.group('digest'), name.group('ext')
+    width, height = int(name.group('width')), int(name.group('height'))
+    widths = [w for w in VARIANT_WIDTHS if w < width]
+    if not widths:
+        return tag
+    candidates = [f'{settings.MEDIA_URL}{variant_name(digest, w, ext)} {w}w' for w in widths]
+    candidates.append(f"{src.group('src')} {width}w")
+    extra = f' srcset="{", ".join(candidates)}" sizes="{CONTENT_SIZES}" loading="lazy"'
+    if not re.search(r'\swidth=', tag, re.IGNORECASE):
+        extra += f' width="{width}" height="{height}"'
+    closing = '/>' if tag.endswith('/>') else '>'
+    return tag[:-len(closing)].rstrip() + extra + closing
+
+
+def responsive_html(html: str) -> str:
+    """Add ``srcset`` for stored upload variants to ``<img>`` tags in ``html``."""
+    if 'uploads/' not in html:
+        return html
+    return _IMG_RE.sub(_srcset_tag, html)
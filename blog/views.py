@@ -1,9 +1,9 @@
 from django.http import HttpRequest, HttpResponse, HttpResponseForbidden, HttpResponseNotAllowed, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from .models import Post, Comment, PollOption
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from .models import Post, Comment, PollOption, PollResult
 from .forms import (
     PostForm,
     CommentForm,
@@ -11,46 +11,48 @@ from .forms import (
     StatusPostForm,
     PollPostForm,
 )
-from follows.models import Follow
-from django.db.utils import OperationalError
+from . import cards, polls, search, timeline
+from notifications import outbox
+from .pagination import CursorPaginator
 from django.views.decorators.http import require_POST
 from django.template.loader import render_to_string
 import json
+from urllib.parse import urlencode
 
 
 def index(request: HttpRequest) -> HttpResponse:
-    qs = Post.objects.select_related('author').prefetch_related('likes', 'poll_options').all()
+    # Cards print the stored excerpt, so the article bodies never leave the database
+    qs = Post.objects.select_related('author__profile').defer('content', 'content_html')
     q = request.GET.get('q', '').strip()
     t = request.GET.get('type', '').strip()
-    if q:
-        qs = qs.filter(title__icontains=q) | qs.filter(content__icontains=q)
-    if t in ['article', 'post', 'poll']:
-        qs = qs.filter(type=t)
-    paginator = Paginator(qs, 15)
-    page = request.GET.get('page')
-    try:
-        posts = paginator.page(page)
-    except PageNotAnInteger:
-        posts = paginator.page(1)
-    except EmptyPage:
-        posts = paginator.page(paginator.num_pages)
-    return render(request, 'blog/index.html', { 'posts': posts })
+    if t not in ['article', 'post', 'poll']:
+        t = ''
+    cursor = request.GET.get('cursor')
+    if q and search.is_available():
+        # Ranked FTS5 lookup; results carry a highlighted ``search_snippet``
+        posts = search.SearchResults(q, post_type=t or None, queryset=qs).page(cursor, 15)
+    else:
+        if q:
+            qs = qs.filter(title__icontains=q) | qs.filter(content__icontains=q)
+        if t:
+            qs = qs.filter(type=t)
+        posts = CursorPaginator(qs, 15).page(cursor)
+    posts.object_list = cards.render_cards(posts, request)
+    filters = urlencode({k: v for k, v in (('q', q), ('type', t)) if v})
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        # "Load more": just the next batch of cards and the cursor after it
+        html = render_to_string('blog/_post_cards.html', {'posts': posts}, request=request)
+        return JsonResponse({'ok': True, 'html': html, 'next': posts.next_cursor})
+    return render(request, 'blog/index.html', { 'posts': posts, 'filters': filters })
 
 
 def home(request: HttpRequest) -> HttpResponse:
-    # Following feed: posts by users current user follows
-    posts = Post.objects.select_related('author').prefetch_related('likes')
+    # Following feed: posts by users current user follows, read from the materialized timeline
+    posts, next_cursor = [], None
     if request.user.is_authenticated:
-        try:
-            following_ids = Follow.objects.filter(follower=request.user).values_list('following_id', flat=True)
-            posts = posts.filter(author_id__in=following_ids)
-        except OperationalError:
-            # Follows table not migrated yet; show empty following feed
-            posts = posts.none()
-    else:
-        posts = posts.none()
-    posts = posts[:10]
-    return render(request, 'home.html', { 'posts': posts })
+        posts, next_cursor = timeline.read(request.user, request.GET.get('cursor'), limit=10)
+        posts = cards.render_cards(posts, request)
+    return render(request, 'home.html', { 'posts': posts, 'next_cursor': next_cursor })
 
 
 @login_required
@@ -65,8 +67,8 @@ def compose_status(request: HttpRequest) -> HttpResponse:
     post = Post(author=request.user, type=Post.PostType.POST, title='', content=content)
     post.save()
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        html = render_to_string('blog/_post_card.html', {'post': post}, request=request)
-        return JsonResponse({'ok': True, 'html': html})
+        post = Post.objects.select_related('author__profile').defer('content', 'content_html').get(pk=post.pk)
+        return JsonResponse({'ok': True, 'html': cards.render_cards([post], request)[0].card_html})
     messages.success(request, 'Posted!')
     return redirect('blog:index')
 
@@ -84,30 +86,17 @@ def compose_route(request: HttpRequest) -> HttpResponse:
 
 
 def detail(request: HttpRequest, slug: str) -> HttpResponse:
-    post = get_object_or_404(Post.objects.select_related('author').prefetch_related('likes', 'comments__author', 'poll_options__voters'), slug=slug)
+    post = get_object_or_404(Post.objects.select_related('author__profile', 'poll_result').prefetch_related('comments__author__profile'), slug=slug)
     comment_form = CommentForm()
     # Build poll context
-    options_data = []
-    total_votes = 0
     if getattr(post, 'is_poll', False):
-        for opt in post.poll_options.all():
-            total_votes += opt.votes_count
-        user_voted_option_ids = set()
-        if request.user.is_authenticated:
-            for opt in post.poll_options.all():
-                if opt.voters.filter(pk=request.user.pk).exists():
-                    user_voted_option_ids.add(opt.pk)
-        for opt in post.poll_options.all():
-            percent = 0
-            if total_votes > 0:
-                percent = int(round((opt.votes_count / total_votes) * 100))
-            options_data.append({
-                'id': opt.pk,
-                'text': opt.text,
-                'votes': opt.votes_count,
-                'percent': percent,
-                'selected': opt.pk in user_voted_option_ids,
-            })
+        selected = polls.user_selection(post, request.user)
+        if post.poll_has_ended:
+            # Closed polls render from their frozen snapshot (created on first view if the job hasn't run)
+            result = getattr(post, 'poll_result', None) or polls.finalize(post)
+            total_votes, options_data = polls.frozen_results(result, selected)
+        else:
+            total_votes, options_data = polls.results(post, selected)
         return render(request, 'blog/detail.html', {
             'post': post,
             'comment_form': comment_form,
@@ -186,6 +175,7 @@ def edit(request: HttpRequest, slug: str) -> HttpResponse:
         if form.is_valid():
             form.save()
             if getattr(post, 'is_poll', False):
+                PollResult.objects.filter(post=post).delete()
                 post.poll_options.all().delete()
                 option_texts = [
                     request.POST.get('option1', '').strip(),
@@ -221,16 +211,19 @@ def toggle_like(request: HttpRequest, slug: str) -> HttpResponse:
         return HttpResponseNotAllowed(['POST'])
     post = get_object_or_404(Post, slug=slug)
     liked = False
-    if request.user in post.likes.all():
+    if post.likes.filter(pk=request.user.pk).exists():
         post.likes.remove(request.user)
         liked = False
         messages.info(request, 'Unliked post')
     else:
         post.likes.add(request.user)
         liked = True
+        outbox.enqueue(post.author_id, 'like', f'liked your post "{post.title}"', actor=request.user,
+                       url=reverse('blog:detail', args=[post.slug]), target=f'post:{post.pk}')
         messages.success(request, 'Liked post')
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        return JsonResponse({'ok': True, 'liked': liked, 'count': post.likes.count()})
+        post.refresh_from_db(fields=['likes_count'])
+        return JsonResponse({'ok': True, 'liked': liked, 'count': post.likes_count})
     return redirect('blog:detail', slug=slug)
 
 
@@ -245,6 +238,8 @@ def add_comment(request: HttpRequest, slug: str) -> HttpResponse:
         comment.post = post
         comment.author = request.user
         comment.save()
+        outbox.enqueue(post.author_id, 'comment', f'commented on "{post.title}"', actor=request.user,
+                       url=reverse('blog:detail', args=[post.slug]), target=f'post:{post.pk}')
         if request.headers.get('HX-Request') == 'true' or request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             # Trigger an HTMX event with the slug so the client can update UI and close modal
             trigger = json.dumps({ 'reply:success': { 'slug': post.slug } })
@@ -274,14 +269,13 @@ def reply_route(request: HttpRequest, slug: str) -> HttpResponse:
 def vote_poll(request: HttpRequest, slug: str, option_id: int) -> HttpResponse:
     if request.method != 'POST':
         return HttpResponseNotAllowed(['POST'])
-    post = get_object_or_404(Post.objects.prefetch_related('poll_options__voters'), slug=slug)
+    post = get_object_or_404(Post, slug=slug)
     if not getattr(post, 'is_poll', False) or not post.poll_is_open:
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return JsonResponse({'ok': False, 'error': 'Poll is closed.'}, status=400)
         return redirect('blog:detail', slug=slug)
     option = get_object_or_404(PollOption, pk=option_id, post=post)
 
-    # Determine current selections by user
     user = request.user
     if not user.is_authenticated:
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -290,48 +284,20 @@ def vote_poll(request: HttpRequest, slug: str, option_id: int) -> HttpResponse:
         return redirect('accounts:login')
 
     # Toggle logic respecting max_choices
-    already_selected = option.voters.filter(pk=user.pk).exists()
-    if already_selected:
-        option.voters.remove(user)
-    else:
-        if post.max_choices <= 1:
-            # Clear previous and add this one
-            for opt in post.poll_options.all():
-                opt.voters.remove(user)
-            option.voters.add(user)
-        else:
-            current_count = 0
-            for opt in post.poll_options.all():
-                if opt.voters.filter(pk=user.pk).exists():
-                    current_count += 1
-            if current_count >= post.max_choices:
-                if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                    return JsonResponse({'ok': False, 'error': f'Max {post.max_choices} selections allowed.'}, status=400)
-                messages.error(request, f'Max {post.max_choices} selections allowed.')
-                return redirect('blog:detail', slug=slug)
-            option.voters.add(user)
+    try:
+        selected = polls.toggle_vote(post, option, user)
+    except polls.VoteError as exc:
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            return JsonResponse({'ok': False, 'error': str(exc)}, status=400)
+        messages.error(request, str(exc))
+        return redirect('blog:detail', slug=slug)
+    if option.id in selected:
+        outbox.enqueue(post.author_id, 'poll_vote', f'voted in your poll "{post.title}"', actor=user,
+                       url=reverse('blog:detail', args=[post.slug]), target=f'post:{post.pk}')
 
     # Build JSON response if AJAX
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        total_votes = 0
-        options = []
-        user_selected_ids = set()
-        for opt in post.poll_options.all():
-            total_votes += opt.votes_count
-        for opt in post.poll_options.all():
-            if opt.voters.filter(pk=user.pk).exists():
-                user_selected_ids.add(opt.pk)
-        for opt in post.poll_options.all():
-            percent = 0
-            if total_votes > 0:
-                percent = int(round((opt.votes_count / total_votes) * 100))
-            options.append({
-                'id': opt.pk,
-                'text': opt.text,
-                'votes': opt.votes_count,
-                'percent': percent,
-                'selected': opt.pk in user_selected_ids,
-            })
+        total_votes, options = polls.results(post, selected)
         return JsonResponse({'ok': True, 'total': total_votes, 'options': options, 'max': post.max_choices})
 
     messages.success(request, 'Vote updated!')
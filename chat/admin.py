@@ -1,3 +1,19 @@
 from django.contrib import admin
+from .models import Conversation, Message, Participant
 
-# Register your models here.
+
+class ParticipantInline(admin.TabularInline):
+    model = Participant
+    extra = 0
+
+
+@admin.register(Conversation)
+class ConversationAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'is_group', 'created_at', 'updated_at')
+    inlines = [ParticipantInline]
+
+
+@admin.register(Message)
+class MessageAdmin(admin.ModelAdmin):
+    list_display = ('conversation', 'author', 'created_at')
+    search_fields = ('body', 'author__username')
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.conf import settings
+
+from . import messaging
+
+logger = logging.getLogger(__name__)
+
+# Outgoing frames buffered per socket. A client that falls this far behind
+# gets the overflow dropped and a ``resync`` frame; everything is persisted,
+# so it catches up with ``history`` instead of growing server memory.
+SEND_QUEUE_SIZE = getattr(settings, 'CHAT_SEND_QUEUE_SIZE', 100)
+# Read receipts from one socket are coalesced into one write per interval.
+READ_FLUSH_INTERVAL = getattr(settings, 'CHAT_READ_FLUSH_INTERVAL', 1.0)
+
+
+class ChatConsumer(AsyncJsonWebsocketConsumer):
+    async def connect(self):
+        user = self.scope['user']
+        if user.is_anonymous:
+            await self.close()
+            return
+        self.conversation_id = int(self.scope['url_route']['kwargs']['conversation_id'])
+        if not await database_sync_to_async(messaging.is_participant)(self.conversation_id, user.id):
+            await self.close()
+            return
+        self.group_name = messaging.group_name(self.conversation_id)
+        self.outgoing = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        self.overflowed = False
+        self.pending_read = 0
+        self.flusher = None
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        self.writer = asyncio.ensure_future(self.write_loop())
+
+    async def disconnect(self, close_code):
+        if not hasattr(self, 'group_name'):
+            return
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        self.writer.cancel()
+        if self.flusher is not None:
+            self.flusher.cancel()
+        await self.flush_reads()
+
+    async def receive_json(self, content, **kwargs):
+        if not isinstance(content, dict):
+            self.queue({'type': 'error', 'error': 'Frames must be JSON objects.'})
+            return
+        kind = content.get('type')
+        if kind == 'message':
+            try:
+                payload = await database_sync_to_async(messaging.post)(
+                    self.conversation_id, self.scope['user'], content.get('body', '')
+                )
+            except messaging.ChatError as exc:
+                self.queue({'type': 'error', 'error': str(exc), 'client_id': content.get('client_id')})
+                return
+            # Echoed to the sender too; client_id lets it match its pending bubble.
+            payload['client_id'] = content.get('client_id')
+            await self.channel_layer.group_send(self.group_name, {'type': 'chat.message', 'message': payload})
+        elif kind == 'read':
+            try:
+                self.pending_read = max(self.pending_read, int(content.get('id')))
+            except (TypeError, ValueError):
+                return
+            if self.flusher is None:
+                self.flusher = asyncio.ensure_future(self.flush_reads_later())
+        elif kind == 'history':
+            before, after = content.get('before'), content.get('after')
+            try:
+                before = int(before) if before is not None else None
+                after = int(after) if after is not None else None
+            except (TypeError, ValueError):
+                self.queue({'type': 'error', 'error': 'Invalid history cursor.'})
+                return
+            messages, more = await database_sync_to_async(messaging.backlog)(
+                self.conversation_id, before=before, after=after,
+            )
+            self.queue({'type': 'history', 'messages': messages, 'more': more, 'after': after is not None})
+
+    # Group events
+
+    async def chat_message(self, event):
+        self.queue({'type': 'message', **event['message']})
+
+    async def chat_receipt(self, event):
+        self.queue({'type': 'receipt', 'user': event['user'], 'last_read_id': event['last_read_id']})
+
+    # Read receipts
+
+    async def flush_reads_later(self):
+        await asyncio.sleep(READ_FLUSH_INTERVAL)
+        self.flusher = None
+        await self.flush_reads()
+
+    async def flush_reads(self):
+        read, self.pending_read = self.pending_read, 0
+        if not read:
+            return
+        user = self.scope['user']
+        if await database_sync_to_async(messaging.mark_read)(self.conversation_id, user.id, read):
+            await self.channel_layer.group_send(self.group_name, {
+                'type': 'chat.receipt', 'user': user.username, 'last_read_id': read,
+            })
+
+    # Outgoing frames
+
+    def queue(self, data: dict) -> None:
+        try:
+            self.outgoing.put_nowait(data)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def write_loop(self):
+        try:
+            while True:
+                data = await self.outgoing.get()
+                await self.send_json(data)
+                if self.overflowed and self.outgoing.empty():
+                    self.overflowed = False
+                    await self.send_json({'type': 'resync'})
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Without a writer nothing reaches the client any more; drop the
+            # socket so it reconnects and catches up through ``history``.
+            logger.exception('Chat socket writer failed; closing the connection')
+            try:
+                await self.close()
+            except Exception:
+                pass
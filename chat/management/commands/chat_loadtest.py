@@ -0,0 +1,117 @@
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from channels.layers import InMemoryChannelLayer, channel_layers
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test.utils import setup_databases, teardown_databases
+from django.urls import path
+
+from chat import messaging
+from chat.consumers import ChatConsumer
+from config.layers import SQLiteChannelLayer
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Command(BaseCommand):
+    help = 'Open many concurrent chat sockets and report message fan-out latency.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conversations', type=int, default=50)
+        parser.add_argument('--participants', type=int, default=3, help='Sockets per conversation.')
+        parser.add_argument('--messages', type=int, default=20, help='Messages sent per conversation.')
+        parser.add_argument('--interval', type=float, default=0.01, help='Seconds between sends in one conversation.')
+        parser.add_argument('--layer', choices=['sqlite', 'memory'], default='sqlite')
+
+    def handle(self, *args, **options):
+        # Runs against a throwaway database and channel layer file.
+        with tempfile.TemporaryDirectory() as tmp:
+            connections['default'].settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(tmp, 'db.sqlite3')
+            old_config = setup_databases(verbosity=0, interactive=False)
+            if options['layer'] == 'sqlite':
+                layer = SQLiteChannelLayer(path=os.path.join(tmp, 'channels.sqlite3'), capacity=1000)
+            else:
+                layer = InMemoryChannelLayer(capacity=1000)
+            old_layer = channel_layers.set('default', layer)
+            try:
+                conversations = self.seed(options['conversations'], options['participants'])
+                latencies, elapsed = asyncio.run(self.run(conversations, options))
+            finally:
+                channel_layers.backends['default'] = old_layer
+                teardown_databases(old_config, verbosity=0)
+
+        sent = options['conversations'] * options['messages']
+        self.stdout.write(
+            f"{options['conversations']} conversations x {options['participants']} sockets, "
+            f"{sent} messages, {len(latencies)} deliveries in {elapsed:.2f}s "
+            f"({len(latencies) / elapsed:.0f} deliveries/s, layer={options['layer']})"
+        )
+        if latencies:
+            ms = [value * 1000 for value in latencies]
+            self.stdout.write(
+                f'fan-out latency ms: p50={statistics.median(ms):.1f} p95={percentile(ms, 95):.1f} '
+                f'p99={percentile(ms, 99):.1f} max={max(ms):.1f}'
+            )
+
+    def seed(self, count: int, participants: int) -> list[tuple[int, list[User]]]:
+        conversations = []
+        for n in range(count):
+            users = [User.objects.create_user(f'load{n}_{i}') for i in range(participants)]
+            conversation = messaging.start(users[0], users[1:], title=f'load {n}')
+            conversations.append((conversation.pk, users))
+        return conversations
+
+    async def run(self, conversations, options):
+        app = URLRouter([path('ws/chat/<int:conversation_id>/', ChatConsumer.as_asgi())])
+        sent_at: dict[str, float] = {}
+        latencies: list[float] = []
+
+        sockets = []
+        for conversation_id, users in conversations:
+            members = []
+            for user in users:
+                comm = WebsocketCommunicator(app, f'/ws/chat/{conversation_id}/')
+                comm.scope['user'] = user
+                connected, _ = await comm.connect()
+                assert connected, f'socket for {user} was refused'
+                members.append(comm)
+            sockets.append(members)
+
+        async def listen(comm, expected):
+            received = 0
+            while received < expected:
+                frame = await comm.receive_json_from(timeout=60)
+                if frame['type'] == 'message':
+                    latencies.append(time.perf_counter() - sent_at[frame['client_id']])
+                    received += 1
+
+        async def talk(index, comm):
+            # Spread conversations out instead of sending in lockstep.
+            await asyncio.sleep(random.random() * options['interval'])
+            for n in range(options['messages']):
+                client_id = f'{index}-{n}'
+                sent_at[client_id] = time.perf_counter()
+                await comm.send_json_to({'type': 'message', 'body': f'message {n}', 'client_id': client_id})
+                await asyncio.sleep(options['interval'])
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(listen(comm, options['messages']) for members in sockets for comm in members),
+            *(talk(index, members[0]) for index, members in enumerate(sockets)),
+        )
+        elapsed = time.perf_counter() - start
+        for members in sockets:
+            for comm in members:
+                await comm.disconnect()
+        return latencies, elapsed
@@ -0,0 +1,129 @@
+"""Conversations, messages and read state.
+
+Backlog pages are range scans on the ``(conversation, id)`` index, using the
+message id as the cursor. Read receipts only ever move ``last_read_id``
+forward, so the consumer can coalesce many "read up to" signals into one
+UPDATE.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from .models import Conversation, Message, Participant
+
+BACKLOG_SIZE = 50
+MAX_BODY_LENGTH = 4000
+MAX_PARTICIPANTS = getattr(settings, 'CHAT_MAX_PARTICIPANTS', 20)
+
+
+class ChatError(Exception):
+    """The chat action cannot be applied (empty message, too many people, ...)."""
+
+
+def group_name(conversation_id: int) -> str:
+    return f'chat_{conversation_id}'
+
+
+def is_participant(conversation_id: int, user_id: int) -> bool:
+    return Participant.objects.filter(conversation_id=conversation_id, user_id=user_id).exists()
+
+
+def start(user, others, title: str = '') -> Conversation:
+    """Open a conversation between ``user`` and ``others``.
+
+    A 1:1 conversation without a title is reused if it already exists.
+    """
+    others = list({other.pk: other for other in others if other.pk != user.pk}.values())
+    if not others:
+        raise ChatError('Pick at least one other person.')
+    if len(others) + 1 > MAX_PARTICIPANTS:
+        raise ChatError(f'Conversations are limited to {MAX_PARTICIPANTS} people.')
+    is_group = len(others) > 1
+    if not is_group and not title:
+        existing = (
+            Conversation.objects.filter(is_group=False, memberships__user=user)
+            .filter(memberships__user=others[0])
+            .first()
+        )
+        if existing is not None:
+            return existing
+    with transaction.atomic():
+        conversation = Conversation.objects.create(title=title.strip()[:100], is_group=is_group)
+        Participant.objects.bulk_create(
+            Participant(conversation=conversation, user=member) for member in [user, *others]
+        )
+    return conversation
+
+
+def serialize(message: Message, author: str) -> dict:
+    return {
+        'id': message.id,
+        'conversation': message.conversation_id,
+        'author': author,
+        'body': message.body,
+        'created_at': message.created_at.isoformat(),
+    }
+
+
+def post(conversation_id: int, user, body: str) -> dict:
+    """Store a message and return its wire format; the caller broadcasts it."""
+    if body is not None and not isinstance(body, str):
+        raise ChatError('Message must be text.')
+    body = (body or '').strip()
+    if not body:
+        raise ChatError('Message is empty.')
+    if len(body) > MAX_BODY_LENGTH:
+        raise ChatError(f'Messages are limited to {MAX_BODY_LENGTH} characters.')
+    with transaction.atomic():
+        message = Message.objects.create(conversation_id=conversation_id, author=user, body=body)
+        Conversation.objects.filter(pk=conversation_id).update(updated_at=message.created_at)
+    return serialize(message, user.username)
+
+
+def backlog(conversation_id: int, before: int | None = None, after: int | None = None,
+            limit: int = BACKLOG_SIZE) -> tuple[list[dict], bool]:
+    """Up to ``limit`` messages, oldest first, and whether more exist.
+
+    ``before`` pages backwards into history; ``after`` catches up forwards
+    (e.g. after the socket dropped messages).
+    """
+    qs = Message.objects.filter(conversation_id=conversation_id)
+    if after is not None:
+        qs = qs.filter(id__gt=after).order_by('id')
+    else:
+        if before is not None:
+            qs = qs.filter(id__lt=before)
+        qs = qs.order_by('-id')
+    rows = list(qs.select_related('author').only(
+        'id', 'conversation_id', 'body', 'created_at', 'author__username'
+    )[:limit + 1])
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if after is None:
+        rows.reverse()
+    return [serialize(row, row.author.username) for row in rows], more
+
+
+def mark_read(conversation_id: int, user_id: int, message_id: int) -> bool:
+    """Move the participant's read marker forward; False if nothing changed."""
+    return bool(
+        Participant.objects.filter(
+            conversation_id=conversation_id, user_id=user_id, last_read_id__lt=message_id
+        ).update(last_read_id=message_id)
+    )
+
+
+def read_state(conversation_id: int) -> dict[str, int]:
+    """``{username: last_read_id}`` for everyone in the conversation."""
+    return dict(
+        Participant.objects.filter(conversation_id=conversation_id)
+        .values_list('user__username', 'last_read_id')
+    )
+
+
+def find_users(usernames) -> list[User]:
+    names = {name.strip() for name in usernames if name.strip()}
+    users = list(User.objects.filter(username__in=names))
+    missing = names - {user.username for user in users}
+    if missing:
+        raise ChatError(f"Unknown user(s): {', '.join(sorted(missing))}")
+    return users
@@ -1,3 +1,53 @@
+from django.contrib.auth.models import User
 from django.db import models
 
-# Create your models here.
+
+class Conversation(models.Model):
+    title = models.CharField(max_length=100, blank=True, default='')
+    is_group = models.BooleanField(default=False)
+    participants = models.ManyToManyField(User, through='Participant', related_name='conversations')
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Time of the last message, so the inbox sorts without touching messages
+    updated_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-updated_at']
+
+    def __str__(self) -> str:
+        return self.title or f'Conversation {self.pk}'
+
+
+class Participant(models.Model):
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='memberships')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_memberships')
+    joined_at = models.DateTimeField(auto_now_add=True)
+    # Highest message id this participant has read (0 = nothing yet)
+    last_read_id = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['conversation', 'user'], name='chat_participant_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'conversation'], name='chat_participant_user_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.user} in {self.conversation}'
+
+
+class Message(models.Model):
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='messages')
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_messages')
+    body = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # Backlog pages are range scans on (conversation, id)
+            models.Index(fields=['conversation', '-id'], name='chat_message_backlog_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.author}: {self.body[:40]}'
@@ -1,3 +1,79 @@
-from django.test import TestCase
+import asyncio
+from unittest import mock
 
-# Create your tests here.
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TransactionTestCase, override_settings
+
+from config.asgi import application
+from . import messaging
+from .consumers import ChatConsumer
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class ChatConsumerTests(TransactionTestCase):
+    def setUp(self):
+        self.alice, self.bob = User.objects.create_user('alice'), User.objects.create_user('bob')
+        self.conversation = messaging.start(self.alice, [self.bob])
+        self.client.force_login(self.alice)
+        self.cookie = f'{settings.SESSION_COOKIE_NAME}={self.client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+    def communicator(self, origin='http://testserver'):
+        return WebsocketCommunicator(application, f'/ws/chat/{self.conversation.pk}/', headers=[
+            (b'cookie', self.cookie.encode()), (b'origin', origin.encode()), (b'host', b'testserver'),
+        ])
+
+    def run_socket(self, scenario, origin='http://testserver'):
+        async def run():
+            ws = self.communicator(origin)
+            connected, _ = await ws.connect()
+            try:
+                return await scenario(ws, connected)
+            finally:
+                await ws.disconnect()
+        return asyncio.run(run())
+
+    def test_foreign_origin_is_refused(self):
+        async def scenario(ws, connected):
+            return connected
+        self.assertFalse(self.run_socket(scenario, origin='https://evil.example'))
+        self.assertTrue(self.run_socket(scenario))
+
+    def test_invalid_frames_get_an_error_and_keep_the_socket(self):
+        async def scenario(ws, connected):
+            self.assertTrue(connected)
+            replies = []
+            for frame in ([1, 2], {'type': 'message', 'body': {'x': 1}}, {'type': 'message', 'body': 5},
+                          {'type': 'history', 'before': 'abc'}, {'type': 'history', 'after': [1]}):
+                await ws.send_json_to(frame)
+                replies.append(await ws.receive_json_from())
+            await ws.send_json_to({'type': 'message', 'body': 'hi', 'client_id': 'c1'})
+            replies.append(await ws.receive_json_from())
+            return replies
+        replies = self.run_socket(scenario)
+        self.assertEqual([r['type'] for r in replies], ['error'] * 5 + ['message'])
+        self.assertEqual(replies[1]['error'], 'Message must be text.')
+        self.assertEqual(replies[3]['error'], 'Invalid history cursor.')
+        self.assertEqual((replies[-1]['body'], replies[-1]['client_id']), ('hi', 'c1'))
+
+    def test_history_pages_with_cursors(self):
+        ids = [messaging.post(self.conversation.pk, self.alice, f'm{i}')['id'] for i in range(3)]
+
+        async def scenario(ws, connected):
+            await ws.send_json_to({'type': 'history', 'before': str(ids[2])})
+            older = await ws.receive_json_from()
+            await ws.send_json_to({'type': 'history', 'after': ids[0]})
+            return older, await ws.receive_json_from()
+        older, newer = self.run_socket(scenario)
+        self.assertEqual([m['body'] for m in older['messages']], ['m0', 'm1'])
+        self.assertEqual([m['body'] for m in newer['messages']], ['m1', 'm2'])
+        self.assertTrue(newer['after'])
+
+    def test_failed_send_closes_the_socket(self):
+        async def scenario(ws, connected):
+            with mock.patch.object(ChatConsumer, 'send_json', side_effect=RuntimeError('gone')):
+                await ws.send_json_to({'type': 'history'})
+                return await ws.receive_output()
+        with self.assertLogs('chat.consumers', 'ERROR'):
+            self.assertEqual(self.run_socket(scenario)['type'], 'websocket.close')
@@ -5,6 +5,7 @@ app_name = 'chat'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('start/', views.start, name='start'),
+    path('<int:conversation_id>/', views.conversation, name='conversation'),
+    path('<int:conversation_id>/messages/', views.history, name='history'),
 ]
-
-
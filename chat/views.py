@@ -1,6 +1,71 @@
-from django.http import HttpRequest, HttpResponse
-from django.shortcuts import render
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.db.models import Count, F, Q
+from django.http import Http404, HttpRequest, HttpResponse, HttpResponseNotAllowed, JsonResponse
+from django.shortcuts import redirect, render
+from . import messaging
+from .models import Participant
 
 
+@login_required
 def index(request: HttpRequest) -> HttpResponse:
-    return render(request, 'chat/index.html')
+    memberships = (
+        Participant.objects.filter(user=request.user)
+        .select_related('conversation')
+        .prefetch_related('conversation__participants')
+        .annotate(unread=Count(
+            'conversation__messages',
+            filter=Q(conversation__messages__id__gt=F('last_read_id'))
+            & ~Q(conversation__messages__author_id=F('user_id')),
+        ))
+        .order_by('-conversation__updated_at')
+    )
+    return render(request, 'chat/index.html', { 'memberships': memberships })
+
+
+@login_required
+def start(request: HttpRequest) -> HttpResponse:
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    try:
+        others = messaging.find_users(request.POST.get('usernames', '').split(','))
+        conversation = messaging.start(request.user, others, request.POST.get('title', ''))
+    except messaging.ChatError as exc:
+        messages.error(request, str(exc))
+        return redirect('chat:index')
+    return redirect('chat:conversation', conversation_id=conversation.pk)
+
+
+def _membership(request: HttpRequest, conversation_id: int) -> Participant:
+    try:
+        return Participant.objects.select_related('conversation').get(
+            conversation_id=conversation_id, user=request.user
+        )
+    except Participant.DoesNotExist:
+        raise Http404('Conversation not found')
+
+
+@login_required
+def conversation(request: HttpRequest, conversation_id: int) -> HttpResponse:
+    membership = _membership(request, conversation_id)
+    backlog, more = messaging.backlog(conversation_id)
+    if backlog:
+        messaging.mark_read(conversation_id, request.user.pk, backlog[-1]['id'])
+    return render(request, 'chat/conversation.html', {
+        'conversation': membership.conversation,
+        'participants': membership.conversation.participants.all(),
+        'backlog': backlog,
+        'more': more,
+        'read_state': messaging.read_state(conversation_id),
+    })
+
+
+@login_required
+def history(request: HttpRequest, conversation_id: int) -> HttpResponse:
+    _membership(request, conversation_id)
+    try:
+        before = int(request.GET['before']) if request.GET.get('before') else None
+    except ValueError:
+        return JsonResponse({'ok': False, 'error': 'Invalid cursor.'}, status=400)
+    backlog, more = messaging.backlog(conversation_id, before=before)
+    return JsonResponse({'ok': True, 'messages': backlog, 'more': more})
@@ -10,19 +10,30 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 import os
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
+from channels.security.websocket import AllowedHostsOriginValidator
 from django.core.asgi import get_asgi_application
 from django.urls import path
-from notifications.consumers import NotificationsConsumer
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
+# Set up Django (apps and settings) before importing anything that touches models
 django_asgi_app = get_asgi_application()
 
+from notifications.consumers import NotificationsConsumer  # noqa: E402
+from chat.consumers import ChatConsumer  # noqa: E402
+from config.media import MediaFilesApp  # noqa: E402
+from config.static import serve_static  # noqa: E402
+
 application = ProtocolTypeRouter({
-    'http': django_asgi_app,
-    'websocket': AuthMiddlewareStack(
-        URLRouter([
-            path('ws/notifications/', NotificationsConsumer.as_asgi()),
-        ])
+    # Static files and uploads are answered before the Django request cycle
+    'http': MediaFilesApp(serve_static(django_asgi_app)),
+    # Sockets act as the session user, so refuse handshakes from other origins
+    'websocket': AllowedHostsOriginValidator(
+        AuthMiddlewareStack(
+            URLRouter([
+                path('ws/notifications/', NotificationsConsumer.as_asgi()),
+                path('ws/chat/<int:conversation_id>/', ChatConsumer.as_asgi()),
+            ])
+        )
     ),
 })
@@ -0,0 +1,8 @@
+"""What the configured cache backends can be relied on for."""
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def process_local(alias: str = 'default') -> bool:
+    """True when ``alias`` lives in this process, so other workers never see its writes or deletes."""
+    return isinstance(caches[alias], LocMemCache)
@@ -1,15 +1,16 @@
 from django.contrib.auth.models import AnonymousUser
-from notifications.models import Notification
-from follows.models import Follow
+from django.utils.functional import SimpleLazyObject
+from notifications import badge
+from follows import followset
 
 
 def unread_notifications(request):
     user = getattr(request, 'user', None)
     if not user or isinstance(user, AnonymousUser) or not user.is_authenticated:
         return { 'unread_notifications_count': 0, 'recent_notifications': [], 'following_ids': set() }
-    count = Notification.objects.filter(user=user, read=False).count()
-    recent = list(Notification.objects.filter(user=user).select_related('actor').order_by('-created_at')[:5])
-    following_ids = set(Follow.objects.filter(follower=user).values_list('following_id', flat=True))
+    # Evaluated on first use, so templates that never show the badge skip the lookups
+    user_id = user.pk
+    count = SimpleLazyObject(lambda: badge.unread_count(user_id))
+    recent = SimpleLazyObject(lambda: badge.recent(user_id))
+    following_ids = SimpleLazyObject(lambda: followset.get(user_id))
     return { 'unread_notifications_count': count, 'recent_notifications': recent, 'following_ids': following_ids }
-
-
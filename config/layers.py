@@ -0,0 +1,269 @@
+"""
+Channel layer backed by a local SQLite database in WAL mode.
+
+``InMemoryChannelLayer`` only delivers within one process, so with several
+ASGI workers a ``group_send`` from one worker never reaches sockets held by
+another. This layer keeps messages and group memberships in a shared SQLite
+file instead: any process on the machine can send, and each process runs one
+poller per receiving prefix that pulls its messages in batches and hands them
+to the waiting consumers.
+
+Payloads are pickled, so the database file must only be writable by the
+application user.
+"""
+
+import asyncio
+import pickle
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel TEXT NOT NULL,
+    expires REAL NOT NULL,
+    payload BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_channel_idx ON messages (channel, id);
+CREATE TABLE IF NOT EXISTS groups (
+    grp TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    expires REAL NOT NULL,
+    PRIMARY KEY (grp, channel)
+);
+CREATE INDEX IF NOT EXISTS groups_channel_idx ON groups (channel);
+"""
+
+# Queue a message unless the channel already holds ``capacity`` of them.
+SEND = """
+INSERT INTO messages (channel, expires, payload) SELECT ?, ?, ?
+WHERE (SELECT count(*) FROM messages WHERE channel = ?) < ?
+"""
+
+
+class SQLiteChannelLayer(BaseChannelLayer):
+    """
+    Cross-process channel layer for a single machine.
+
+    ``path`` is the SQLite file shared by all workers. ``batch_size`` caps how
+    many messages one poll takes off the queue, and the poller backs off from
+    ``poll_interval`` to ``max_poll_interval`` while its channels are idle.
+    ``capacity`` and ``channel_capacity`` work as in the other layers; a full
+    channel raises ``ChannelFull`` on ``send`` and is skipped by ``group_send``.
+    """
+
+    extensions = ['groups', 'flush']
+
+    def __init__(self, path='channels.sqlite3', expiry=60, group_expiry=86400,
+                 capacity=100, channel_capacity=None, batch_size=100,
+                 poll_interval=0.005, max_poll_interval=0.1,
+                 cleanup_interval=5, **kwargs):
+        super().__init__(expiry=expiry, capacity=capacity,
+                         channel_capacity=channel_capacity, **kwargs)
+        self.channel_capacity = self.compile_capacities(self.channel_capacity)
+        self.path = str(path)
+        self.group_expiry = group_expiry
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.cleanup_interval = cleanup_interval
+        self.client_prefix = uuid.uuid4().hex[:12]
+        # All database work happens on one thread that owns the connection.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite-layer')
+        self._conn = None
+        self._last_cleanup = 0.0
+        self._reset_local()
+
+    def _reset_local(self):
+        self._loop = None
+        self._queues = {}
+        self._waiters = {}
+        self._pollers = {}
+
+    # Database side, always called on the executor thread.
+
+    def _db(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    @contextmanager
+    def _transaction(self, conn):
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def _run(self, func, *args):
+        return asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _maybe_cleanup(self, conn, now):
+        if now - self._last_cleanup < self.cleanup_interval:
+            return
+        self._last_cleanup = now
+        with self._transaction(conn):
+            # A channel whose messages expire unread has gone away; drop it
+            # from its groups the same way the in-memory layer does.
+            conn.execute(
+                'DELETE FROM groups WHERE expires <= ? OR channel IN '
+                '(SELECT DISTINCT channel FROM messages WHERE expires <= ?)', (now, now))
+            conn.execute('DELETE FROM messages WHERE expires <= ?', (now,))
+
+    def _send(self, channel, payload, capacity):
+        conn = self._db()
+        now = time.time()
+        return conn.execute(SEND, (channel, now + self.expiry, payload, channel, capacity)).rowcount
+
+    def _group_send(self, group, payload):
+        conn = self._db()
+        now = time.time()
+        self._maybe_cleanup(conn, now)
+        expires = now + self.expiry
+        with self._transaction(conn):
+            channels = [row[0] for row in conn.execute(
+                'SELECT channel FROM groups WHERE grp = ? AND expires > ?', (group, now))]
+            # One transaction for the whole fan-out; full members are skipped.
+            conn.executemany(SEND, [
+                (channel, expires, payload, channel, self.get_capacity(channel))
+                for channel in channels
+            ])
+
+    def _take(self, key):
+        """Remove and return up to ``batch_size`` live messages for ``key``."""
+        conn = self._db()
+        now = time.time()
+        self._maybe_cleanup(conn, now)
+        if key.endswith('!'):
+            # Every specific channel of this process shares the prefix, so a
+            # single range scan on the index serves all of them.
+            where, params = 'channel >= ? AND channel < ?', (key, key[:-1] + '"')
+        else:
+            where, params = 'channel = ?', (key,)
+        rows = conn.execute(
+            f'DELETE FROM messages WHERE id IN (SELECT id FROM messages WHERE {where} '
+            f'ORDER BY id LIMIT ?) RETURNING id, channel, expires, payload',
+            (*params, self.batch_size)).fetchall()
+        rows.sort()
+        return [(channel, payload) for _, channel, expires, payload in rows if expires > now]
+
+    def _group_add(self, group, channel):
+        self._db().execute(
+            'INSERT OR REPLACE INTO groups (grp, channel, expires) VALUES (?, ?, ?)',
+            (group, channel, time.time() + self.group_expiry))
+
+    def _group_discard(self, group, channel):
+        self._db().execute('DELETE FROM groups WHERE grp = ? AND channel = ?', (group, channel))
+
+    def _flush(self):
+        conn = self._db()
+        with self._transaction(conn):
+            conn.execute('DELETE FROM messages')
+            conn.execute('DELETE FROM groups')
+
+    def _close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # Channel layer API
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), 'message is not a dict'
+        self.require_valid_channel_name(channel)
+        assert '__asgi_channel__' not in message
+        payload = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+        if not await self._run(self._send, channel, payload, self.get_capacity(channel)):
+            raise ChannelFull(channel)
+
+    async def receive(self, channel):
+        self.require_valid_channel_name(channel)
+        self._check_loop()
+        queue = self._queues.setdefault(channel, asyncio.Queue())
+        key = self.non_local_name(channel)
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        poller = self._pollers.get(key)
+        if poller is None or poller.done():
+            self._pollers[key] = asyncio.ensure_future(self._poll(key))
+        try:
+            return await queue.get()
+        except asyncio.CancelledError:
+            if queue.empty():
+                self._queues.pop(channel, None)
+            raise
+        finally:
+            self._waiters[key] -= 1
+
+    async def _poll(self, key):
+        delay = self.poll_interval
+        while self._waiters.get(key):
+            rows = await self._run(self._take, key)
+            for channel, payload in rows:
+                queue = self._queues.get(channel)
+                # Messages for a channel nobody listens on any more are dropped.
+                if queue is not None:
+                    queue.put_nowait(pickle.loads(payload))
+            if len(rows) >= self.batch_size:
+                delay = self.poll_interval
+                continue
+            if rows:
+                delay = self.poll_interval
+            else:
+                delay = min(delay * 2, self.max_poll_interval)
+            await asyncio.sleep(delay)
+        self._pollers.pop(key, None)
+
+    def _check_loop(self):
+        # Queues and pollers belong to one event loop; a new loop (e.g. a
+        # fresh async_to_sync call) starts from a clean slate.
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._reset_local()
+            self._loop = loop
+
+    async def new_channel(self, prefix='specific.'):
+        self._check_loop()
+        channel = f'{prefix}.{self.client_prefix}!{uuid.uuid4().hex[:12]}'
+        # Register now so messages polled before the first receive() are kept.
+        self._queues.setdefault(channel, asyncio.Queue())
+        return channel
+
+    async def flush(self):
+        self._reset_local()
+        await self._run(self._flush)
+
+    async def close(self):
+        for poller in self._pollers.values():
+            poller.cancel()
+        await self._run(self._close)
+
+    # Groups extension
+
+    async def group_add(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        await self._run(self._group_add, group, channel)
+
+    async def group_discard(self, group, channel):
+        self.require_valid_channel_name(channel)
+        self.require_valid_group_name(group)
+        await self._run(self._group_discard, group, channel)
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), 'Message is not a dict'
+        self.require_valid_group_name(group)
+        payload = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+        await self._run(self._group_send, group, payload)
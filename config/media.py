@@ -0,0 +1,160 @@
+"""ASGI handler serving user uploads (``MEDIA_URL``) in production.
+
+Builds on :class:`config.static.StaticFilesApp` (chunked reads off the event
+loop, ``ETag``/``Last-Modified`` revalidation) and adds what large images and
+avatars need: single ``Range`` requests with ``If-Range``, a cap on how many
+files one worker streams at once (``MEDIA_MAX_CONCURRENT_READS``; requests
+beyond it wait up to ``MEDIA_QUEUE_TIMEOUT`` seconds, then get a 503), and
+an optional hand-off to a front proxy through ``X-Accel-Redirect`` (nginx)
+or ``X-Sendfile`` (Apache, lighttpd) set by ``MEDIA_SENDFILE``.
+"""
+import asyncio
+import os
+import re
+from email.utils import parsedate_to_datetime
+from urllib.parse import quote
+
+from django.conf import settings
+
+from .static import IMMUTABLE, REVALIDATE, StaticFile, StaticFilesApp, content_type, file_etag, stat_file
+
+MAX_CONCURRENT_READS = getattr(settings, 'MEDIA_MAX_CONCURRENT_READS', 32)
+QUEUE_TIMEOUT = getattr(settings, 'MEDIA_QUEUE_TIMEOUT', 10.0)
+# None, 'x-accel-redirect' or 'x-sendfile'
+SENDFILE = getattr(settings, 'MEDIA_SENDFILE', None)
+# Internal nginx location that maps to MEDIA_ROOT, for X-Accel-Redirect
+ACCEL_PREFIX = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/')
+# Content-addressed uploads (blog.uploads) never change under the same name
+CONTENT_HASH_RE = re.compile(r'/[0-9a-f]{32}[-.][^/]*$')
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None | bool:
+    """``(start, end)`` (inclusive) for a single byte range.
+
+    Returns None when the header should be ignored (malformed or several
+    ranges, so the whole file is sent) and False when it cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip().replace(' ', ''))
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the final ``last`` bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        return False
+    return start, end
+
+
+class MediaFilesApp(StaticFilesApp):
+    """Serve ``MEDIA_URL`` from ``MEDIA_ROOT``; everything else goes to ``app``."""
+
+    def __init__(self, app, root=None, prefix: str | None = None, max_concurrent: int = MAX_CONCURRENT_READS,
+                 queue_timeout: float = QUEUE_TIMEOUT, sendfile: str | None = SENDFILE):
+        super().__init__(
+            app,
+            root=root if root is not None else settings.MEDIA_ROOT,
+            prefix=prefix if prefix is not None else settings.MEDIA_URL,
+        )
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self.sendfile = sendfile.lower() if sendfile else None
+        self._slots = None
+
+    @property
+    def slots(self) -> asyncio.Semaphore:
+        # Created on first use so it belongs to the server's event loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+        return self._slots
+
+    def cache_control(self, path: str) -> str:
+        return IMMUTABLE if CONTENT_HASH_RE.search(path) else REVALIDATE
+
+    def select(self, path: str, headers: dict) -> tuple[StaticFile | None, bool]:
+        # Uploads are already compressed formats; no encoded variants
+        st = stat_file(path)
+        if st is None:
+            return None, False
+        return StaticFile(path, st.st_size, st.st_mtime, file_etag(st)), False
+
+    def response_headers(self, path: str, file: StaticFile, has_variants: bool) -> list[tuple[bytes, bytes]]:
+        headers = super().response_headers(path, file, has_variants)
+        headers += [(b'accept-ranges', b'bytes'), (b'x-content-type-options', b'nosniff')]
+        return headers
+
+    @staticmethod
+    def range_applies(file: StaticFile, headers: dict) -> bool:
+        """False when ``If-Range`` names another version of the file."""
+        if_range = headers.get('if-range')
+        if not if_range:
+            return True
+        if if_range.startswith(('"', 'W/')):
+            return if_range == file.etag
+        try:
+            return int(file.mtime) <= parsedate_to_datetime(if_range).timestamp()
+        except (TypeError, ValueError):
+            return False
+
+    async def serve(self, scope, send, path: str, file: StaticFile, has_variants: bool, headers: dict) -> None:
+        response_headers = self.response_headers(path, file, has_variants)
+        if self.not_modified(file, headers):
+            await send({'type': 'http.response.start', 'status': 304, 'headers': response_headers})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        if self.sendfile:
+            await self.hand_off(send, path, file)
+            return
+        status, start, length = 200, 0, file.size
+        byte_range = parse_range(headers['range'], file.size) if 'range' in headers else None
+        if byte_range is not None and self.range_applies(file, headers):
+            if byte_range is False:
+                await send({'type': 'http.response.start', 'status': 416, 'headers': [
+                    (b'content-range', f'bytes */{file.size}'.encode()),
+                ]})
+                await send({'type': 'http.response.body', 'body': b''})
+                return
+            start, end = byte_range
+            status, length = 206, end - start + 1
+            response_headers.append((b'content-range', f'bytes {start}-{end}/{file.size}'.encode()))
+        response_headers.append((b'content-length', str(length).encode()))
+        if scope['method'] == 'HEAD' or not length:
+            await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        try:
+            await asyncio.wait_for(self.slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            await send({'type': 'http.response.start', 'status': 503, 'headers': [(b'retry-after', b'1')]})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        try:
+            await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+            await self.stream(file.path, start, length, send)
+        finally:
+            self.slots.release()
+
+    async def hand_off(self, send, path: str, file: StaticFile) -> None:
+        """Let the front proxy send the file (it handles ranges itself)."""
+        if self.sendfile == 'x-accel-redirect':
+            relative = os.path.relpath(path, self.root).replace(os.sep, '/')
+            header = (b'x-accel-redirect', (ACCEL_PREFIX.rstrip('/') + '/' + quote(relative)).encode())
+        else:
+            header = (b'x-sendfile', path.encode())
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', content_type(path).encode()),
+            (b'cache-control', self.cache_control(path).encode()),
+            (b'etag', file.etag.encode()),
+            header,
+        ]})
+        await send({'type': 'http.response.body', 'body': b''})
@@ -0,0 +1,161 @@
+"""Per-request SQL instrumentation with an N+1 detector.
+
+:class:`QueryStatsMiddleware` samples ``QUERY_STATS_SAMPLE_RATE`` of
+requests. For those it wraps every database cursor for the duration of the
+request and records the query count, total database time and a fingerprint
+per statement (the SQL with literals and ``IN (...)`` lists collapsed, so
+``WHERE post_id = 1`` and ``= 2`` count as the same statement). A fingerprint
+seen ``QUERY_STATS_REPEAT_THRESHOLD`` times is flagged as a likely N+1, with
+the template line and the project code frame that issued it when it
+crossed the threshold, which is where the loop is.
+
+Sampled requests get a ``Server-Timing`` header (``db`` and ``app``
+durations, plus ``n1`` when something was flagged; turn it off with
+``QUERY_STATS_HEADER = False``) and one log line on the ``config.middleware``
+logger, at WARNING when an N+1 was flagged. Unsampled requests pay for one
+``random()`` call.
+"""
+import logging
+import os
+import random
+import re
+import sys
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = getattr(settings, 'QUERY_STATS_SAMPLE_RATE', 0.01)
+REPEAT_THRESHOLD = getattr(settings, 'QUERY_STATS_REPEAT_THRESHOLD', 5)
+HEADER = getattr(settings, 'QUERY_STATS_HEADER', True)
+# Flagged fingerprints reported per request, most repeated first
+MAX_REPORTED = 5
+
+PROJECT_ROOT = os.path.realpath(settings.BASE_DIR) + os.sep
+LIBRARY_DIRS = (os.sep + 'site-packages' + os.sep, os.sep + 'dist-packages' + os.sep)
+
+IN_LIST_RE = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+SPACE_RE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql: str) -> str:
+    """``sql`` with literals and parameter lists replaced, for grouping repeats."""
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = IN_LIST_RE.sub('(...)', sql)
+    return SPACE_RE.sub(' ', sql).strip()
+
+
+def call_site() -> tuple[str | None, str | None]:
+    """The innermost template line and project code frame on the current stack."""
+    template = code = None
+    frame = sys._getframe(2)
+    while frame is not None and (template is None or code is None):
+        filename = frame.f_code.co_filename
+        if template is None and frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            origin, token = getattr(node, 'origin', None), getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                template = f'{origin.template_name or origin.name}:{token.lineno}'
+        elif code is None and filename.startswith(PROJECT_ROOT) and filename != __file__ \
+                and not any(part in filename for part in LIBRARY_DIRS):
+            code = f'{os.path.relpath(filename, PROJECT_ROOT)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return template, code
+
+
+@dataclass
+class Statement:
+    count: int = 0
+    duration: float = 0.0
+    template: str | None = None
+    code: str | None = None
+
+
+@dataclass
+class QueryStats:
+    """Collects every statement run while installed as an ``execute_wrapper``."""
+    threshold: int = REPEAT_THRESHOLD
+    count: int = 0
+    duration: float = 0.0
+    statements: dict[str, Statement] = field(default_factory=dict)
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            statement = self.statements.get(key := fingerprint(sql))
+            if statement is None:
+                statement = self.statements[key] = Statement()
+            statement.count += 1
+            statement.duration += elapsed
+            if statement.count == self.threshold:
+                statement.template, statement.code = call_site()
+
+    def repeated(self) -> list[tuple[str, Statement]]:
+        """Fingerprints run at least ``threshold`` times, most repeated first."""
+        flagged = [(sql, s) for sql, s in self.statements.items() if s.count >= self.threshold]
+        return sorted(flagged, key=lambda item: -item[1].count)
+
+
+class QueryStatsMiddleware:
+    """Record SQL statistics for a sample of requests; see the module docstring."""
+
+    def __init__(self, get_response, sample_rate: float = SAMPLE_RATE):
+        self.get_response = get_response
+        self.sample_rate = sample_rate
+
+    def __call__(self, request):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return self.get_response(request)
+        stats = QueryStats()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+        repeated = stats.repeated()
+        if HEADER:
+            self.add_header(response, stats, elapsed, repeated)
+        self.log(request, response, stats, elapsed, repeated)
+        return response
+
+    @staticmethod
+    def add_header(response, stats: QueryStats, elapsed: float, repeated) -> None:
+        timings = [
+            f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries"',
+            f'app;dur={elapsed * 1000:.1f}',
+        ]
+        if repeated:
+            timings.append(f'n1;desc="{len(repeated)} repeated"')
+        existing = response.get('Server-Timing')
+        response['Server-Timing'] = ', '.join(([existing] if existing else []) + timings)
+
+    @staticmethod
+    def log(request, response, stats: QueryStats, elapsed: float, repeated) -> None:
+        summary = '%s %s %s: %d queries, %.1fms db, %.1fms total'
+        args = [request.method, request.path, response.status_code, stats.count,
+                stats.duration * 1000, elapsed * 1000]
+        if not repeated:
+            logger.info(summary, *args)
+            return
+        lines = [summary + '; possible N+1:']
+        for sql, statement in repeated[:MAX_REPORTED]:
+            lines.append('  %dx %.1fms at %s: %s')
+            args += [statement.count, statement.duration * 1000,
+                     ' via '.join(filter(None, [statement.template, statement.code])) or 'unknown', sql[:300]]
+        logger.warning('\n'.join(lines), *args)
@@ -60,6 +60,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'config.middleware.QueryStatsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -70,6 +71,12 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# config.middleware.QueryStatsMiddleware: share of requests whose SQL is
+# profiled (Server-Timing header and a log line on the config.middleware
+# logger, WARNING when a statement repeats QUERY_STATS_REPEAT_THRESHOLD times)
+QUERY_STATS_SAMPLE_RATE = 1.0 if DEBUG else 0.01
+QUERY_STATS_REPEAT_THRESHOLD = 5
+
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
@@ -103,6 +110,25 @@ DATABASES = {
 }
 
 
+# Cache (notification badge, post cards, follow sets). LocMemCache is per
+# process: invalidations made by one worker never reach another, so the
+# unread badge and recent-notifications dropdown are only correct with a
+# single worker (``check --deploy`` warns, notifications.W001), and post card
+# caching is off unless POST_CARD_CACHE_SINGLE_PROCESS is set. With several
+# workers, use a shared backend, e.g.
+#     'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+#     'LOCATION': 'redis://127.0.0.1:6379',
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Cache rendered post cards (blog.cards) on the process-local cache above.
+# Only safe when a single worker serves every request, as runserver does.
+POST_CARD_CACHE_SINGLE_PROCESS = DEBUG
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -145,20 +171,51 @@ STATICFILES_DIRS = [
 # Where collectstatic will gather files for deployment
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# collectstatic writes content-hashed names plus .gz/.br variants, served by
+# config.static.StaticFilesApp in front of the ASGI app (see config/asgi.py).
+# With DEBUG on, static files are served from STATICFILES_DIRS instead and a
+# name missing from the manifest falls back to the unhashed one; in
+# production a missing entry is an error.
+STATIC_MANIFEST_FALLBACK = DEBUG
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'config.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
 # Media files (user uploads)
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Served by config.media.MediaFilesApp. Behind nginx, set MEDIA_SENDFILE =
+# 'x-accel-redirect' and map MEDIA_ACCEL_PREFIX ('/protected-media/') to
+# MEDIA_ROOT in an internal location; 'x-sendfile' suits Apache/lighttpd.
+MEDIA_MAX_CONCURRENT_READS = 32
+MEDIA_SENDFILE = None
 
 # Channels (WebSockets)
+# The SQLite layer is shared by every ASGI worker on this machine, so group
+# sends reach sockets held by other processes (the in-memory layer does not).
 CHANNEL_LAYERS = {
     'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        'BACKEND': 'config.layers.SQLiteChannelLayer',
+        'CONFIG': {
+            'path': BASE_DIR / 'channels.sqlite3',
+            'capacity': 100,
+            'group_expiry': 86400,
+        },
     }
 }
 
 # CKEditor configuration
 CKEDITOR_UPLOAD_PATH = 'uploads/'
 CKEDITOR_IMAGE_BACKEND = 'pillow'
+# Uploads are stored under their content hash (deduplicated), capped to
+# CKEDITOR_MAX_IMAGE_DIMENSION and recompressed; see blog.uploads
+CKEDITOR_STORAGE_BACKEND = 'blog.uploads.ContentAddressedStorage'
+CKEDITOR_MAX_IMAGE_DIMENSION = 2048
 CKEDITOR_CONFIGS = {
     'default': {
         'toolbar': [
@@ -193,7 +250,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
     'PAGE_SIZE': 10,
 }
 
@@ -0,0 +1,205 @@
+"""ASGI handler serving collected static files ahead of Django.
+
+Requests under ``STATIC_URL`` are answered from ``STATIC_ROOT`` without
+entering the Django request cycle: the precompressed ``.br``/``.gz``
+variant written by ``config.storage`` is picked from ``Accept-Encoding``,
+the file is streamed in chunks read off the event loop, and hashed names
+get a one-year ``immutable`` ``Cache-Control``. Paths that are not files
+under the root fall through to the wrapped application.
+
+With ``DEBUG`` on, :func:`serve_static` uses Django's finder-based handler
+instead, so ``static/`` is served as edited rather than the collected copy.
+"""
+import asyncio
+import mimetypes
+import os
+import re
+import stat
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+
+from django.conf import settings
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
+
+CHUNK_SIZE = 64 * 1024
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'public, max-age=0, must-revalidate'
+# Names written by ManifestStaticFilesStorage: ``name.<12 hex>.ext``
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+# Preferred first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+TEXT_TYPES = {'application/javascript', 'application/json', 'image/svg+xml', 'application/xml'}
+
+
+def accepted_encodings(header: str) -> set[str]:
+    """Content codings the client accepts (``q`` > 0) from an Accept-Encoding value."""
+    accepted, refused = set(), set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key.lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        (accepted if q > 0 else refused).add(coding)
+    if '*' in accepted:
+        accepted |= {coding for coding, _ in ENCODINGS} - refused
+    return accepted
+
+
+def http_date(timestamp: float) -> str:
+    return formatdate(timestamp, usegmt=True)
+
+
+def content_type(path: str) -> str:
+    guessed, _ = mimetypes.guess_type(path)
+    guessed = guessed or 'application/octet-stream'
+    if guessed.startswith('text/') or guessed in TEXT_TYPES:
+        guessed += '; charset=utf-8'
+    return guessed
+
+
+@dataclass(frozen=True)
+class StaticFile:
+    """One representation of a file: its path on disk, size and coding."""
+    path: str
+    size: int
+    mtime: float
+    etag: str
+    encoding: str | None = None
+
+
+def stat_file(path: str) -> os.stat_result | None:
+    try:
+        st = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError, PermissionError):
+        return None
+    return st if stat.S_ISREG(st.st_mode) else None
+
+
+def file_etag(st: os.stat_result, suffix: str = '') -> str:
+    return f'"{st.st_mtime_ns:x}-{st.st_size:x}{suffix}"'
+
+
+class StaticFilesApp:
+    """Serve ``prefix`` from ``root``; everything else goes to ``app``."""
+
+    chunk_size = CHUNK_SIZE
+
+    def __init__(self, app, root=None, prefix: str | None = None):
+        self.app = app
+        self.root = os.path.realpath(root if root is not None else settings.STATIC_ROOT)
+        self.prefix = '/' + (prefix if prefix is not None else settings.STATIC_URL).strip('/') + '/'
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not scope['path'].startswith(self.prefix) \
+                or scope['method'] not in ('GET', 'HEAD'):
+            return await self.app(scope, receive, send)
+        path = self.resolve(scope['path'][len(self.prefix):])
+        headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope['headers']}
+        file, has_variants = self.select(path, headers) if path else (None, False)
+        if file is None:
+            return await self.app(scope, receive, send)
+        await self.serve(scope, send, path, file, has_variants, headers)
+
+    def resolve(self, relative: str) -> str | None:
+        """Absolute path of ``relative`` inside the root, or None if it escapes it."""
+        path = os.path.realpath(os.path.join(self.root, relative.lstrip('/')))
+        if not path.startswith(self.root + os.sep):
+            return None
+        return path
+
+    def cache_control(self, path: str) -> str:
+        return IMMUTABLE if HASHED_NAME_RE.search(path) else REVALIDATE
+
+    def select(self, path: str, headers: dict) -> tuple[StaticFile | None, bool]:
+        """The representation to send and whether compressed variants exist."""
+        st = stat_file(path)
+        if st is None:
+            return None, False
+        accepted = accepted_encodings(headers.get('accept-encoding', ''))
+        has_variants = False
+        chosen = None
+        for encoding, suffix in ENCODINGS:
+            variant = stat_file(path + suffix)
+            if variant is None:
+                continue
+            has_variants = True
+            if chosen is None and encoding in accepted:
+                chosen = StaticFile(path + suffix, variant.st_size, st.st_mtime, file_etag(st, '-' + encoding), encoding)
+        if chosen is None:
+            chosen = StaticFile(path, st.st_size, st.st_mtime, file_etag(st))
+        return chosen, has_variants
+
+    @staticmethod
+    def not_modified(file: StaticFile, headers: dict) -> bool:
+        if_none_match = headers.get('if-none-match')
+        if if_none_match is not None:
+            tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+            return '*' in tags or file.etag in tags
+        if_modified_since = headers.get('if-modified-since')
+        if if_modified_since:
+            try:
+                return int(file.mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def response_headers(self, path: str, file: StaticFile, has_variants: bool) -> list[tuple[bytes, bytes]]:
+        headers = [
+            (b'content-type', content_type(path).encode()),
+            (b'last-modified', http_date(file.mtime).encode()),
+            (b'etag', file.etag.encode()),
+            (b'cache-control', self.cache_control(path).encode()),
+        ]
+        if has_variants:
+            headers.append((b'vary', b'Accept-Encoding'))
+        if file.encoding:
+            headers.append((b'content-encoding', file.encoding.encode()))
+        return headers
+
+    async def serve(self, scope, send, path: str, file: StaticFile, has_variants: bool, headers: dict) -> None:
+        response_headers = self.response_headers(path, file, has_variants)
+        if self.not_modified(file, headers):
+            await send({'type': 'http.response.start', 'status': 304, 'headers': response_headers})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        response_headers.append((b'content-length', str(file.size).encode()))
+        await send({'type': 'http.response.start', 'status': 200, 'headers': response_headers})
+        if scope['method'] == 'HEAD' or not file.size:
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        await self.stream(file.path, 0, file.size, send)
+
+    async def stream(self, path: str, start: int, length: int, send) -> None:
+        """Send ``length`` bytes of ``path`` from ``start``, one chunk at a time."""
+        loop = asyncio.get_running_loop()
+        fh = await loop.run_in_executor(None, open, path, 'rb')
+        try:
+            if start:
+                await loop.run_in_executor(None, fh.seek, start)
+            remaining = length
+            while remaining > 0:
+                chunk = await loop.run_in_executor(None, fh.read, min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': remaining > 0})
+            if remaining > 0:
+                # File shrank under us; end the response rather than hang
+                await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            await loop.run_in_executor(None, fh.close)
+
+
+def serve_static(app):
+    """``app`` with ``STATIC_URL`` answered in front of it, from the source files under DEBUG."""
+    if settings.DEBUG:
+        return ASGIStaticFilesHandler(app)
+    return StaticFilesApp(app)
@@ -0,0 +1,86 @@
+"""Static files storage used by ``collectstatic``.
+
+``CompressedManifestStaticFilesStorage`` writes content-hashed copies
+(``site.3f1c0a9b2e44.css``) plus a manifest, like Django's
+``ManifestStaticFilesStorage``, and then precompresses every text asset to
+``.gz`` and, when the ``brotli`` package is installed, ``.br`` next to it.
+``config.static.StaticFilesApp`` serves whichever variant the browser
+accepts, so nothing is compressed per request.
+
+A name missing from the manifest raises ``ValueError``, as with Django's
+storage, so a deploy cannot ship an asset without its cache-busting hash.
+Only with ``STATIC_MANIFEST_FALLBACK`` (on in the development settings,
+where ``collectstatic`` may never have run) does it fall back to the
+plain name.
+"""
+import gzip
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {
+    '.css', '.js', '.mjs', '.map', '.json', '.svg', '.txt', '.html', '.xml',
+    '.ico', '.eot', '.ttf', '.otf', '.wasm',
+}
+MIN_SIZE = 256
+# A variant is only kept if it is at least this much smaller than the original
+MIN_SAVING = 0.05
+
+
+def _variants(data: bytes) -> dict[str, bytes]:
+    out = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        out['.br'] = brotli.compress(data, quality=11)
+    return out
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            if not getattr(settings, 'STATIC_MANIFEST_FALLBACK', False):
+                raise
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        written = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                written.add(hashed_name)
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name in sorted(written | set(paths)):
+            self.compress(name)
+
+    def compress(self, name: str) -> list[str]:
+        """Write compressed variants of ``name``; returns the variant names written."""
+        if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+            return []
+        path = self.path(name)
+        try:
+            source = os.stat(path)
+        except FileNotFoundError:
+            return []
+        if source.st_size < MIN_SIZE:
+            return []
+        with open(path, 'rb') as fh:
+            data = fh.read()
+        written = []
+        for suffix, encoded in _variants(data).items():
+            target = path + suffix
+            if len(encoded) > len(data) * (1 - MIN_SAVING):
+                if os.path.exists(target):
+                    os.remove(target)
+                continue
+            with open(target, 'wb') as fh:
+                fh.write(encoded)
+            written.append(name + suffix)
+        return written
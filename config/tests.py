@@ -0,0 +1,181 @@
+import asyncio
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.test import SimpleTestCase, override_settings
+
+from .media import MediaFilesApp, parse_range
+from .static import StaticFilesApp, http_date, serve_static
+from .storage import CompressedManifestStaticFilesStorage
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_ranges(self):
+        self.assertEqual(parse_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range('bytes=500-', 1000), (500, 999))
+        self.assertEqual(parse_range('bytes=-100', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=900-5000', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=-5000', 1000), (0, 999))
+        self.assertEqual(parse_range(' bytes = 1 - 2 ', 1000), (1, 2))
+
+    def test_ignored(self):
+        for header in ('bytes=0-1,5-6', 'bytes=-', 'items=0-1', 'bytes=5-1', 'bytes=a-b', ''):
+            self.assertIsNone(parse_range(header, 1000), header)
+
+    def test_unsatisfiable(self):
+        self.assertIs(parse_range('bytes=1000-', 1000), False)
+        self.assertIs(parse_range('bytes=-0', 1000), False)
+
+
+async def _fallback(scope, receive, send):
+    await send({'type': 'http.response.start', 'status': 404, 'headers': []})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+class MediaFilesAppTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        self.body = bytes(range(256)) * 4
+        with open(os.path.join(self.root, 'photo.jpg'), 'wb') as fh:
+            fh.write(self.body)
+        self.app = MediaFilesApp(_fallback, root=self.root, prefix='/media/')
+
+    def request(self, path='/media/photo.jpg', headers=None, app=None, method='GET'):
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {
+            'type': 'http', 'method': method, 'path': path,
+            'headers': [(k.encode(), v.encode()) for k, v in (headers or {}).items()],
+        }
+        asyncio.run((app or self.app)(scope, None, send))
+        start = messages[0]
+        return (
+            start['status'],
+            {k.decode(): v.decode() for k, v in start.get('headers', [])},
+            b''.join(m.get('body', b'') for m in messages[1:]),
+        )
+
+    def test_full_response(self):
+        status, headers, body = self.request()
+        self.assertEqual((status, body), (200, self.body))
+        self.assertEqual(headers['accept-ranges'], 'bytes')
+        self.assertEqual(headers['content-length'], str(len(self.body)))
+
+    def test_range(self):
+        status, headers, body = self.request(headers={'range': 'bytes=10-19'})
+        self.assertEqual((status, body), (206, self.body[10:20]))
+        self.assertEqual(headers['content-range'], f'bytes 10-19/{len(self.body)}')
+        self.assertEqual(headers['content-length'], '10')
+
+    def test_unsatisfiable_range(self):
+        status, headers, body = self.request(headers={'range': f'bytes={len(self.body)}-'})
+        self.assertEqual((status, body), (416, b''))
+        self.assertEqual(headers['content-range'], f'bytes */{len(self.body)}')
+
+    def test_multiple_ranges_send_the_whole_file(self):
+        status, _, body = self.request(headers={'range': 'bytes=0-1,4-5'})
+        self.assertEqual((status, body), (200, self.body))
+
+    def test_if_range(self):
+        _, headers, _ = self.request()
+        status, _, body = self.request(headers={'range': 'bytes=0-9', 'if-range': headers['etag']})
+        self.assertEqual((status, body), (206, self.body[:10]))
+        status, _, body = self.request(headers={'range': 'bytes=0-9', 'if-range': '"stale"'})
+        self.assertEqual((status, body), (200, self.body))
+        status, _, _ = self.request(headers={'range': 'bytes=0-9', 'if-range': headers['last-modified']})
+        self.assertEqual(status, 206)
+        status, _, _ = self.request(headers={'range': 'bytes=0-9', 'if-range': http_date(0)})
+        self.assertEqual(status, 200)
+
+    def test_not_modified(self):
+        _, headers, _ = self.request()
+        status, _, body = self.request(headers={'if-none-match': headers['etag']})
+        self.assertEqual((status, body), (304, b''))
+
+    def test_head(self):
+        status, headers, body = self.request(method='HEAD', headers={'range': 'bytes=0-9'})
+        self.assertEqual((status, body, headers['content-length']), (206, b'', '10'))
+
+    def test_falls_through_outside_the_root(self):
+        self.assertEqual(self.request('/media/../settings.py')[0], 404)
+        self.assertEqual(self.request('/media/missing.jpg')[0], 404)
+        self.assertEqual(self.request('/other/photo.jpg')[0], 404)
+
+    def test_busy_returns_503(self):
+        app = MediaFilesApp(_fallback, root=self.root, prefix='/media/', max_concurrent=1, queue_timeout=0.01)
+
+        async def run():
+            await app.slots.acquire()  # the only slot is taken by another download
+            messages = []
+
+            async def send(message):
+                messages.append(message)
+
+            await app({'type': 'http', 'method': 'GET', 'path': '/media/photo.jpg', 'headers': []}, None, send)
+            app.slots.release()
+            return messages
+
+        messages = asyncio.run(run())
+        self.assertEqual(messages[0]['status'], 503)
+        self.assertIn((b'retry-after', b'1'), messages[0]['headers'])
+
+    def test_sendfile_hand_off(self):
+        app = MediaFilesApp(_fallback, root=self.root, prefix='/media/', sendfile='X-Accel-Redirect')
+        status, headers, body = self.request(app=app)
+        self.assertEqual((status, body), (200, b''))
+        self.assertEqual(headers['x-accel-redirect'], '/protected-media/photo.jpg')
+
+
+class ManifestFallbackTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.storage = CompressedManifestStaticFilesStorage(location=tmp.name)
+
+    @override_settings(STATIC_MANIFEST_FALLBACK=False)
+    def test_missing_entry_is_an_error(self):
+        with self.assertRaises(ValueError):
+            self.storage.stored_name('site.css')
+
+    @override_settings(STATIC_MANIFEST_FALLBACK=True)
+    def test_fallback_serves_the_plain_name(self):
+        self.assertEqual(self.storage.stored_name('site.css'), 'site.css')
+
+
+class ServeStaticTests(SimpleTestCase):
+    def get(self, app, path):
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        requests = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+        async def receive():
+            if requests:
+                return requests.pop()
+            await asyncio.Event().wait()  # no disconnect until the response is sent
+
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'',
+            'headers': [], 'server': ('testserver', 80), 'scheme': 'http',
+        }
+        asyncio.run(app(scope, receive, send))
+        return messages[0]['status'], b''.join(m.get('body', b'') for m in messages[1:])
+
+    @override_settings(DEBUG=True)
+    def test_debug_serves_the_source_files(self):
+        status, body = self.get(serve_static(get_asgi_application()), '/static/site.css')
+        self.assertEqual(status, 200)
+        with open(os.path.join(settings.BASE_DIR, 'static', 'site.css'), 'rb') as fh:
+            self.assertEqual(body, fh.read())
+
+    def test_production_serves_static_root(self):
+        self.assertIsInstance(serve_static(_fallback), StaticFilesApp)
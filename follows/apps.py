@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class FollowsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'follows'
+
+    def ready(self):
+        # Connect the follow set cache and suggestion list signal handlers
+        from . import followset, suggestions  # noqa: F401
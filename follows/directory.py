@@ -0,0 +1,51 @@
+"""The People directory: users in username order, one keyset page at a time.
+
+Pages walk ``Profile.username_key`` (``username.lower()``, folded in Python
+so non-ASCII names compare case-insensitively too, which SQLite's ``LOWER``
+does not) through its ``(username_key, user)`` index, and a search term
+becomes a range on the same index (``>= 'ali' AND < 'ali\\U0010ffff'``)
+instead of a ``LIKE '%ali%'`` scan. Avatars and follower counts come from
+the joined profile row and the "follows you" flag from an ``EXISTS`` probe
+on the ``(follower, following)`` unique index, all in the page query; the
+template checks "following" against the viewer's cached follow set
+(``following_ids``).
+"""
+from django.contrib.auth.models import User
+from django.db.models import Exists, F, OuterRef, Q
+from accounts.models import username_key
+from blog.pagination import CursorPage, decode_cursor, encode_cursor
+from .models import Follow
+
+PAGE_SIZE = 25
+# Sorts after every other character, closing the prefix range
+PREFIX_END = '\U0010ffff'
+
+
+def queryset(viewer):
+    """Everyone but ``viewer``, annotated with whether they follow the viewer."""
+    return (
+        # Inner join, so SQLite can walk the profile index in order
+        User.objects.exclude(pk=viewer.pk).filter(profile__isnull=False)
+        .select_related('profile')
+        .annotate(
+            username_key=F('profile__username_key'),
+            follows_you=Exists(Follow.objects.filter(follower_id=OuterRef('pk'), following_id=viewer.pk)),
+        )
+    )
+
+
+def page(viewer, q: str = '', token: str | None = None, per_page: int = PAGE_SIZE) -> CursorPage:
+    """One page of users whose username starts with ``q`` (case-insensitive)."""
+    users = queryset(viewer)
+    prefix = username_key(q.strip())
+    if prefix:
+        users = users.filter(username_key__gte=prefix, username_key__lt=prefix + PREFIX_END)
+    position = decode_cursor(token)
+    if position is not None and isinstance(position.key, str):
+        users = users.filter(
+            Q(username_key__gt=position.key) | Q(username_key=position.key, profile__user__gt=position.pk)
+        )
+    rows = list(users.order_by('username_key', 'profile__user')[:per_page + 1])
+    more, rows = len(rows) > per_page, rows[:per_page]
+    next_cursor = encode_cursor(rows[-1].username_key, rows[-1].pk) if more else None
+    return CursorPage(rows, next_cursor, None)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from follows import suggestions
+
+
+class Command(BaseCommand):
+    help = 'Recompute every "who to follow" list from the follow graph (run periodically).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=suggestions.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        written = suggestions.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} suggestion lists'))
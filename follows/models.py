@@ -1,4 +1,7 @@
 from django.db import models
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.contrib.auth.models import User
 
 
@@ -13,4 +16,33 @@ class Follow(models.Model):
     def __str__(self) -> str:
         return f"{self.follower.username} -> {self.following.username}"
 
-# Create your models here.
+
+class Suggestions(models.Model):
+    """Precomputed "who to follow" list for one user, kept by ``follows.suggestions``.
+
+    ``candidates`` holds ``[user_id, score, mutuals, follows_you]`` rows, best
+    first, so reading suggestions is a primary-key lookup.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='follow_suggestions')
+    candidates = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"Suggestions({self.user_id})"
+
+
+def _bump_follow_counts(rel: Follow, delta: int) -> None:
+    from accounts.models import Profile
+    Profile.objects.filter(user_id=rel.following_id).update(followers_count=F('followers_count') + delta)
+    Profile.objects.filter(user_id=rel.follower_id).update(following_count=F('following_count') + delta)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow_added(sender, instance, created, **kwargs):
+    if created:
+        _bump_follow_counts(instance, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_follow_removed(sender, instance, **kwargs):
+    _bump_follow_counts(instance, -1)
@@ -1,3 +1,173 @@
-from django.test import TestCase
+import random
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase
+
+from notifications import outbox
+from . import suggestions
+from .models import Follow, Suggestions
+
+
+class SuggestionsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(outbox, 'WORKER', 'command')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.users = [User.objects.create_user(f'user{i}') for i in range(8)]
+
+    def drain(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            outbox.drain()
+
+    def follow(self, a, b):
+        Follow.objects.create(follower=a, following=b)
+        self.drain()
+
+    def unfollow(self, a, b):
+        Follow.objects.get(follower=a, following=b).delete()
+        self.drain()
+
+    def stored(self) -> dict[int, list]:
+        return dict(Suggestions.objects.values_list('user_id', 'candidates'))
+
+    def test_incremental_updates_match_rebuild(self):
+        rnd = random.Random(7)
+        edges = set()
+        for _ in range(60):
+            a, b = rnd.sample(self.users, 2)
+            if (a.pk, b.pk) in edges:
+                self.unfollow(a, b)
+                edges.discard((a.pk, b.pk))
+            else:
+                self.follow(a, b)
+                edges.add((a.pk, b.pk))
+        incremental = {user_id: rows for user_id, rows in self.stored().items() if rows}
+        suggestions.rebuild()
+        rebuilt = {user_id: rows for user_id, rows in self.stored().items() if rows}
+        self.assertEqual(incremental, rebuilt)
+
+    def test_mutual_follow_is_suggested(self):
+        alice, bob, carol = self.users[:3]
+        self.follow(alice, bob)
+        self.follow(bob, carol)
+        [suggested] = suggestions.for_user(alice)
+        self.assertEqual((suggested, suggested.mutuals, suggested.follows_you), (carol, 1, False))
+        self.follow(alice, carol)
+        self.assertEqual(suggestions.for_user(alice), [])
+
+    def test_follow_is_applied_by_the_outbox_worker(self):
+        alice, bob, carol = self.users[:3]
+        self.follow(bob, carol)
+        Follow.objects.create(follower=alice, following=bob)
+        self.assertEqual(suggestions.for_user(alice), [])
+        self.drain()
+        self.assertEqual(suggestions.for_user(alice), [carol])
+
+    def test_deleting_a_user_drops_them_from_lists(self):
+        alice, bob, carol, dave = self.users[:4]
+        self.follow(alice, bob)
+        self.follow(bob, carol)
+        self.follow(carol, dave)
+        self.assertIn(carol.pk, [e[0] for e in self.stored()[alice.pk]])
+        self.assertIn(carol.pk, [e[0] for e in self.stored()[dave.pk]])
+        carol_id = carol.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            carol.delete()
+        self.drain()
+        self.assertFalse(Suggestions.objects.filter(user_id=carol_id).exists())
+        for user_id, candidates in self.stored().items():
+            self.assertNotIn(carol_id, [e[0] for e in candidates], user_id)
+        self.assertEqual(suggestions.for_user(alice), [])
+
+
+class DeleteFollowedUserTests(TransactionTestCase):
+    def test_deleting_a_followed_user_commits(self):
+        # The cascade must not queue suggestion work for the user being deleted
+        alice, bob = User.objects.create_user('alice'), User.objects.create_user('bob')
+        with mock.patch.object(outbox, 'WORKER', 'command'):
+            Follow.objects.create(follower=alice, following=bob)
+            outbox.drain()
+            bob.delete()
+            self.assertEqual(outbox.drain(), 0)
+        self.assertFalse(Follow.objects.exists())
+
+
+class FollowSetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(outbox, 'WORKER', 'command')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.alice, self.bob = User.objects.create_user('alice'), User.objects.create_user('bob')
+
+    def test_follow_and_unfollow_patch_the_cached_set(self):
+        from . import followset
+        carol = User.objects.create_user('carol')
+        self.assertNotIn(self.bob.pk, followset.get(self.alice.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.create(follower=self.alice, following=carol)
+            rel = Follow.objects.create(follower=self.alice, following=self.bob)
+        with self.assertNumQueries(0):
+            following = followset.get(self.alice.pk)
+        self.assertEqual(list(following), sorted([self.bob.pk, carol.pk]))
+        with self.captureOnCommitCallbacks(execute=True):
+            rel.delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(list(followset.get(self.alice.pk)), [carol.pk])
+
+    def test_uncached_set_is_built_on_read(self):
+        from . import followset
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.create(follower=self.alice, following=self.bob)
+        with self.assertNumQueries(1):
+            self.assertIn(self.bob.pk, followset.get(self.alice.pk))
+
+    def test_follow_button_never_unfollows(self):
+        Follow.objects.create(follower=self.alice, following=self.bob)
+        self.client.force_login(self.alice)
+        self.client.post(f'/follows/toggle/{self.bob.pk}/', {'action': 'follow'})
+        self.assertTrue(Follow.objects.filter(follower=self.alice, following=self.bob).exists())
+        self.client.post(f'/follows/toggle/{self.bob.pk}/', {'action': 'unfollow'})
+        self.assertFalse(Follow.objects.filter(follower=self.alice, following=self.bob).exists())
+        self.client.post(f'/follows/toggle/{self.bob.pk}/', {'action': 'unfollow'})
+        self.assertFalse(Follow.objects.filter(follower=self.alice, following=self.bob).exists())
+
+    def test_people_page_reads_the_follow_set(self):
+        self.client.force_login(self.alice)
+        self.assertContains(self.client.get('/follows/people/'), 'value="follow"')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/follows/toggle/{self.bob.pk}/', {'action': 'follow'})
+        self.assertContains(self.client.get('/follows/people/'), 'value="unfollow"')
+
+
+class DirectoryTests(TestCase):
+    def setUp(self):
+        self.viewer = User.objects.create_user('viewer')
+        for name in ('Émile', 'emma', 'Ömer', 'alice', 'Alina'):
+            User.objects.create_user(name)
+
+    def names(self, q='', token=None, per_page=25):
+        from . import directory
+        page = directory.page(self.viewer, q, token, per_page)
+        return [u.username for u in page.object_list], page.next_cursor
+
+    def test_prefix_search_folds_non_ascii_case(self):
+        for q in ('É', 'é', 'Ém', 'ÉMI'):
+            self.assertEqual(self.names(q)[0], ['Émile'], q)
+        self.assertEqual(self.names('ö')[0], ['Ömer'])
+        self.assertEqual(self.names('ALI')[0], ['alice', 'Alina'])
+
+    def test_pages_follow_username_order(self):
+        first, token = self.names(per_page=3)
+        rest, end = self.names(token=token, per_page=3)
+        self.assertEqual(first + rest, ['alice', 'Alina', 'emma', 'Émile', 'Ömer'])
+        self.assertIsNone(end)
+
+    def test_renaming_updates_the_key(self):
+        user = User.objects.get(username='emma')
+        user.username = 'Zoë'
+        user.save()
+        self.assertEqual(self.names('zo')[0], ['Zoë'])
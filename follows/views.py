@@ -4,8 +4,8 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib import messages
 from .models import Follow
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+from . import directory, suggestions
+from notifications import outbox
 
 
 def index(request: HttpRequest) -> HttpResponse:
@@ -15,11 +15,10 @@ def index(request: HttpRequest) -> HttpResponse:
 @login_required
 def people(request: HttpRequest) -> HttpResponse:
     q = request.GET.get('q', '').strip()
-    users = User.objects.exclude(pk=request.user.pk)
-    if q:
-        users = users.filter(username__icontains=q)
-    following_ids = set(Follow.objects.filter(follower=request.user).values_list('following_id', flat=True))
-    return render(request, 'follows/people.html', { 'users': users, 'following_ids': following_ids, 'q': q })
+    cursor = request.GET.get('cursor')
+    users = directory.page(request.user, q, cursor)
+    suggested = suggestions.for_user(request.user) if not (q or cursor) else []
+    return render(request, 'follows/people.html', { 'users': users, 'q': q, 'suggested': suggested })
 
 
 @login_required
@@ -30,32 +29,28 @@ def toggle_follow(request: HttpRequest, user_id: int) -> HttpResponse:
     if target == request.user:
         messages.error(request, 'You cannot follow yourself.')
         return redirect('follows:people')
-    rel, created = Follow.objects.get_or_create(follower=request.user, following=target)
-    if not created:
-        rel.delete()
+    # The form says which way it goes, so a page rendered from stale state
+    # cannot turn "Follow" into an unfollow; without it the request toggles.
+    action = request.POST.get('action')
+    if action not in ('follow', 'unfollow'):
+        action = 'unfollow' if Follow.objects.filter(follower=request.user, following=target).exists() else 'follow'
+    if action == 'unfollow':
+        for rel in Follow.objects.filter(follower=request.user, following=target):
+            rel.delete()
         messages.info(request, f'Unfollowed {target.username}.')
+        return redirect('follows:people')
+    _, created = Follow.objects.get_or_create(follower=request.user, following=target)
+    if not created:
+        messages.info(request, f'You already follow {target.username}.')
     else:
         messages.success(request, f'Now following {target.username}.')
-        # Send realtime notification to the followed user
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f"user_{target.id}",
-            {
-                'type': 'notify',
-                'data': {
-                    'type': 'follow',
-                    'message': f"{request.user.username} started following you",
-                    'follower': request.user.username,
-                }
-            }
-        )
-        # Persist notification for unread count
-        from notifications.models import Notification
-        Notification.objects.create(
-            user=target,
-            type='follow',
-            message=f"{request.user.username} started following you",
+        # Stored and pushed to the followed user by the notifications outbox
+        outbox.enqueue(
+            target,
+            'follow',
+            'started following you',
             actor=request.user,
-            url=f"/follows/people/"
+            url="/follows/people/",
+            target='followers',
         )
     return redirect('follows:people')
@@ -1,11 +1,15 @@
 from django.contrib import admin
-from .models import Notification
+from .models import Notification, OutboxEntry
 
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
-    list_display = ('user', 'type', 'message', 'read', 'created_at')
+    list_display = ('user', 'type', 'message', 'actor_count', 'read', 'updated_at')
     list_filter = ('read', 'type', 'created_at')
     search_fields = ('message', 'user__username')
 
 
+@admin.register(OutboxEntry)
+class OutboxEntryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'type', 'verb', 'target', 'created_at')
+    list_filter = ('type',)
@@ -5,4 +5,8 @@ class NotificationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'notifications'
 
+    def ready(self):
+        # Register the shared-cache deployment check
+        from . import badge  # noqa: F401
+
 
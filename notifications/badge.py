@@ -0,0 +1,75 @@
+"""Per-user cache for the navbar notification badge and dropdown.
+
+The context processor reads through these helpers lazily; entries are
+dropped whenever a notification is created or marked read, and the new
+unread count is pushed to the user's ``NotificationsConsumer`` sockets.
+
+Dropping an entry only reaches other workers through a shared cache. With a
+process-local backend (the default ``LocMemCache``) and several workers the
+badge can lag by up to ``NOTIFICATIONS_CACHE_TTL`` seconds, which
+``manage.py check --deploy`` warns about.
+"""
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+
+from config.caches import process_local
+
+CACHE_TTL = getattr(settings, 'NOTIFICATIONS_CACHE_TTL', 300)
+RECENT_LIMIT = 5
+
+
+def _unread_key(user_id: int) -> str:
+    return f'notifications:unread:{user_id}'
+
+
+def _recent_key(user_id: int) -> str:
+    return f'notifications:recent:{user_id}'
+
+
+def unread_count(user_id: int) -> int:
+    from .models import Notification
+    count = cache.get(_unread_key(user_id))
+    if count is None:
+        count = Notification.objects.filter(user_id=user_id, read=False).count()
+        cache.set(_unread_key(user_id), count, CACHE_TTL)
+    return count
+
+
+def recent(user_id: int) -> list:
+    from .models import Notification
+    items = cache.get(_recent_key(user_id))
+    if items is None:
+        items = list(
+            Notification.objects.filter(user_id=user_id).select_related('actor').order_by('-updated_at')[:RECENT_LIMIT]
+        )
+        cache.set(_recent_key(user_id), items, CACHE_TTL)
+    return items
+
+
+def invalidate(user_id: int) -> None:
+    cache.delete_many([_unread_key(user_id), _recent_key(user_id)])
+
+
+def push(user_id: int, **data) -> None:
+    """Send a ``badge`` event to every open socket of ``user_id``."""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    async_to_sync(channel_layer.group_send)(
+        f"user_{user_id}",
+        {'type': 'notify', 'data': {'type': 'badge', **data}},
+    )
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if not process_local():
+        return []
+    return [checks.Warning(
+        'The default cache is process-local, so notification badges are only correct with a single worker.',
+        hint='Point CACHES["default"] at a shared backend (Redis, Memcached) when running several workers.',
+        id='notifications.W001',
+    )]
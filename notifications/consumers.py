@@ -1,20 +1,64 @@
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 
+from . import badge, stream
+
 
 class NotificationsConsumer(AsyncJsonWebsocketConsumer):
     async def connect(self):
         if self.scope['user'].is_anonymous:
             await self.close()
             return
-        self.group_name = f"user_{self.scope['user'].id}"
+        user_id = self.scope['user'].id
+        self.group_name = f"user_{user_id}"
+        # Join first so nothing sent during the replay is missed; live events
+        # already covered by the replay are dropped in notify().
         await self.channel_layer.group_add(self.group_name, self.channel_name)
         await self.accept()
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        try:
+            last = int(query['last'][0])
+        except (KeyError, ValueError):
+            last = None
+        self.seq = await self.replay(user_id, last)
 
     async def disconnect(self, close_code):
         if hasattr(self, 'group_name'):
             await self.channel_layer.group_discard(self.group_name, self.channel_name)
 
-    async def notify(self, event):
-        await self.send_json(event['data'])
-
+    async def replay(self, user_id: int, last: int | None) -> int:
+        """Send rows past ``last`` in batches, then the current badge and position."""
+        if last is None:
+            # Fresh page load: the page already shows current state.
+            seq = await database_sync_to_async(stream.head)(user_id)
+            await self.send_json({'type': 'stream', 'seq': seq})
+            return seq
+        seq, sent = last, 0
+        while sent < stream.REPLAY_LIMIT:
+            items = await database_sync_to_async(stream.since)(user_id, seq, stream.REPLAY_BATCH)
+            if not items:
+                break
+            seq = items[-1]['seq']
+            sent += len(items)
+            await self.send_json({'type': 'batch', 'replay': True, 'items': items})
+            if len(items) < stream.REPLAY_BATCH:
+                break
+        else:
+            # Too far behind to replay item by item; skip to the head.
+            seq = await database_sync_to_async(stream.head)(user_id)
+        unread = await database_sync_to_async(badge.unread_count)(user_id)
+        await self.send_json({'type': 'badge', 'unread': unread, 'seq': seq})
+        return seq
 
+    async def notify(self, event):
+        data = event['data']
+        if data.get('type') == 'batch':
+            items = [item for item in data['items'] if (item.get('seq') or 0) > self.seq]
+            if not items:
+                return
+            self.seq = max(self.seq, *(item['seq'] or 0 for item in items))
+            if len(items) != len(data['items']):
+                data = {**data, 'items': items}
+        await self.send_json(data)
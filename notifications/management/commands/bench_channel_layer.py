@@ -0,0 +1,87 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+
+from channels.layers import InMemoryChannelLayer
+from django.core.management.base import BaseCommand
+
+from config.layers import SQLiteChannelLayer
+
+GROUP = 'bench'
+
+
+def _sender(path: str, count: int, capacity: int) -> None:
+    """Run in a child process: group_send ``count`` messages through the SQLite layer."""
+    async def run():
+        layer = SQLiteChannelLayer(path=path, capacity=capacity)
+        for n in range(count):
+            await layer.group_send(GROUP, {'type': 'notify', 'n': n})
+        await layer.close()
+    asyncio.run(run())
+
+
+class Command(BaseCommand):
+    help = 'Measure group_send throughput of the SQLite channel layer against the in-memory layer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=2000, help='group_send calls per run.')
+        parser.add_argument('--channels', type=int, default=10, help='Receiving channels in the group.')
+        parser.add_argument('--processes', type=int, default=2,
+                            help='Sender processes for the cross-process SQLite run (0 to skip).')
+
+    def handle(self, *args, **options):
+        messages, channels = options['messages'], options['channels']
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.sqlite3')
+            runs = [
+                ('in-memory', lambda: InMemoryChannelLayer(capacity=messages), 0),
+                ('sqlite', lambda: SQLiteChannelLayer(path=path, capacity=messages), 0),
+            ]
+            if options['processes']:
+                runs.append((f"sqlite x{options['processes']} procs",
+                             lambda: SQLiteChannelLayer(path=path, capacity=messages),
+                             options['processes']))
+            for label, factory, processes in runs:
+                elapsed, delivered = asyncio.run(
+                    self.run(factory(), path, messages, channels, processes))
+                self.stdout.write(
+                    f'{label:<20} {messages / elapsed:>10.0f} sends/s '
+                    f'{delivered / elapsed:>10.0f} deliveries/s '
+                    f'({delivered}/{messages * channels} delivered in {elapsed:.2f}s)')
+
+    async def run(self, layer, path, messages, channels, processes):
+        names = [await layer.new_channel() for _ in range(channels)]
+        for name in names:
+            await layer.group_add(GROUP, name)
+        received = [0] * channels
+
+        async def receiver(i):
+            while received[i] < messages:
+                await layer.receive(names[i])
+                received[i] += 1
+
+        tasks = [asyncio.create_task(receiver(i)) for i in range(channels)]
+        start = time.perf_counter()
+        if processes:
+            ctx = multiprocessing.get_context('spawn')
+            share, extra = divmod(messages, processes)
+            procs = [ctx.Process(target=_sender, args=(path, share + (i < extra), messages))
+                     for i in range(processes)]
+            for proc in procs:
+                proc.start()
+            await asyncio.to_thread(lambda: [proc.join() for proc in procs])
+        else:
+            for n in range(messages):
+                await layer.group_send(GROUP, {'type': 'notify', 'n': n})
+        try:
+            await asyncio.wait_for(asyncio.gather(*tasks), timeout=60)
+        except asyncio.TimeoutError:
+            for task in tasks:
+                task.cancel()
+        elapsed = time.perf_counter() - start
+        await layer.flush()
+        if hasattr(layer, 'close'):
+            await layer.close()
+        return elapsed, sum(received)
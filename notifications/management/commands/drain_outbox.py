@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from notifications import outbox
+
+
+class Command(BaseCommand):
+    help = 'Deliver pending notification outbox entries in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=outbox.BATCH_SIZE)
+        parser.add_argument('--forever', action='store_true', help='Keep polling instead of exiting when the outbox is empty.')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to sleep between polls with --forever.')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            handled = outbox.drain(options['batch_size'])
+            total += handled
+            if handled:
+                continue
+            if not options['forever']:
+                break
+            close_old_connections()
+            time.sleep(options['interval'])
+        self.stdout.write(f'Delivered {total} notification(s).')
@@ -0,0 +1,77 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    Notification = apps.get_model('notifications', 'Notification')
+    Notification.objects.update(updated_at=models.F('created_at'))
+    for row in Notification.objects.filter(actor__isnull=False).select_related('actor').iterator():
+        row.actor_sample = [row.actor.username]
+        row.save(update_fields=['actor_sample'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_outbox'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='outboxentry',
+            old_name='message',
+            new_name='verb',
+        ),
+        migrations.AddField(
+            model_name='outboxentry',
+            name='target',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.RemoveField(
+            model_name='notification',
+            name='outbox_id',
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='last_outbox_id',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='target',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='verb',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='actor_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='actor_sample',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.AlterModelOptions(
+            name='notification',
+            options={'ordering': ['-updated_at']},
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-updated_at'], name='notifications_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'type', 'target', 'read'], name='notifications_fold_idx'),
+        ),
+    ]
@@ -1,5 +1,9 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 from django.contrib.auth.models import User
+from django.utils import timezone
+from . import badge
 
 
 class Notification(models.Model):
@@ -11,8 +15,42 @@ class Notification(models.Model):
     url = models.CharField(max_length=255, blank=True, default='')
     created_at = models.DateTimeField(auto_now_add=True)
     read = models.BooleanField(default=False)
+    # Aggregation: events of one type on one target fold into a single row.
+    # ``message`` is rebuilt from the actor sample, count and ``verb``.
+    target = models.CharField(max_length=100, blank=True, default='')
+    verb = models.CharField(max_length=255, blank=True, default='')
+    actor_count = models.PositiveIntegerField(default=1)
+    actor_sample = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(default=timezone.now)
+    # Newest outbox entry folded into this row; re-drained entries are skipped.
+    last_outbox_id = models.BigIntegerField(null=True, blank=True, editable=False)
 
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['user', '-updated_at'], name='notifications_recent_idx'),
+            models.Index(fields=['user', 'type', 'target', 'read'], name='notifications_fold_idx'),
+            models.Index(fields=['user', 'last_outbox_id'], name='notifications_stream_idx'),
+        ]
 
 
+class OutboxEntry(models.Model):
+    """A notification intent waiting for ``notifications.outbox.drain``."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    type = models.CharField(max_length=50)
+    verb = models.CharField(max_length=255)
+    target = models.CharField(max_length=100, blank=True, default='')
+    actor = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    url = models.CharField(max_length=255, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+
+@receiver(post_save, sender=Notification)
+def refresh_badge(sender, instance, created, raw=False, **kwargs):
+    if not created or raw:
+        return
+    badge.invalidate(instance.user_id)
+    transaction.on_commit(lambda: badge.push(instance.user_id, unread_delta=1))
@@ -0,0 +1,237 @@
+"""Transactional outbox for notifications.
+
+Views call :func:`enqueue`, which is a single INSERT inside the caller's
+transaction. :func:`drain` later turns pending entries into ``Notification``
+rows with one ``bulk_create`` and pushes them with one grouped channel send
+per recipient. Entries of the same type on the same target fold into one
+unread row ("alice and 41 others liked your post") with an actor count and a
+capped actor sample, updated in place. The rows and the deletion of their
+entries commit together, so a crash before commit means the batch is drained
+again (rows skip entries at or below their ``last_outbox_id``). Badge
+invalidation and the realtime push run after that commit, so no reader can
+re-cache the old count or fetch rows that are not visible yet, and the
+database is not locked during the channel send; a push lost to a crash is
+recovered by the socket's replay on reconnect (``stream.since``).
+
+Other apps can queue their own deferred work in the same outbox: entries of
+a type registered with :func:`handler` are handed to that function instead
+of becoming notifications (``follows.suggestions`` uses this to keep
+follow-graph work off the request path).
+
+By default a background thread in the web process drains after each commit;
+set ``NOTIFICATIONS_OUTBOX_WORKER = 'command'`` and run
+``python manage.py drain_outbox --forever`` to move that work elsewhere.
+"""
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from datetime import timedelta
+from functools import partial
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import badge, stream
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, 'NOTIFICATIONS_OUTBOX_BATCH_SIZE', 500)
+WORKER = getattr(settings, 'NOTIFICATIONS_OUTBOX_WORKER', 'thread')
+AGGREGATE_WINDOW = getattr(settings, 'NOTIFICATIONS_AGGREGATE_WINDOW', 24 * 60 * 60)
+SAMPLE_SIZE = getattr(settings, 'NOTIFICATIONS_ACTOR_SAMPLE_SIZE', 3)
+
+# entry type -> function consuming those entries; see ``handler``
+HANDLERS = {}
+
+
+def enqueue(user, type: str, verb: str, actor=None, url: str = '', target: str = '') -> None:
+    """Record that ``actor`` did ``verb`` for ``user``; delivery happens after commit.
+
+    Entries sharing ``type`` and ``target`` (e.g. ``'post:12'``) fold into one
+    notification while it is unread and younger than ``AGGREGATE_WINDOW``;
+    leave ``target`` empty for events that should always stand alone.
+    """
+    from .models import OutboxEntry
+    if actor is not None and getattr(actor, 'pk', actor) == getattr(user, 'pk', user):
+        return
+    OutboxEntry.objects.create(
+        user_id=getattr(user, 'pk', user),
+        actor_id=getattr(actor, 'pk', actor),
+        type=type,
+        verb=verb[:255],
+        target=target,
+        url=url,
+    )
+    if WORKER == 'thread':
+        transaction.on_commit(_worker.wake)
+
+
+def handler(type: str):
+    """Register a function that consumes outbox entries of ``type``.
+
+    The worker calls it with the entries' ``(user_id, actor_id)`` pairs in
+    outbox order, after the batch that removed them committed. Work lost to
+    a crash at that point is not retried, so handlers should be repairable
+    by a periodic rebuild.
+    """
+    def register(func):
+        HANDLERS[type] = func
+        return func
+    return register
+
+
+def describe(actor_sample: list, actor_count: int, verb: str) -> str:
+    """``'alice and 41 others liked your post'`` style message text."""
+    if not actor_sample:
+        return verb[:255]
+    if actor_count <= 1:
+        who = actor_sample[0]
+    elif actor_count == 2 and len(actor_sample) > 1:
+        who = f'{actor_sample[0]} and {actor_sample[1]}'
+    else:
+        others = actor_count - 1
+        who = f"{actor_sample[0]} and {others} other{'s' if others > 1 else ''}"
+    return f'{who} {verb}'[:255]
+
+
+def _fold(row, entry) -> None:
+    name = entry.actor.username if entry.actor_id else None
+    # Repeat actors are only recognised while they are in the sample.
+    if name is None or name not in row.actor_sample:
+        row.actor_count += 1
+    if name is not None:
+        row.actor_sample = [name] + [n for n in row.actor_sample if n != name][:SAMPLE_SIZE - 1]
+        row.actor_id = entry.actor_id
+    row.verb = entry.verb
+    row.url = entry.url or row.url
+    row.last_outbox_id = entry.id
+    row.message = describe(row.actor_sample, row.actor_count, row.verb)
+
+
+def drain(batch_size: int = BATCH_SIZE) -> int:
+    """Deliver up to ``batch_size`` pending entries; returns how many were handled."""
+    from .models import Notification, OutboxEntry
+    with transaction.atomic():
+        entries = list(
+            OutboxEntry.objects.select_for_update(skip_locked=True).select_related('actor').order_by('id')[:batch_size]
+        )
+        if not entries:
+            return 0
+        now = timezone.now()
+        tasks = defaultdict(list)
+        groups = defaultdict(list)
+        for entry in entries:
+            if entry.type in HANDLERS:
+                tasks[entry.type].append((entry.user_id, entry.actor_id))
+            else:
+                groups[(entry.user_id, entry.type, entry.target or f'#{entry.id}')].append(entry)
+
+        # Open rows these entries can fold into, found through the fold index.
+        open_rows = {}
+        targeted = [entry for group in groups.values() for entry in group if entry.target]
+        if targeted:
+            candidates = Notification.objects.filter(
+                user_id__in={entry.user_id for entry in targeted},
+                type__in={entry.type for entry in targeted},
+                target__in={entry.target for entry in targeted},
+                read=False,
+                created_at__gte=now - timedelta(seconds=AGGREGATE_WINDOW),
+            ).order_by('updated_at')
+            for row in candidates:
+                open_rows[(row.user_id, row.type, row.target)] = row
+
+        created, updated = [], []
+        for key, group in groups.items():
+            row = open_rows.get(key)
+            if row is None:
+                first = group[0]
+                row = Notification(user_id=first.user_id, type=first.type, target=first.target,
+                                   actor_count=0, actor_sample=[])
+                created.append(row)
+            fresh = [entry for entry in group if row.last_outbox_id is None or entry.id > row.last_outbox_id]
+            if not fresh:
+                continue
+            for entry in fresh:
+                _fold(row, entry)
+            row.updated_at = now
+            if row.pk is not None:
+                updated.append(row)
+
+        Notification.objects.bulk_create(created)
+        if updated:
+            Notification.objects.bulk_update(updated, [
+                'message', 'verb', 'url', 'actor', 'actor_count', 'actor_sample', 'updated_at', 'last_outbox_id',
+            ])
+
+        # bulk writes skip post_save, so refresh badges here. Folding into an
+        # unread row changes its text but not the unread count.
+        items = defaultdict(list)
+        unread_delta = defaultdict(int)
+        for row in created:
+            unread_delta[row.user_id] += 1
+        for row in created + updated:
+            items[row.user_id].append(stream.item(row))
+        OutboxEntry.objects.filter(id__in=[entry.id for entry in entries]).delete()
+        transaction.on_commit(lambda: _deliver(items, unread_delta), robust=True)
+        for type, pairs in tasks.items():
+            transaction.on_commit(partial(HANDLERS[type], pairs), robust=True)
+    return len(entries)
+
+
+def _deliver(items: dict, unread_delta: dict) -> None:
+    for user_id in items:
+        badge.invalidate(user_id)
+    _send(items, unread_delta)
+
+
+def _send(items: dict, unread_delta: dict) -> None:
+    channel_layer = get_channel_layer()
+    if channel_layer is None or not items:
+        return
+
+    async def send_all():
+        await asyncio.gather(*(
+            channel_layer.group_send(f'user_{user_id}', {
+                'type': 'notify',
+                'data': {'type': 'batch', 'unread_delta': unread_delta[user_id], 'items': rows},
+            })
+            for user_id, rows in items.items()
+        ))
+
+    async_to_sync(send_all)()
+
+
+class _Worker:
+    """Daemon thread that drains the outbox whenever it is woken."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def wake(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='notifications-outbox', daemon=True)
+                self._thread.start()
+        self._event.set()
+
+    def _run(self) -> None:
+        while True:
+            self._event.wait()
+            self._event.clear()
+            try:
+                close_old_connections()
+                while drain() == BATCH_SIZE:
+                    pass
+            except Exception:
+                logger.exception('Draining the notification outbox failed')
+            finally:
+                close_old_connections()
+
+
+_worker = _Worker()
@@ -0,0 +1,41 @@
+"""Replay of missed notifications for reconnecting sockets.
+
+Every notification written by the outbox carries ``last_outbox_id``, which
+grows each time the row is created or folded into. It acts as the stream
+position: a client remembers the highest one it has seen and, on reconnect,
+gets every row of its own that moved past it, read from the
+``(user, last_outbox_id)`` index in bounded batches.
+"""
+from django.conf import settings
+from django.db.models import Max
+
+REPLAY_BATCH = getattr(settings, 'NOTIFICATIONS_REPLAY_BATCH', 50)
+REPLAY_LIMIT = getattr(settings, 'NOTIFICATIONS_REPLAY_LIMIT', 200)
+
+
+def item(row) -> dict:
+    """Wire format of one notification in ``batch`` events."""
+    return {
+        'id': row.pk,
+        'seq': row.last_outbox_id,
+        'type': row.type,
+        'message': row.message,
+        'url': row.url,
+        'actor_count': row.actor_count,
+    }
+
+
+def head(user_id: int) -> int:
+    """Current stream position for ``user_id``."""
+    from .models import Notification
+    return Notification.objects.filter(user_id=user_id).aggregate(seq=Max('last_outbox_id'))['seq'] or 0
+
+
+def since(user_id: int, seq: int, limit: int = REPLAY_BATCH) -> list:
+    """Up to ``limit`` items past ``seq``, oldest first."""
+    from .models import Notification
+    rows = (
+        Notification.objects.filter(user_id=user_id, last_outbox_id__gt=seq)
+        .order_by('last_outbox_id')[:limit]
+    )
+    return [item(row) for row in rows]
@@ -0,0 +1,237 @@
+import asyncio
+from datetime import timedelta
+from unittest import mock
+
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from config.asgi import application
+from . import badge, outbox, stream
+from .models import Notification, OutboxEntry
+
+
+class OutboxTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(outbox, 'WORKER', 'command')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.owner = User.objects.create_user('owner')
+        self.alice, self.bob, self.carol, self.dave = (
+            User.objects.create_user(name) for name in ('alice', 'bob', 'carol', 'dave')
+        )
+
+    def drain(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            handled = outbox.drain()
+        return handled, callbacks
+
+
+class OutboxTests(OutboxTestCase):
+    def test_enqueue_only_records_an_entry(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            outbox.enqueue(self.owner, 'follow', 'followed you', actor=self.alice, url='/u/alice/')
+        self.assertEqual(callbacks, [])
+        self.assertEqual(OutboxEntry.objects.count(), 1)
+        self.assertFalse(Notification.objects.exists())
+
+    def test_self_actions_are_not_queued(self):
+        outbox.enqueue(self.owner, 'like', 'liked your post', actor=self.owner, target='post:1')
+        self.assertFalse(OutboxEntry.objects.exists())
+
+    def test_drain_creates_rows_and_removes_entries(self):
+        outbox.enqueue(self.owner, 'follow', 'followed you', actor=self.alice)
+        outbox.enqueue(self.bob, 'follow', 'followed you', actor=self.alice)
+        self.assertEqual(self.drain()[0], 2)
+        self.assertFalse(OutboxEntry.objects.exists())
+        self.assertEqual(
+            sorted(Notification.objects.values_list('user__username', 'message')),
+            [('bob', 'alice followed you'), ('owner', 'alice followed you')],
+        )
+        self.assertEqual(self.drain()[0], 0)
+
+    def test_redrained_entries_are_skipped(self):
+        outbox.enqueue(self.owner, 'like', 'liked your post', actor=self.alice, target='post:1')
+        entry = OutboxEntry.objects.get()
+        self.drain()
+        # A crash after the rows were written but before the entries'
+        # deletion committed leaves the same entry to be drained again.
+        entry.save(force_insert=True)
+        self.drain()
+        row = Notification.objects.get()
+        self.assertEqual((row.actor_count, row.last_outbox_id), (1, entry.pk))
+        self.assertFalse(OutboxEntry.objects.exists())
+
+    def test_badge_and_push_run_after_commit(self):
+        self.assertEqual(badge.unread_count(self.owner.pk), 0)
+        outbox.enqueue(self.owner, 'follow', 'followed you', actor=self.alice)
+        with mock.patch.object(outbox, '_send') as send:
+            with self.captureOnCommitCallbacks() as callbacks:
+                outbox.drain()
+            send.assert_not_called()
+            self.assertEqual(badge.unread_count(self.owner.pk), 0)
+            for callback in callbacks:
+                callback()
+        self.assertEqual(badge.unread_count(self.owner.pk), 1)
+        items, unread_delta = send.call_args.args
+        row = Notification.objects.get()
+        self.assertEqual(items, {self.owner.pk: [{
+            'id': row.pk, 'seq': row.last_outbox_id, 'type': 'follow',
+            'message': 'alice followed you', 'url': '', 'actor_count': 1,
+        }]})
+        self.assertEqual(unread_delta[self.owner.pk], 1)
+
+    def test_registered_types_go_to_their_handler(self):
+        consume = mock.Mock()
+        with mock.patch.dict(outbox.HANDLERS, {'test': consume}):
+            outbox.enqueue(self.owner, 'test', '', actor=self.alice)
+            outbox.enqueue(self.bob, 'test', '', actor=self.carol)
+            outbox.enqueue(self.owner, 'follow', 'followed you', actor=self.dave)
+            self.assertEqual(self.drain()[0], 3)
+        consume.assert_called_once_with([(self.owner.pk, self.alice.pk), (self.bob.pk, self.carol.pk)])
+        self.assertEqual(Notification.objects.get().type, 'follow')
+
+
+class AggregationTests(OutboxTestCase):
+    def like(self, *actors, target='post:1'):
+        for actor in actors:
+            outbox.enqueue(self.owner, 'like', 'liked your post', actor=actor, url='/p/1/', target=target)
+        self.drain()
+
+    def test_describe(self):
+        self.assertEqual(outbox.describe([], 0, 'New comment'), 'New comment')
+        self.assertEqual(outbox.describe(['alice'], 1, 'liked your post'), 'alice liked your post')
+        self.assertEqual(outbox.describe(['bob', 'alice'], 2, 'liked your post'), 'bob and alice liked your post')
+        self.assertEqual(outbox.describe(['bob'], 2, 'liked your post'), 'bob and 1 other liked your post')
+        self.assertEqual(outbox.describe(['bob', 'alice'], 42, 'liked your post'), 'bob and 41 others liked your post')
+
+    def test_events_on_one_target_fold_into_one_row(self):
+        self.like(self.alice)
+        self.like(self.bob, self.carol, self.dave)
+        row = Notification.objects.get()
+        self.assertEqual(row.actor_count, 4)
+        self.assertEqual(row.actor_sample, ['dave', 'carol', 'bob'])
+        self.assertEqual(row.actor_id, self.dave.pk)
+        self.assertEqual(row.message, 'dave and 3 others liked your post')
+        self.assertEqual(badge.unread_count(self.owner.pk), 1)
+
+    def test_repeat_actor_in_the_sample_is_counted_once(self):
+        self.like(self.alice, self.bob)
+        self.like(self.alice)
+        row = Notification.objects.get()
+        self.assertEqual((row.actor_count, row.actor_sample), (2, ['alice', 'bob']))
+        self.assertEqual(row.message, 'alice and bob liked your post')
+
+    def test_read_rows_are_not_folded_into(self):
+        self.like(self.alice)
+        Notification.objects.update(read=True)
+        self.like(self.bob)
+        self.assertEqual(
+            list(Notification.objects.order_by('pk').values_list('message', 'read')),
+            [('alice liked your post', True), ('bob liked your post', False)],
+        )
+
+    def test_rows_outside_the_window_are_not_folded_into(self):
+        self.like(self.alice)
+        Notification.objects.update(created_at=timezone.now() - timedelta(seconds=outbox.AGGREGATE_WINDOW + 1))
+        self.like(self.bob)
+        self.assertEqual(Notification.objects.count(), 2)
+
+    def test_other_targets_and_untargeted_events_stand_alone(self):
+        self.like(self.alice)
+        self.like(self.bob, target='post:2')
+        outbox.enqueue(self.owner, 'comment', 'commented on your post', actor=self.alice)
+        outbox.enqueue(self.owner, 'comment', 'commented on your post', actor=self.bob)
+        self.drain()
+        self.assertEqual(Notification.objects.filter(type='like').count(), 2)
+        self.assertEqual(Notification.objects.filter(type='comment', actor_count=1).count(), 2)
+
+
+class StreamTests(OutboxTestCase):
+    def test_since_returns_rows_past_the_position_oldest_first(self):
+        self.assertEqual((stream.head(self.owner.pk), stream.since(self.owner.pk, 0)), (0, []))
+        for actor, target in ((self.alice, 'post:1'), (self.bob, 'post:2'), (self.carol, 'post:3')):
+            outbox.enqueue(self.owner, 'like', 'liked your post', actor=actor, target=target)
+            self.drain()
+        seqs = [item['seq'] for item in stream.since(self.owner.pk, 0)]
+        self.assertEqual(seqs, sorted(seqs))
+        self.assertEqual(stream.head(self.owner.pk), seqs[-1])
+        self.assertEqual([item['seq'] for item in stream.since(self.owner.pk, seqs[0], limit=1)], [seqs[1]])
+
+    def test_folding_moves_a_row_past_the_position(self):
+        outbox.enqueue(self.owner, 'like', 'liked your post', actor=self.alice, target='post:1')
+        self.drain()
+        seen = stream.head(self.owner.pk)
+        outbox.enqueue(self.owner, 'like', 'liked your post', actor=self.bob, target='post:1')
+        self.drain()
+        [item] = stream.since(self.owner.pk, seen)
+        self.assertEqual((item['message'], item['actor_count']), ('bob and alice liked your post', 2))
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class NotificationsConsumerTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(outbox, 'WORKER', 'command')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.owner = User.objects.create_user('owner')
+        for i in range(3):
+            outbox.enqueue(self.owner, 'like', 'liked your post', actor=User.objects.create_user(f'fan{i}'),
+                           target=f'post:{i}')
+            outbox.drain()
+        self.seqs = [item['seq'] for item in stream.since(self.owner.pk, 0)]
+        self.client.force_login(self.owner)
+        self.cookie = f'{settings.SESSION_COOKIE_NAME}={self.client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+    def run_socket(self, scenario, last=None):
+        async def run():
+            query = '' if last is None else f'?last={last}'
+            ws = WebsocketCommunicator(application, f'/ws/notifications/{query}', headers=[
+                (b'cookie', self.cookie.encode()), (b'origin', b'http://testserver'), (b'host', b'testserver'),
+            ])
+            connected, _ = await ws.connect()
+            self.assertTrue(connected)
+            try:
+                return await scenario(ws)
+            finally:
+                await ws.disconnect()
+        return asyncio.run(run())
+
+    def test_fresh_connection_gets_the_head_only(self):
+        async def scenario(ws):
+            first = await ws.receive_json_from()
+            self.assertTrue(await ws.receive_nothing())
+            return first
+        self.assertEqual(self.run_socket(scenario), {'type': 'stream', 'seq': self.seqs[-1]})
+
+    def test_reconnect_replays_missed_rows_then_the_badge(self):
+        async def scenario(ws):
+            return await ws.receive_json_from(), await ws.receive_json_from()
+        batch, status = self.run_socket(scenario, last=self.seqs[0])
+        self.assertTrue(batch['replay'])
+        self.assertEqual([item['seq'] for item in batch['items']], self.seqs[1:])
+        self.assertEqual(status, {'type': 'badge', 'unread': 3, 'seq': self.seqs[-1]})
+
+    def test_replay_stops_at_the_limit_and_skips_to_the_head(self):
+        async def scenario(ws):
+            return [await ws.receive_json_from() for _ in range(3)]
+        with mock.patch.object(stream, 'REPLAY_BATCH', 1), mock.patch.object(stream, 'REPLAY_LIMIT', 2):
+            replies = self.run_socket(scenario, last=0)
+        self.assertEqual([[item['seq'] for item in r['items']] for r in replies[:2]], [self.seqs[:1], self.seqs[1:2]])
+        self.assertEqual(replies[2]['seq'], self.seqs[-1])
+
+    def test_live_items_already_replayed_are_dropped(self):
+        async def scenario(ws):
+            await ws.receive_json_from()
+            items = [{'seq': seq} for seq in self.seqs] + [{'seq': self.seqs[-1] + 1}]
+            await get_channel_layer().group_send(f'user_{self.owner.pk}', {
+                'type': 'notify', 'data': {'type': 'batch', 'unread_delta': 1, 'items': items},
+            })
+            return await ws.receive_json_from()
+        self.assertEqual(self.run_socket(scenario)['items'], [{'seq': self.seqs[-1] + 1}])
@@ -1,6 +1,7 @@
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import redirect, render
 from .models import Notification
+from . import badge
 from django.http import HttpRequest, HttpResponseNotAllowed
 
 
@@ -9,12 +10,14 @@ def read_all(request: HttpRequest):
     if request.method != 'POST':
         return HttpResponseNotAllowed(['POST'])
     Notification.objects.filter(user=request.user, read=False).update(read=True)
+    badge.invalidate(request.user.pk)
+    badge.push(request.user.pk, unread=0)
     return redirect(request.META.get('HTTP_REFERER', '/'))
 
 
 @login_required
 def list_notifications(request: HttpRequest):
-    items = Notification.objects.filter(user=request.user).order_by('-created_at')[:20]
+    items = Notification.objects.filter(user=request.user).order_by('-updated_at')[:20]
     return render(request, 'notifications/list.html', { 'items': items })
 
 